@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动基准：测量各模块在全新解释器中的导入耗时
+
+并行回测的每个 worker 进程都要重新导入策略与数据模块，这里逐个模块起子进程计时，
+同时检查导入后是否意外加载了 sklearn / matplotlib / tushare 等重依赖。
+
+用法:
+    python benchmarks/bench_import.py            # 打印结果
+    python benchmarks/bench_import.py --check    # 数值核心超出预算时返回非零退出码
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 数值核心：worker 导入时只允许依赖 numpy
+NUMERIC_CORE = [
+    'scripts.stock.gold_collection.denoised_corr',
+    'scripts.stock.gold_collection.NCO_weights',
+]
+
+# numpy 本身的导入耗时作为基线一并列出
+MODULES = ['numpy'] + NUMERIC_CORE + [
+    'data.data_fetcher',
+    'scripts.option.strategies.monthly_atm_call',
+    'scripts.option.strategies.LongETF_ShortCall_Contrast',
+]
+
+# 导入后不应出现在 sys.modules 中的重依赖
+HEAVY_MODULES = ['sklearn', 'matplotlib', 'tushare', 'scipy.optimize', 'scipy.cluster']
+
+_PROBE = '''
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - t0) * 1000
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{'ms': elapsed, 'heavy': heavy}}))
+'''
+
+
+def measure_import(module, repeat=5):
+    """
+    在全新子进程中重复导入模块，返回耗时中位数(毫秒)和被连带加载的重依赖
+
+    参数:
+        module (str): 模块路径
+        repeat (int): 重复次数
+    返回:
+        dict: {'module', 'median_ms', 'min_ms', 'heavy'}
+    """
+    timings = []
+    heavy = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(probe['ms'])
+        heavy = probe['heavy']
+    return {
+        'module': module,
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'heavy': heavy,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='数值核心的导入耗时预算')
+    parser.add_argument('--check', action='store_true', help='数值核心超预算或加载重依赖时返回 1')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    results = [measure_import(m, args.repeat) for m in MODULES]
+    failed = [
+        r for r in results
+        if r['module'] in NUMERIC_CORE and (r['median_ms'] > args.budget_ms or r['heavy'])
+    ]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for r in results:
+            flag = ' *' if r in failed else ''
+            print(f"{r['module']:<55} {r['median_ms']:8.1f} ms (min {r['min_ms']:.1f}) "
+                  f"heavy={','.join(r['heavy']) or '-'}{flag}")
+    if args.check and failed:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
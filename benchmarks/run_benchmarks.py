@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基准测试入口：用合成行情离线驱动数据管道、两个期权策略与 NCO 调仓，在多个规模下计时，
+结果追加到 benchmarks/results/history.jsonl (带 git commit)，并与上一次不同 commit 的结果对比
+
+用法:
+    python benchmarks/run_benchmarks.py                       # 全部场景, small+medium
+    python benchmarks/run_benchmarks.py --scales small large --scenarios monthly_atm_call
+    python benchmarks/run_benchmarks.py --no-save --threshold 1.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.synthetic import FakeProApi, SyntheticMarket, make_fund_nav_panel  # noqa: E402
+from data.data_fetcher import DataFetcher  # noqa: E402
+from data.dataHelper.instrumentation import PerfRecorder  # noqa: E402
+
+RESULTS_FILE = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'history.jsonl')
+
+# 规模: 交易日数, 每个到期月行权价个数, NCO 基金数, 蒙特卡洛路径数, 结果库回测数
+SCALES = {
+    'small': {'n_days': 250, 'n_strikes': 9, 'n_funds': 20, 'n_paths': 2000, 'n_runs': 1000},
+    'medium': {'n_days': 750, 'n_strikes': 15, 'n_funds': 40, 'n_paths': 10000, 'n_runs': 10000},
+    'large': {'n_days': 1500, 'n_strikes': 21, 'n_funds': 80, 'n_paths': 50000, 'n_runs': 50000},
+}
+
+_market_cache = {}
+
+
+def _market(scale):
+    if scale not in _market_cache:
+        cfg = SCALES[scale]
+        _market_cache[scale] = SyntheticMarket(n_days=cfg['n_days'], n_strikes=cfg['n_strikes'],
+                                               underlyings=('510500.SH', '510300.SH'))
+    return _market_cache[scale]
+
+
+def _pipeline(market, data_dir, recorder):
+    fetcher = DataFetcher(pro_api=FakeProApi(market), recorder=recorder, data_dir=data_dir, api_interval=0)
+    return fetcher.prepare_backtest_data_origin(market.start_date, market.end_date, '500', 'SSE')
+
+
+def scenario_pipeline_cold(scale):
+    """空缓存目录：全部走接口、合并、写盘"""
+    market = _market(scale)
+    recorder = PerfRecorder()
+
+    def run():
+        data_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+        try:
+            _pipeline(market, data_dir, recorder)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return run, recorder
+
+
+def scenario_pipeline_warm(scale):
+    """缓存已存在：只读 CSV 与解析"""
+    market = _market(scale)
+    recorder = PerfRecorder()
+    data_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    _pipeline(market, data_dir, PerfRecorder())
+
+    def run():
+        _pipeline(market, data_dir, recorder)
+    run.cleanup = lambda: shutil.rmtree(data_dir, ignore_errors=True)
+    return run, recorder
+
+
+def scenario_long_etf_short_call(scale):
+    from scripts.option.strategies.LongETF_ShortCall_Contrast import LongETFShortCallContrastStrategy
+
+    market = _market(scale)
+    etf, options = market.etf_frame(), market.merged_frame()
+    recorder = PerfRecorder()
+
+    def run():
+        LongETFShortCallContrastStrategy(etf, options, recorder=recorder).run_backtest()
+    return run, recorder
+
+
+def scenario_monthly_atm_call(scale):
+    from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+
+    market = _market(scale)
+    etf, options = market.etf_frame(), market.merged_frame()
+    recorder = PerfRecorder()
+
+    def run():
+        MonthlyATMCallStrategy(etf, options.copy(), recorder=recorder).run_backtest()
+    return run, recorder
+
+
+def scenario_multi_strategy(scale, n_variants=4):
+    """一次遍历驱动 n_variants 个每月卖出认购 (不同张数) 与一个持有 ETF 策略"""
+    from scripts.option.multi_runner import MultiStrategyRunner
+    from scripts.option.strategies.LongETF_ShortCall_Contrast import LongETFShortCallContrastStrategy
+    from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+    from scripts.option.utils.market_data import MarketData
+
+    market = _market(scale)
+    etf, options = market.etf_frame(), market.merged_frame()
+    recorder = PerfRecorder()
+
+    def run():
+        data = MarketData(etf, options)
+        strategies = {f'monthly_atm_call_{k}': MonthlyATMCallStrategy(market=data, contracts=k, recorder=recorder)
+                      for k in range(1, n_variants + 1)}
+        strategies['long_etf_short_call'] = LongETFShortCallContrastStrategy(market=data, recorder=recorder)
+        MultiStrategyRunner(data, strategies, recorder=recorder).run()
+    return run, recorder
+
+
+def scenario_delta_hedge(scale):
+    """每月卖出认购 (10 张) 的期权腿，一次模拟 3 个固定频率与 3 个带宽对冲规则 (含成交成本)"""
+    from scripts.option.simulation.delta_hedge import DeltaHedgeSimulator
+    from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+    from scripts.option.utils.fills import ETF_SPEC, FillEngine
+
+    market = _market(scale)
+    strategy = MonthlyATMCallStrategy(market.etf_frame(), market.merged_frame(), contracts=10)
+    strategy.run_backtest()
+    recorder = PerfRecorder()
+
+    def run():
+        with recorder.run('delta_hedge'):
+            DeltaHedgeSimulator.from_strategy(strategy, fill_engine=FillEngine(ETF_SPEC)).simulate()
+    return run, recorder
+
+
+def scenario_nco_rebalance(scale, n_rebalance=2):
+    from scripts.stock.gold_collection import NCO_weights, denoised_corr
+
+    cfg = SCALES[scale]
+    panel = make_fund_nav_panel(n_funds=cfg['n_funds'], n_days=400)
+    ends = panel.index[-n_rebalance * 21::21][:n_rebalance]
+    start = panel.index[0]
+    recorder = PerfRecorder()
+
+    def run():
+        with recorder.run('nco_rebalance'), contextlib.redirect_stdout(io.StringIO()):
+            for end in ends:
+                with recorder.stage('cal_corr'):
+                    cor, cov, annual_rtns = denoised_corr.cal_corr(panel, start, end)
+                with recorder.stage('nco_weights'):
+                    NCO_weights.nco_weights(cov, cor, annual_rtns)
+    return run, recorder
+
+
+def scenario_monte_carlo(scale, model='heston'):
+    """蒙特卡洛压力测试：一年路径上的每月卖出认购规则，同时评估 3 个行权价档位"""
+    from scripts.option.simulation.monte_carlo import MonteCarloEngine
+
+    cfg = SCALES[scale]
+    recorder = PerfRecorder()
+
+    def run():
+        with recorder.run('monte_carlo'):
+            engine = MonteCarloEngine(model=model, n_paths=cfg['n_paths'], n_days=252, n_strikes=cfg['n_strikes'])
+            engine.run_monthly_atm_call(strike_offsets=(0, 1, 2))
+    return run, recorder
+
+
+def scenario_ivix(scale):
+    """整个期权面板的波动率指数"""
+    from scripts.option.pricing_models.ivix import compute_ivix
+
+    options = _market(scale).merged_frame()
+    recorder = PerfRecorder()
+
+    def run():
+        with recorder.run('ivix'):
+            compute_ivix(options)
+    return run, recorder
+
+
+def scenario_spread_scan(scale):
+    """整个期权面板的垂直与日历价差扫描"""
+    from scripts.option.pricing_models.spread_scanner import scan_spreads
+
+    market = _market(scale)
+    options, etf = market.merged_frame(), market.etf_frame()
+    recorder = PerfRecorder()
+
+    def run():
+        with recorder.run('spread_scan'):
+            scan_spreads(options, etf)
+    return run, recorder
+
+
+def scenario_results_leaderboard(scale):
+    """结果库: 预先写入 n_runs 次扫描结果，计时排行榜与按参数筛选查询"""
+    import numpy as np
+
+    from data.results_store import ResultsStore
+
+    n_runs = SCALES[scale]['n_runs']
+    tmp_dir = tempfile.mkdtemp(prefix='bench_results_')
+    store = ResultsStore(os.path.join(tmp_dir, 'results.db'))
+    rng = np.random.default_rng(0)
+    store.record_runs({'strategy': 'monthly_atm_call', 'sweep': 'bench',
+                       'params': {'offset': i % 7, 'contracts': i % 5 + 1},
+                       'metrics': {'sharpe': float(s), 'max_drawdown': float(d)}}
+                      for i, (s, d) in enumerate(zip(rng.normal(size=n_runs), rng.random(n_runs))))
+    recorder = PerfRecorder()
+
+    def run():
+        with recorder.run('results_leaderboard'):
+            store.leaderboard('sharpe', n=50, sweep='bench')
+            store.leaderboard('max_drawdown', n=50, ascending=True, offset=(1, 3), contracts=2)
+    run.cleanup = lambda: shutil.rmtree(tmp_dir, ignore_errors=True)
+    return run, recorder
+
+
+SCENARIOS = {
+    'pipeline_cold': scenario_pipeline_cold,
+    'pipeline_warm': scenario_pipeline_warm,
+    'long_etf_short_call': scenario_long_etf_short_call,
+    'monthly_atm_call': scenario_monthly_atm_call,
+    'multi_strategy': scenario_multi_strategy,
+    'delta_hedge': scenario_delta_hedge,
+    'nco_rebalance': scenario_nco_rebalance,
+    'monte_carlo': scenario_monte_carlo,
+    'ivix': scenario_ivix,
+    'spread_scan': scenario_spread_scan,
+    'results_leaderboard': scenario_results_leaderboard,
+}
+
+
+def time_scenario(name, scale, repeat):
+    """
+    运行单个场景
+
+    返回:
+        dict: 场景名、规模、各次耗时统计及最后一次运行的计数器
+    """
+    run, recorder = SCENARIOS[name](scale)
+    timings = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+    finally:
+        cleanup = getattr(run, 'cleanup', None)
+        if cleanup is not None:
+            cleanup()
+    last_run = recorder.runs[-1] if recorder.runs else {}
+    return {
+        'scenario': name,
+        'scale': scale,
+        'repeat': repeat,
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'counters': last_run.get('counters', {}),
+        'stages': {k: v['total_s'] for k, v in last_run.get('stages', {}).items()},
+    }
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, dirty
+
+
+def load_history(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_record(record, path=RESULTS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def compare(record, history, threshold):
+    """
+    与最近一次不同 commit 的记录对比，返回 (基线记录, 变慢超过阈值的场景列表)
+    """
+    baseline = next((r for r in reversed(history) if r['commit'] != record['commit']), None)
+    if baseline is None:
+        return None, []
+    base = {(r['scenario'], r['scale']): r['median_s'] for r in baseline['results']}
+    regressions = []
+    for r in record['results']:
+        key = (r['scenario'], r['scale'])
+        if key in base and base[key] > 0:
+            r['ratio'] = r['median_s'] / base[key]
+            if r['ratio'] > threshold:
+                regressions.append(r)
+    return baseline, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=1.25, help='相对基线变慢超过该倍数视为回归')
+    parser.add_argument('--no-save', action='store_true', help='不写入 history.jsonl')
+    parser.add_argument('--results', default=RESULTS_FILE, help='结果文件路径')
+    args = parser.parse_args(argv)
+
+    commit, dirty = _git_commit()
+    record = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': [],
+    }
+    for scale in args.scales:
+        for name in args.scenarios:
+            result = time_scenario(name, scale, args.repeat)
+            record['results'].append(result)
+            print(f"{name:<22} {scale:<7} median {result['median_s'] * 1000:10.1f} ms  "
+                  f"min {result['min_s'] * 1000:10.1f} ms")
+
+    baseline, regressions = compare(record, load_history(args.results), args.threshold)
+    if baseline is not None:
+        print(f"\n对比基线 {baseline['commit']} ({baseline['timestamp']}):")
+        for r in record['results']:
+            if 'ratio' in r:
+                flag = '  <-- 回归' if r in regressions else ''
+                print(f"{r['scenario']:<22} {r['scale']:<7} x{r['ratio']:.2f}{flag}")
+    if not args.no_save:
+        save_record(record, args.results)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
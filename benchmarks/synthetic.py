@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+合成行情生成器：按 Tushare 返回格式生成确定性的 ETF 日线、期权合约列表与期权日线，
+并提供离线的 FakeProApi，供基准测试与单元测试在不访问网络的情况下驱动数据管道和策略
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.option.pricing_models.black_scholes import bs_price
+from scripts.option.simulation.monte_carlo import sse_strike_step
+
+ETF_FIELDS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close', 'vol', 'amount']
+OPT_BASIC_FIELDS = ['ts_code', 'name', 'opt_code', 'opt_type', 'call_put', 'exercise_price',
+                    'maturity_date', 'list_date', 'delist_date']
+OPT_DAILY_FIELDS = ['ts_code', 'trade_date', 'pre_settle', 'pre_close', 'open', 'high', 'low',
+                    'close', 'settle', 'vol', 'amount']
+
+# 标的: (ETF代码, 期权名称前缀)
+UNDERLYINGS = {
+    '510500.SH': '南方中证500ETF',
+    '510300.SH': '华泰柏瑞沪深300ETF',
+    '510050.SH': '华夏上证50ETF',
+}
+
+
+def fourth_wednesday(year, month):
+    """到期月份第四个星期三 (上交所ETF期权到期日)"""
+    first = pd.Timestamp(year=year, month=month, day=1)
+    offset = (2 - first.weekday()) % 7
+    return first + pd.Timedelta(days=offset + 21)
+
+
+class SyntheticMarket:
+    """
+    确定性的合成期权市场：同一组参数 + seed 总是生成相同的数据
+    """
+
+    def __init__(self, n_days=250, start_date='20240102', s0=5.5, sigma=0.22, drift=0.03,
+                 n_strikes=9, listed_months=3, underlyings=('510500.SH',), rate=0.02, seed=0):
+        """
+        :param n_days: 交易日数量
+        :param start_date: 第一个交易日 (YYYYMMDD)
+        :param s0: 标的初始价格
+        :param sigma: 标的年化波动率 (同时作为平值隐含波动率)
+        :param drift: 标的年化漂移
+        :param n_strikes: 每个到期月份挂牌的行权价个数 (以挂牌日平值为中心)
+        :param listed_months: 每个到期月份提前挂牌的月数
+        :param underlyings: 生成期权合约的标的代码，第一个为主标的
+        :param rate: 无风险利率
+        :param seed: 随机种子
+        """
+        self.n_days = n_days
+        self.s0 = s0
+        self.sigma = sigma
+        self.drift = drift
+        self.n_strikes = n_strikes
+        self.listed_months = listed_months
+        self.underlyings = list(underlyings)
+        self.rate = rate
+        self.seed = seed
+        self.calendar = pd.bdate_range(pd.Timestamp(start_date), periods=n_days)
+        self._rng = np.random.default_rng(seed)
+        self.etf_daily = {code: self._make_etf_daily(code, s0 * (1 + 0.3 * i)) for i, code in
+                          enumerate(self.underlyings)}
+        self.opt_basic = self._make_opt_basic()
+        self.opt_daily = self._make_opt_daily()
+
+    @property
+    def start_date(self):
+        return self.calendar[0].strftime('%Y%m%d')
+
+    @property
+    def end_date(self):
+        return self.calendar[-1].strftime('%Y%m%d')
+
+    def _make_etf_daily(self, ts_code, s0):
+        n = self.n_days
+        dt = 1 / 252
+        shocks = self._rng.standard_normal(n)
+        log_ret = (self.drift - 0.5 * self.sigma ** 2) * dt + self.sigma * np.sqrt(dt) * shocks
+        log_ret[0] = 0.0
+        close = s0 * np.exp(np.cumsum(log_ret))
+        prev = np.concatenate([[s0], close[:-1]])
+        open_ = prev * (1 + 0.002 * self._rng.standard_normal(n))
+        spread = np.abs(self._rng.standard_normal(n)) * 0.006 * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        vol = np.round(self._rng.lognormal(14.5, 0.3, n), 2)  # 手
+        amount = np.round(vol * 100 * close / 1000, 3)  # 千元
+        return pd.DataFrame({
+            'ts_code': ts_code,
+            'trade_date': self.calendar.strftime('%Y%m%d'),
+            'open': np.round(open_, 3), 'high': np.round(high, 3), 'low': np.round(low, 3),
+            'close': np.round(close, 3), 'pre_close': np.round(prev, 3), 'vol': vol, 'amount': amount,
+        })[ETF_FIELDS]
+
+    def _expiries(self):
+        first, last = self.calendar[0], self.calendar[-1] + pd.DateOffset(months=self.listed_months)
+        months = pd.period_range(first, last, freq='M')
+        return [fourth_wednesday(p.year, p.month) for p in months]
+
+    def _make_opt_basic(self):
+        rows = []
+        code = 10006713
+        for ts_code in self.underlyings:
+            etf = self.etf_daily[ts_code]
+            closes = etf['close'].to_numpy()
+            prefix = UNDERLYINGS.get(ts_code, ts_code)
+            for expiry in self._expiries():
+                list_ts = expiry - pd.DateOffset(months=self.listed_months)
+                pos = min(max(self.calendar.searchsorted(list_ts), 0), self.n_days - 1)
+                list_date = self.calendar[pos]
+                if list_date > expiry:
+                    continue
+                spot = closes[pos]
+                step = float(sse_strike_step(spot))
+                center = round(spot / step) * step
+                half = self.n_strikes // 2
+                strikes = np.round(center + step * np.arange(-half, self.n_strikes - half), 3)
+                for strike in strikes:
+                    for call_put, cn in (('C', '认购'), ('P', '认沽')):
+                        rows.append({
+                            'ts_code': f'{code}.SH',
+                            'name': f'{prefix}期权{expiry:%y%m}{cn}{strike:.2f}',
+                            'opt_code': f'OP{ts_code}',
+                            'opt_type': 'ETF期权',
+                            'call_put': call_put,
+                            'exercise_price': float(strike),
+                            'maturity_date': expiry.strftime('%Y%m%d'),
+                            'list_date': list_date.strftime('%Y%m%d'),
+                            'delist_date': expiry.strftime('%Y%m%d'),
+                        })
+                        code += 1
+        return pd.DataFrame(rows, columns=OPT_BASIC_FIELDS)
+
+    def _make_opt_daily(self):
+        basic = self.opt_basic
+        cal = self.calendar
+        list_pos = cal.searchsorted(pd.to_datetime(basic['list_date']))
+        end_pos = cal.searchsorted(pd.to_datetime(basic['delist_date']), side='right')
+        counts = np.maximum(end_pos - list_pos, 0)
+        rows = np.repeat(np.arange(len(basic)), counts)
+        day_idx = np.concatenate([np.arange(a, b) for a, b in zip(list_pos, end_pos) if b > a]) \
+            if counts.sum() else np.array([], dtype=int)
+
+        spots = {code: df['close'].to_numpy() for code, df in self.etf_daily.items()}
+        underlying = basic['opt_code'].str[2:].to_numpy()[rows]
+        spot = np.empty(len(rows))
+        for code, closes in spots.items():
+            mask = underlying == code
+            spot[mask] = closes[day_idx[mask]]
+
+        strike = basic['exercise_price'].to_numpy()[rows]
+        is_call = (basic['call_put'].to_numpy() == 'C')[rows]
+        expiry = pd.to_datetime(basic['maturity_date']).to_numpy()[rows]
+        tau = (expiry - cal.to_numpy()[day_idx]).astype('timedelta64[D]').astype(float) / 365
+        moneyness = np.log(strike / spot)
+        iv = self.sigma * (1 - 0.8 * moneyness + 2.0 * moneyness ** 2)
+        settle = np.maximum(bs_price(spot, strike, tau, iv, self.rate, is_call), 0.0001)
+        close = np.maximum(settle * (1 + 0.01 * self._rng.standard_normal(len(rows))), 0.0001)
+
+        df = pd.DataFrame({
+            'ts_code': basic['ts_code'].to_numpy()[rows],
+            'trade_date': cal.strftime('%Y%m%d').to_numpy()[day_idx],
+            'settle': np.round(settle, 4),
+            'close': np.round(close, 4),
+        })
+        first = np.r_[True, rows[1:] != rows[:-1]]
+        df['pre_settle'] = np.where(first, df['settle'], df['settle'].shift(1))
+        df['pre_close'] = np.where(first, df['close'], df['close'].shift(1))
+        wiggle = np.abs(self._rng.standard_normal(len(rows))) * 0.03
+        df['open'] = df['pre_close']
+        df['high'] = np.round(np.maximum(df['open'], df['close']) * (1 + wiggle), 4)
+        df['low'] = np.round(np.minimum(df['open'], df['close']) * (1 - wiggle), 4)
+        atm_weight = np.exp(-(moneyness / 0.05) ** 2)
+        df['vol'] = np.round(self._rng.poisson(200 + 3000 * atm_weight)).astype(float)
+        df['amount'] = np.round(df['vol'] * df['close'], 4)  # 万元: 成交张数 × 价格 × 合约单位10000 / 10000
+        return df[OPT_DAILY_FIELDS]
+
+    def etf_frame(self, ts_code=None):
+        """与 DataProcessor.get_etf_price 返回一致的 ETF 数据 (trade_date 为 datetime)"""
+        df = self.etf_daily[ts_code or self.underlyings[0]].copy()
+        df['trade_date'] = pd.to_datetime(df['trade_date'])
+        return df
+
+    def merged_frame(self, ts_code=None):
+        """与 DataProcessor.get_opt_merge_data 返回一致的期权合并数据"""
+        ts_code = ts_code or self.underlyings[0]
+        basic = self.opt_basic[self.opt_basic['opt_code'] == f'OP{ts_code}']
+        merged = self.opt_daily.merge(basic, on='ts_code', how='inner')
+        return merged.sort_values(['ts_code', 'trade_date']).reset_index(drop=True)
+
+
+class FakeProApi:
+    """
+    离线的 tushare pro_api 替身，接口与字段同 DataProcessor 所用的 opt_basic / opt_daily / fund_daily
+    """
+
+    def __init__(self, market, latency=0.0):
+        """
+        :param market: SyntheticMarket 实例
+        :param latency: 每次调用模拟的网络延迟 (秒)
+        """
+        self.market = market
+        self.latency = latency
+        self.calls = {}
+        self._daily_by_code = {code: idx for code, idx in market.opt_daily.groupby('ts_code').indices.items()}
+
+    def _record(self, endpoint):
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _select_fields(df, fields):
+        if fields:
+            df = df[[f.strip() for f in fields.split(',')]]
+        return df.reset_index(drop=True)
+
+    def opt_basic(self, exchange=None, fields=None, **kwargs):
+        self._record('opt_basic')
+        return self._select_fields(self.market.opt_basic.copy(), fields)
+
+    def opt_daily(self, ts_code=None, trade_date=None, start_date=None, end_date=None, fields=None, **kwargs):
+        self._record('opt_daily')
+        df = self.market.opt_daily
+        if ts_code is not None:
+            df = df.iloc[self._daily_by_code.get(ts_code, [])]
+        if trade_date is not None:
+            df = df[df['trade_date'] == trade_date]
+        if start_date is not None:
+            df = df[df['trade_date'] >= start_date]
+        if end_date is not None:
+            df = df[df['trade_date'] <= end_date]
+        return self._select_fields(df.copy(), fields)
+
+    def fund_daily(self, ts_code=None, trade_date=None, start_date=None, end_date=None, fields=None, **kwargs):
+        self._record('fund_daily')
+        df = self.market.etf_daily.get(ts_code, pd.DataFrame(columns=ETF_FIELDS))
+        if trade_date is not None:
+            df = df[df['trade_date'] == trade_date]
+        if start_date is not None:
+            df = df[df['trade_date'] >= start_date]
+        if end_date is not None:
+            df = df[df['trade_date'] <= end_date]
+        # tushare 日线按日期降序返回
+        df = df.sort_values('trade_date', ascending=False)
+        return self._select_fields(df.copy(), fields)
+
+
+def make_fund_nav_panel(n_funds=30, n_days=500, n_factors=3, seed=0, start_date='2021-01-04'):
+    """
+    生成基金净值面板 (行: 日期, 列: 基金)，用于 NCO 调仓基准；收益由少数公共因子 + 特异噪声驱动
+
+    :return: DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0.0002, 0.008, (n_days, n_factors))
+    loadings = rng.normal(0, 1, (n_factors, n_funds))
+    groups = rng.integers(0, n_factors, n_funds)
+    loadings[groups, np.arange(n_funds)] += 2.0
+    rets = factors @ loadings * 0.4 + rng.normal(0.0001, 0.006, (n_days, n_funds))
+    nav = np.exp(np.cumsum(rets, axis=0))
+    index = pd.bdate_range(start_date, periods=n_days)
+    return pd.DataFrame(nav, index=index, columns=[f'F{i:04d}' for i in range(n_funds)])
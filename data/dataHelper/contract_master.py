@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+期权合约主表：一次向量化正则解析 opt_basic 的合约名称 (如 南方中证500ETF期权2401认购4.60)，
+得到标的、到期月份、行权价、认购/认沽与调整合约标记等类型化字段，并建立按标的 (代码与完整名称)、
+到期月份、(标的, 到期月份) 的哈希索引和按行权价排序的索引，筛选任意子集只需索引查找而不是字符串扫描
+"""
+
+import numpy as np
+import pandas as pd
+
+# 标的基金名称 + '期权' + 到期年月(YYMM) + 认购/认沽 + 行权价 + 可选的调整合约标记 'A'
+NAME_PATTERN = (r'^(?P<underlying_name>.+?)期权(?P<expiry_month>\d{4})'
+                r'(?P<cp_name>认购|认沽)(?P<strike>\d+(?:\.\d+)?)(?P<adjusted_flag>A?)$')
+
+CALL_PUT_MAP = {'认购': 'C', '认沽': 'P'}
+
+
+class ContractMaster:
+    """
+    期权合约主表与索引
+    """
+
+    def __init__(self, opt_basic_data):
+        """
+        :param opt_basic_data: DataProcessor.get_opt_basic 返回的合约列表 (DataFrame)
+        """
+        self.source = opt_basic_data
+        self.frame = self._parse(opt_basic_data)
+        self._build_indexes()
+
+    @staticmethod
+    def _parse(opt_basic_data):
+        names = opt_basic_data['name'].astype(str)
+        parsed = names.str.extract(NAME_PATTERN)
+        frame = pd.DataFrame(index=opt_basic_data.index)
+        frame['ts_code'] = opt_basic_data['ts_code'].to_numpy()
+        # 标的代码取自 opt_code (OP510500.SH -> 510500.SH)，名称解析失败时仍可用
+        if 'opt_code' in opt_basic_data.columns:
+            frame['underlying'] = opt_basic_data['opt_code'].astype(str).str.replace(r'^OP', '', regex=True)
+        else:
+            frame['underlying'] = parsed['underlying_name']
+        # 完整的标的基金名称 (如 华夏上证50ETF)；名称末尾的 'xxETF' 不能区分标的 (上证50 与两只科创50 均为 50ETF)
+        frame['underlying_name'] = parsed['underlying_name']
+        frame['expiry_month'] = pd.to_numeric('20' + parsed['expiry_month'], errors='coerce').astype('Int64')
+        frame['call_put'] = parsed['cp_name'].map(CALL_PUT_MAP)
+        frame['strike'] = pd.to_numeric(parsed['strike'], errors='coerce')
+        if 'exercise_price' in opt_basic_data.columns:
+            frame['strike'] = frame['strike'].fillna(pd.to_numeric(opt_basic_data['exercise_price'], errors='coerce'))
+        # 除息调整后的合约: 名称带 'A' 或行权价不是 0.01 的整数倍
+        off_grid = (frame['strike'] * 100 - (frame['strike'] * 100).round()).abs() > 1e-6
+        frame['adjusted'] = (parsed['adjusted_flag'] == 'A') | off_grid
+        if 'maturity_date' in opt_basic_data.columns:
+            frame['maturity_date'] = pd.to_datetime(opt_basic_data['maturity_date'].astype(str), errors='coerce')
+        frame['parsed'] = parsed['cp_name'].notna()
+        return frame.reset_index(drop=True)
+
+    def _build_indexes(self):
+        frame = self.frame
+        self.by_underlying = {k: np.sort(v) for k, v in frame.groupby('underlying', sort=False).indices.items()}
+        self.by_underlying_name = {k: np.sort(v) for k, v in
+                                   frame.groupby('underlying_name', sort=False).indices.items()}
+        self.by_expiry = {int(k): np.sort(v) for k, v in
+                          frame.dropna(subset=['expiry_month']).groupby('expiry_month', sort=False).indices.items()}
+        self.by_code = pd.Index(frame['ts_code'])
+        # (标的, 到期月份) -> 按行权价排序的位置与行权价，用 searchsorted 做区间查找
+        self._by_chain = {}
+        strikes = frame['strike'].to_numpy()
+        chains = frame.dropna(subset=['expiry_month']).groupby(['underlying', 'expiry_month'], sort=False).indices
+        for (underlying, expiry), positions in chains.items():
+            order = positions[np.argsort(strikes[positions], kind='stable')]
+            self._by_chain[(underlying, int(expiry))] = (order, strikes[order])
+        # 全表按行权价排序
+        self._strike_order = np.argsort(strikes, kind='stable')
+        self._strike_sorted = strikes[self._strike_order]
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def underlyings(self):
+        return sorted(self.by_underlying)
+
+    @property
+    def expiry_months(self):
+        return sorted(self.by_expiry)
+
+    def positions(self, underlying=None, underlying_name=None, expiry_month=None, call_put=None,
+                  strike_min=None, strike_max=None, include_adjusted=True):
+        """
+        按条件查找合约在主表中的行号 (升序)
+
+        参数:
+            underlying (str): 标的代码，如 '510500.SH'
+            underlying_name (str): 完整的标的基金名称，如 '南方中证500ETF'
+            expiry_month (int): 到期年月，如 202401
+            call_put (str): 'C' 或 'P'
+            strike_min (float): 行权价下限 (含)
+            strike_max (float): 行权价上限 (含)
+            include_adjusted (bool): 是否包含调整合约
+        返回:
+            numpy.ndarray: 行号
+        """
+        empty = np.empty(0, dtype=int)
+        subsets = []
+        if underlying is not None and expiry_month is not None:
+            # 同一条期权链: 行权价区间直接在该链的有序数组上查找
+            order, strikes = self._by_chain.get((underlying, int(expiry_month)), (empty, np.empty(0)))
+            subsets.append(np.sort(order[self._strike_range(strikes, strike_min, strike_max)]))
+        else:
+            if underlying is not None:
+                subsets.append(self.by_underlying.get(underlying, empty))
+            if expiry_month is not None:
+                subsets.append(self.by_expiry.get(int(expiry_month), empty))
+            if strike_min is not None or strike_max is not None:
+                in_range = self._strike_order[self._strike_range(self._strike_sorted, strike_min, strike_max)]
+                subsets.append(np.sort(in_range))
+        if underlying_name is not None:
+            subsets.append(self.by_underlying_name.get(underlying_name, empty))
+
+        if subsets:
+            candidates = subsets[0]
+            for subset in subsets[1:]:
+                candidates = np.intersect1d(candidates, subset, assume_unique=True)
+        else:
+            candidates = np.arange(len(self.frame))
+        if call_put is not None:
+            candidates = candidates[self.frame['call_put'].to_numpy()[candidates] == call_put]
+        if not include_adjusted:
+            candidates = candidates[~self.frame['adjusted'].to_numpy()[candidates]]
+        return candidates
+
+    @staticmethod
+    def _strike_range(sorted_strikes, strike_min, strike_max):
+        lo = 0 if strike_min is None else np.searchsorted(sorted_strikes, strike_min - 1e-9, side='left')
+        hi = len(sorted_strikes) if strike_max is None else \
+            np.searchsorted(sorted_strikes, strike_max + 1e-9, side='right')
+        return slice(lo, hi)
+
+    def select(self, **conditions):
+        """
+        按条件筛选，返回原始 opt_basic 行 (列与顺序同输入)，条件同 positions
+        """
+        return self.source.iloc[self.positions(**conditions)]
+
+    def lookup(self, ts_codes):
+        """
+        按合约代码取类型化字段
+        :param ts_codes: 合约代码序列
+        :return: DataFrame，行与 ts_codes 一一对应，未知代码为空值
+        """
+        idx = self.by_code.get_indexer(pd.Index(ts_codes))
+        result = self.frame.reindex(idx)
+        result.index = pd.Index(ts_codes, name='ts_code')
+        return result
@@ -5,9 +5,17 @@
 数据处理辅助模块：包含期权数据的处理和筛选逻辑
 """
 
-import pandas as pd
+import logging
 import os
-import time
+import shutil
+
+import pandas as pd
+
+from .contract_master import ContractMaster
+from .instrumentation import get_recorder
+from .response_cache import CachedProApi
+
+logger = logging.getLogger(__name__)
 
 
 class DataProcessor:
@@ -24,58 +32,144 @@ class DataProcessor:
         '1000': '1000ETF'
     }
 
-    def __init__(self, pro_api):
+    # tushare 限制每分钟150次接口请求
+    API_INTERVAL = 0.4
+
+    OPT_DAILY_FIELDS = 'ts_code,trade_date,pre_settle,pre_close,open,high,low,close,settle,vol,amount'
+    # pre_close 为交易所公布的前收盘价 (除息日经过调整)，用于开仓保证金
+    ETF_DAILY_FIELDS = 'ts_code,trade_date,open,high,low,close,pre_close,vol,amount'
+
+    def __init__(self, pro_api, recorder=None, data_dir=None, api_interval=None, cache=None):
         """
         初始化
         
         参数:
             pro_api: Tushare pro_api 实例
+            recorder (PerfRecorder): 性能记录器，默认使用进程内默认记录器
+            data_dir (str): 本地缓存根目录，默认为本模块所在目录
+            api_interval (float): 逐合约请求之间的等待秒数，默认 API_INTERVAL
+            cache (ResponseCache): 共享的接口响应缓存，传入时只有真正请求接口才按 api_interval 限频
         """
+        self.recorder = recorder or get_recorder()
+        self.data_dir = data_dir or os.path.dirname(os.path.abspath(__file__))
+        self.api_interval = self.API_INTERVAL if api_interval is None else api_interval
+        self.cache = cache
+        if cache is not None:
+            pro_api = CachedProApi(pro_api, cache, min_interval=self.api_interval, recorder=self.recorder)
         self.pro = pro_api
+        self._contract_master = None
+
+    def _call_api(self, endpoint, **kwargs):
+        """
+        调用 Tushare 接口并记录耗时、调用次数与返回行数
+        使用响应缓存时 api_calls 由 CachedProApi 只在真正请求接口时计数，缓存命中另计为 api_cache_hits
+        """
+        with self.recorder.stage('api'):
+            df = getattr(self.pro, endpoint)(**kwargs)
+        if self.cache is None:
+            self.recorder.incr('api_calls')
+        self.recorder.incr('api_rows', len(df))
+        return df
+
+    def _read_csv(self, file_path):
+        """读取本地缓存 CSV，记为一次缓存命中"""
+        logger.debug("文件%s已存在", file_path)
+        with self.recorder.stage('parse'):
+            df = pd.read_csv(file_path)
+        self.recorder.incr('cache_hits')
+        self.recorder.incr('rows_read', len(df))
+        self.recorder.incr('bytes_read', os.path.getsize(file_path))
+        return df
+
+    def _write_csv(self, data, folder_path, file_name):
+        """写入本地缓存 CSV 并记录写入行数与字节数"""
+        with self.recorder.stage('write'):
+            self.save_csv_data_simple(data, folder_path, file_name)
+        self.recorder.incr('rows_written', len(data))
+        self.recorder.incr('bytes_written', os.path.getsize(os.path.join(folder_path, file_name)))
+
+    @staticmethod
+    def _suffix(live):
+        """live 模式的缓存文件另行命名，避免与历史回测的缓存混用"""
+        return '_live' if live else ''
 
-    def get_opt_basic(self, exchange, start_date, end_date):
+    def get_opt_basic(self, exchange, start_date, end_date, live=False):
+        """
+        获取期权合约列表
+
+        参数:
+            exchange (str): 交易所代码
+            start_date (str): 开始日期，格式YYYYMMDD
+            end_date (str): 结束日期，格式YYYYMMDD
+            live (bool): False 时只保留区间内已摘牌的合约 (历史回测)；
+                         True 时保留区间内上市的全部合约，包括尚未到期的 (逐日更新)
+        """
         # 获取后存到文件中
-        current_script_path = os.path.abspath(__file__)
-        data_dir = os.path.dirname(current_script_path)
-        folder_path = os.path.join(data_dir, 'opt_basic', exchange)
-        file_name = f'opt_basic_{exchange}_{start_date}_{end_date}.csv'  # 修改文件名格式
+        folder_path = os.path.join(self.data_dir, 'opt_basic', exchange)
+        file_name = f'opt_basic_{exchange}_{start_date}_{end_date}{self._suffix(live)}.csv'  # 修改文件名格式
         opt_basic_file = os.path.join(folder_path, file_name)
 
         if not os.path.exists(opt_basic_file):
-            ts_data = self.pro.opt_basic(
+            self.recorder.incr('cache_misses')
+            ts_data = self._call_api(
+                'opt_basic',
                 exchange=exchange,
                 fields='ts_code,name,opt_code,opt_type,call_put,exercise_price,maturity_date,list_date,delist_date'
             )
 
-            ts_data = ts_data[
-                (ts_data['list_date'] >= start_date) &
-                (ts_data['delist_date'] <= end_date)
-                ]
-            self.save_csv_data_simple(ts_data, folder_path, file_name)
+            if live:
+                ts_data = ts_data[
+                    (ts_data['list_date'] >= start_date) &
+                    (ts_data['list_date'] <= end_date)
+                    ]
+            else:
+                ts_data = ts_data[
+                    (ts_data['list_date'] >= start_date) &
+                    (ts_data['delist_date'] <= end_date)
+                    ]
+            self._write_csv(ts_data, folder_path, file_name)
         else:
-            print(f"文件{opt_basic_file}已存在")
-            ts_data = pd.read_csv(opt_basic_file)
+            ts_data = self._read_csv(opt_basic_file)
             # 确保日期字段是字符串类型（与Tushare返回格式一致）
             ts_data['list_date'] = ts_data['list_date'].astype(str)
             ts_data['delist_date'] = ts_data['delist_date'].astype(str)
             ts_data['name'] = ts_data['name'].astype(str)
+        # 每次刷新 opt_basic 后重建合约主表
+        with self.recorder.stage('contract_master'):
+            self._contract_master = ContractMaster(ts_data)
         return ts_data
 
-    def get_opt_specific(self, opt_basic_data, trade_dates, option_type, exchange, start_date, end_date):
+    def get_contract_master(self, opt_basic_data):
+        """
+        获取合约主表，opt_basic_data 与上次构建时是同一份数据时直接复用
+
+        参数:
+            opt_basic_data (DataFrame): get_opt_basic 返回的合约列表
+        返回:
+            ContractMaster: 合约主表
+        """
+        if self._contract_master is None or self._contract_master.source is not opt_basic_data:
+            with self.recorder.stage('contract_master'):
+                self._contract_master = ContractMaster(opt_basic_data)
+        return self._contract_master
+
+    def get_opt_specific(self, opt_basic_data, trade_dates, option_type, exchange, start_date, end_date, live=False):
         keyword_option = self.OPTION_MAP.get(option_type)
-        opt_specific = opt_basic_data.loc[opt_basic_data['name'].str.contains(keyword_option)]
-        current_script_path = os.path.abspath(__file__)
-        data_dir = os.path.dirname(current_script_path)
-        folder_path = os.path.join(data_dir, 'opt_specific', exchange)
-        file_name = f'opt_specific_{keyword_option}_{exchange}_{start_date}_{end_date}.csv'  # 修改文件名格式
+        folder_path = os.path.join(self.data_dir, 'opt_specific', exchange)
+        file_name = f'opt_specific_{keyword_option}_{exchange}_{start_date}_{end_date}{self._suffix(live)}.csv'
         opt_specific_file = os.path.join(folder_path, file_name)
         if not os.path.exists(opt_specific_file):
+            self.recorder.incr('cache_misses')
+            # 通过合约主表的标的代码索引筛选 (名称关键字不能唯一确定标的，如 50ETF)
+            underlying = {v: k for k, v in self.ETF_TSCODE_MAP.items()}.get(keyword_option)
+            if underlying is None:
+                raise ValueError(f"未知的期权标的类型 {option_type}，请在 OPTION_MAP / ETF_TSCODE_MAP 中配置标的代码")
+            opt_specific = self.get_contract_master(opt_basic_data).select(underlying=underlying)
             # 按照list_date升序排序
             opt_specific = opt_specific.sort_values('ts_code')
-            self.save_csv_data_simple(opt_specific, folder_path, file_name)
+            self._write_csv(opt_specific, folder_path, file_name)
         else:
-            print(f"文件{opt_specific_file}已存在")
-            opt_specific = pd.read_csv(opt_specific_file)
+            opt_specific = self._read_csv(opt_specific_file)
             # 确保日期字段是字符串类型（与Tushare返回格式一致）
             opt_specific['list_date'] = opt_specific['list_date'].astype(str)
             opt_specific['delist_date'] = opt_specific['delist_date'].astype(str)
@@ -90,11 +184,6 @@ class DataProcessor:
             folder_path (str): 文件夹路径
             file_name (str): 文件名称
         """
-
-        print(f"尝试保存到: {folder_path + file_name}")
-        print(f"目录是否存在: {os.path.exists(folder_path)}")
-        print(f"写入权限: {os.access(folder_path, os.W_OK)}")
-
         # 确保文件夹存在
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
@@ -102,10 +191,11 @@ class DataProcessor:
         file_path = os.path.join(folder_path, file_name)
         # 保存数据到CSV文件
         data.to_csv(file_path, index=False)
-        print(f"数据已保存至 {file_path}")
+        logger.debug("数据已保存至 %s", file_path)
         return 1
 
-    def get_opt_merge_data(self, opt_specific_data, trade_dates, option_type, exchange, start_date, end_date):
+    def get_opt_merge_data(self, opt_specific_data, trade_dates, option_type, exchange, start_date, end_date,
+                           live=False):
         """
         获取期权基础信息与日线数据的合并数据
         
@@ -114,6 +204,7 @@ class DataProcessor:
             exchange (str): 交易所代码
             start_date (str): 开始日期，格式YYYYMMDD
             end_date (str): 结束日期，格式YYYYMMDD
+            live (bool): 逐日更新模式，合约包含未到期的，只保留 end_date 及之前的行情
             
         返回:
             DataFrame: 合并后的数据
@@ -121,26 +212,26 @@ class DataProcessor:
         merged_data = pd.DataFrame()
         keyword_option = self.OPTION_MAP.get(option_type)
 
-        current_script_path = os.path.abspath(__file__)
-        data_dir = os.path.dirname(current_script_path)
-        folder_path = os.path.join(data_dir, 'opt_merged', exchange)
-        file_name = f'opt_merged_{keyword_option}_{exchange}_{start_date}_{end_date}.csv'
+        folder_path = os.path.join(self.data_dir, 'opt_merged', exchange)
+        file_name = f'opt_merged_{keyword_option}_{exchange}_{start_date}_{end_date}{self._suffix(live)}.csv'
         opt_merged_file = os.path.join(folder_path, file_name)
-        print(f"合并文件路径: {opt_merged_file}")
-        # return 777
+        logger.debug("合并文件路径: %s", opt_merged_file)
         if not os.path.exists(opt_merged_file):
+            self.recorder.incr('cache_misses')
             for opt_specific_item in opt_specific_data.itertuples():
-                # tushare 限制每分钟150次接口请求
-                time.sleep(0.4)  # 避免请求过快
+                # tushare 限制每分钟150次接口请求 (使用响应缓存时由 CachedProApi 只在未命中时限频)
+                if self.cache is None:
+                    self.recorder.sleep(self.api_interval)  # 避免请求过快
                 
                 # 合约的所有交易日数据
-                opt_dailys = self.pro.opt_daily(
+                opt_dailys = self._call_api(
+                    'opt_daily',
                     ts_code=opt_specific_item.ts_code,
-                    fields='ts_code,trade_date,pre_settle,pre_close,open,high,low,close,settle,vol,amount'
+                    fields=self.OPT_DAILY_FIELDS
                 )
                 
                 if opt_dailys.empty:
-                    print(f"合约 {opt_specific_item.ts_code} 没有交易数据")
+                    logger.info("合约 %s 没有交易数据", opt_specific_item.ts_code)
                     continue
                     
                 # 将期权基础信息添加到每一行日线数据中
@@ -152,19 +243,22 @@ class DataProcessor:
                 opt_dailys = opt_dailys.assign(**{col: getattr(opt_specific_item, col) for col in opt_specific_data.columns if col != 'ts_code'})
                 
                 # 将 opt_dailys 追加到 merged_data
-                merged_data = pd.concat([merged_data, opt_dailys], ignore_index=True)
-            merged_data = merged_data.sort_values(by=['ts_code', 'trade_date'])
+                with self.recorder.stage('merge'):
+                    merged_data = pd.concat([merged_data, opt_dailys], ignore_index=True)
+            with self.recorder.stage('merge'):
+                if live and not merged_data.empty:
+                    merged_data = merged_data[merged_data['trade_date'] <= end_date]
+                merged_data = merged_data.sort_values(by=['ts_code', 'trade_date'])
             # 保存到CSV文件
-            self.save_csv_data_simple(merged_data, folder_path, file_name)
+            self._write_csv(merged_data, folder_path, file_name)
         else:
-            print(f"文件{opt_merged_file}已存在")
-            merged_data = pd.read_csv(opt_merged_file)
+            merged_data = self._read_csv(opt_merged_file)
             # 确保日期字段是字符串类型（与Tushare返回格式一致）
             merged_data['trade_date'] = merged_data['trade_date'].astype(str)
 
         # 如果没有数据，返回空DataFrame
         if merged_data.empty:
-            print("没有找到任何合并数据")
+            logger.warning("没有找到任何合并数据")
         
         return merged_data
 
@@ -180,44 +274,143 @@ class DataProcessor:
         返回:
             pandas.DataFrame: 指定ETF的价格数据
         """
-        # 获取指定ETF的日线数据
-        df = self.pro.fund_daily(
-            ts_code=ts_code,
-            start_date=start_date,
-            end_date=end_date,
-            fields='ts_code,trade_date,open,high,low,close,vol,amount'
-        )
-
-        # 按日期升序排序
-        df = df.sort_values('trade_date')
-
-        # 将日期列转换为datetime格式
-        df['trade_date'] = pd.to_datetime(df['trade_date'])
-
-        # return df
-
         # 获取后存到文件中
         keyword_etf = self.ETF_TSCODE_MAP.get(ts_code)
-        current_script_path = os.path.abspath(__file__)
-        data_dir = os.path.dirname(current_script_path)
-        folder_path = os.path.join(data_dir, 'etc_specific')
+        folder_path = os.path.join(self.data_dir, 'etc_specific')
         file_name = f'etf_specific_{keyword_etf}_{start_date}_{end_date}.csv'
         etf_specific_file = os.path.join(folder_path, file_name)
 
         if not os.path.exists(etf_specific_file):
-            ts_data = self.pro.fund_daily(
+            self.recorder.incr('cache_misses')
+            ts_data = self._call_api(
+                'fund_daily',
                 ts_code=ts_code,
                 start_date=start_date,
                 end_date=end_date,
-                fields='ts_code,trade_date,open,high,low,close,vol,amount'
+                fields=self.ETF_DAILY_FIELDS
             )
 
             ts_data = ts_data.sort_values('trade_date')
-            self.save_csv_data_simple(ts_data, folder_path, file_name)
+            self._write_csv(ts_data, folder_path, file_name)
         else:
-            print(f"文件{etf_specific_file}已存在")
-            ts_data = pd.read_csv(etf_specific_file)
+            ts_data = self._read_csv(etf_specific_file)
             # 确保日期字段是字符串类型（与Tushare返回格式一致）
             ts_data['trade_date'] = ts_data['trade_date'].astype(str)
         ts_data['trade_date'] = pd.to_datetime(ts_data['trade_date'])
         return ts_data
+
+    def _append_csv(self, data, old_file, folder_path, file_name):
+        """
+        以已有缓存文件加新行 (列顺序与原文件一致) 写出新文件名的缓存：先复制到临时文件并追加，再替换为新文件，
+        原文件保留，待整次更新成功后由 discard_live_cache 删除 (中途失败时可按原结束日期重试)
+        """
+        new_file = os.path.join(folder_path, file_name)
+        tmp_file = new_file + '.tmp'
+        with self.recorder.stage('write'):
+            header = pd.read_csv(old_file, nrows=0).columns
+            size_before = os.path.getsize(old_file)
+            shutil.copyfile(old_file, tmp_file)
+            data.reindex(columns=header).to_csv(tmp_file, mode='a', header=False, index=False)
+            os.replace(tmp_file, new_file)
+        self.recorder.incr('rows_written', len(data))
+        self.recorder.incr('bytes_written', os.path.getsize(new_file) - size_before)
+
+    @staticmethod
+    def _require_cache(file_path):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(
+                f"缓存文件 {file_path} 不存在，请先以 live=True 运行 prepare_backtest_data_origin 建立初始缓存")
+
+    def discard_live_cache(self, ts_code, option_type, exchange, start_date, end_date):
+        """
+        删除被新结束日期取代的 live 缓存 (ETF 日线、合约列表 opt_basic / opt_specific 与合并数据)，
+        在逐日更新的新缓存全部写出 (并保存快照) 之后调用
+        """
+        keyword_etf = self.ETF_TSCODE_MAP.get(ts_code)
+        keyword_option = self.OPTION_MAP.get(option_type)
+        suffix = self._suffix(True)
+        for path in (
+                os.path.join(self.data_dir, 'etc_specific', f'etf_specific_{keyword_etf}_{start_date}_{end_date}.csv'),
+                os.path.join(self.data_dir, 'opt_basic', exchange, f'opt_basic_{exchange}_{start_date}_{end_date}{suffix}.csv'),
+                os.path.join(self.data_dir, 'opt_specific', exchange,
+                             f'opt_specific_{keyword_option}_{exchange}_{start_date}_{end_date}{suffix}.csv'),
+                os.path.join(self.data_dir, 'opt_merged', exchange,
+                             f'opt_merged_{keyword_option}_{exchange}_{start_date}_{end_date}{suffix}.csv')):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def append_etf_price(self, ts_code, start_date, prev_end_date, end_date):
+        """
+        逐日更新：只请求 prev_end_date 之后的ETF日线，与已有缓存一起写出新结束日期的缓存 (原缓存保留)
+
+        参数:
+            ts_code (str): ETF的代码
+            start_date (str): 缓存的开始日期，格式YYYYMMDD
+            prev_end_date (str): 已有缓存的结束日期
+            end_date (str): 新的结束日期
+
+        返回:
+            pandas.DataFrame: 更新后的全部ETF价格数据 (trade_date 为 datetime)
+        """
+        keyword_etf = self.ETF_TSCODE_MAP.get(ts_code)
+        folder_path = os.path.join(self.data_dir, 'etc_specific')
+        old_file = os.path.join(folder_path, f'etf_specific_{keyword_etf}_{start_date}_{prev_end_date}.csv')
+        self._require_cache(old_file)
+        old_data = self._read_csv(old_file)
+
+        first_new = (pd.Timestamp(prev_end_date) + pd.Timedelta(days=1)).strftime('%Y%m%d')
+        new_data = self._call_api(
+            'fund_daily',
+            ts_code=ts_code,
+            start_date=first_new,
+            end_date=end_date,
+            fields=self.ETF_DAILY_FIELDS
+        )
+        new_data = new_data.sort_values('trade_date')
+        self._append_csv(new_data, old_file, folder_path, f'etf_specific_{keyword_etf}_{start_date}_{end_date}.csv')
+
+        old_data['trade_date'] = old_data['trade_date'].astype(str)
+        ts_data = pd.concat([old_data, new_data.reindex(columns=old_data.columns)], ignore_index=True)
+        ts_data['trade_date'] = pd.to_datetime(ts_data['trade_date'])
+        return ts_data
+
+    def append_opt_merge_data(self, opt_specific_data, trade_dates, option_type, exchange, start_date,
+                              prev_end_date, end_date):
+        """
+        逐日更新：每个新交易日只请求一次全市场 opt_daily(trade_date=...)，按合约列表筛选并合并基础信息，
+        与已有的 live 模式合并缓存一起写出新结束日期的缓存 (原缓存保留；追加的行按交易日排列，使用方需自行排序)
+
+        参数:
+            opt_specific_data (DataFrame): 更新后的期权基础信息 (含新上市合约)
+            trade_dates (list): 新交易日，格式YYYYMMDD
+            option_type (str): 期权类型，如 '500'
+            exchange (str): 交易所代码
+            start_date (str): 缓存的开始日期
+            prev_end_date (str): 已有缓存的结束日期
+            end_date (str): 新的结束日期
+
+        返回:
+            DataFrame: 新追加的合并数据
+        """
+        keyword_option = self.OPTION_MAP.get(option_type)
+        folder_path = os.path.join(self.data_dir, 'opt_merged', exchange)
+        old_file = os.path.join(folder_path, f'opt_merged_{keyword_option}_{exchange}_{start_date}_{prev_end_date}'
+                                             f'{self._suffix(True)}.csv')
+        self._require_cache(old_file)
+
+        dailys = []
+        for trade_date in trade_dates:
+            dailys.append(self._call_api(
+                'opt_daily',
+                trade_date=trade_date,
+                exchange=exchange,
+                fields=self.OPT_DAILY_FIELDS
+            ))
+        with self.recorder.stage('merge'):
+            new_rows = pd.concat(dailys, ignore_index=True) if dailys else \
+                pd.DataFrame(columns=self.OPT_DAILY_FIELDS.split(','))
+            new_rows = new_rows.merge(opt_specific_data, on='ts_code', how='inner')
+            new_rows = new_rows.sort_values(by=['trade_date', 'ts_code'], ignore_index=True)
+        self._append_csv(new_rows, old_file, folder_path,
+                         f'opt_merged_{keyword_option}_{exchange}_{start_date}_{end_date}{self._suffix(True)}.csv')
+        return new_rows
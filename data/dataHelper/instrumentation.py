@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能埋点模块：数据管道与策略运行的分阶段计时、计数与可选的 cProfile/tracemalloc 采样
+
+用法:
+    recorder = get_recorder()
+    with recorder.run('prepare_backtest_data_origin'):
+        with recorder.stage('api'):
+            ...
+        recorder.incr('api_calls')
+    recorder.to_json('perf.json')
+
+环境变量:
+    BACKTEST_PROFILE      逗号分隔，可选 cprofile / tracemalloc，对每次 run 开启对应采样
+    BACKTEST_PROFILE_DIR  cProfile 结果 (.prof) 输出目录，默认当前目录
+"""
+
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+PROFILE_ENV = 'BACKTEST_PROFILE'
+PROFILE_DIR_ENV = 'BACKTEST_PROFILE_DIR'
+
+# 每个记录器保留的 run 数上限 (参数扫描中反复调用 instrumented_run 时避免无限增长)
+MAX_RUNS = 1000
+
+# 数据管道统一使用的计数器名称
+COUNTERS = (
+    'api_calls', 'api_rows',
+    'rows_read', 'rows_written',
+    'bytes_read', 'bytes_written',
+    'cache_hits', 'cache_misses',
+    'api_cache_hits', 'api_cache_misses', 'api_cache_shared', 'api_cache_bytes',
+    'sleep_seconds',
+)
+
+
+def _profile_modes():
+    raw = os.environ.get(PROFILE_ENV, '')
+    return {m.strip().lower() for m in raw.split(',') if m.strip()}
+
+
+class _Bucket:
+    """一次 run (或全局累计) 的计时与计数"""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def add_stage(self, name, elapsed):
+        stat = self.stages.setdefault(name, {'calls': 0, 'total_s': 0.0, 'max_s': 0.0})
+        stat['calls'] += 1
+        stat['total_s'] += elapsed
+        stat['max_s'] = max(stat['max_s'], elapsed)
+
+    def incr(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        return {
+            'stages': {k: dict(v) for k, v in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+
+class PerfRecorder:
+    """
+    性能记录器：嵌套阶段计时 (名称以 '/' 拼接父阶段)、计数器、按 run 汇总并导出 JSON
+
+    阶段栈与当前 run 按线程保存 (各线程的阶段各自嵌套，计数只计入本线程所在的 run)，
+    汇总桶的更新加锁，多个线程可共用同一个记录器
+    """
+
+    def __init__(self, max_runs=MAX_RUNS):
+        """
+        参数:
+            max_runs (int): 保留最近的 run 数，超出后丢弃最早的记录，None 为不限
+        """
+        self.max_runs = max_runs
+        self.totals = _Bucket()
+        self.runs = deque(maxlen=max_runs)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def _stage_stack(self):
+        if not hasattr(self._local, 'stage_stack'):
+            self._local.stage_stack = []
+        return self._local.stage_stack
+
+    @property
+    def _active(self):
+        if not hasattr(self._local, 'active'):
+            self._local.active = []
+        return self._local.active
+
+    def reset(self):
+        """清空所有已记录的数据 (在原有的锁下原地清空，其他线程正在进行的阶段与 run 不受影响)"""
+        with self._lock:
+            self.totals.stages.clear()
+            self.totals.counters.clear()
+            self.runs.clear()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        计时一个阶段，嵌套调用时记录为 'parent/child'
+
+        参数:
+            name (str): 阶段名称，如 'api'、'parse'、'merge'、'write'
+        """
+        full_name = '/'.join(self._stage_stack + [name])
+        self._stage_stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stage_stack.pop()
+            with self._lock:
+                self.totals.add_stage(full_name, elapsed)
+                for bucket in self._active:
+                    bucket.add_stage(full_name, elapsed)
+
+    def incr(self, name, value=1):
+        """
+        累加计数器
+
+        参数:
+            name (str): 计数器名称，见 COUNTERS
+            value (int|float): 增量
+        """
+        with self._lock:
+            self.totals.incr(name, value)
+            for bucket in self._active:
+                bucket.incr(name, value)
+
+    def sleep(self, seconds):
+        """带计时的 time.sleep，用于接口限频等待"""
+        with self.stage('sleep'):
+            time.sleep(seconds)
+        self.incr('sleep_seconds', seconds)
+
+    @contextmanager
+    def run(self, name, **meta):
+        """
+        记录一次完整运行 (数据准备或策略回测)，结束后追加到 self.runs
+
+        参数:
+            name (str): 运行名称
+            meta: 附加信息 (如日期区间、策略参数)，原样写入结果
+        """
+        modes = _profile_modes()
+        bucket = _Bucket()
+        self._active.append(bucket)
+
+        profiler = None
+        if 'cprofile' in modes:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started_tracemalloc = False
+        if 'tracemalloc' in modes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracemalloc = True
+
+        record = {'name': name, 'meta': meta, 'started_at': time.time()}
+        try:
+            with self.stage(name):
+                start = time.perf_counter()
+                try:
+                    yield record
+                finally:
+                    record['wall_s'] = time.perf_counter() - start
+                    if profiler is not None:
+                        profiler.disable()
+                        record['cprofile_path'] = self._dump_profile(profiler, name)
+                    if 'tracemalloc' in modes and tracemalloc.is_tracing():
+                        current, peak = tracemalloc.get_traced_memory()
+                        record['tracemalloc'] = {'current_bytes': current, 'peak_bytes': peak}
+                        if started_tracemalloc:
+                            tracemalloc.stop()
+                    self._active.remove(bucket)
+        finally:
+            with self._lock:
+                record.update(bucket.to_dict())
+                self.runs.append(record)
+
+    @staticmethod
+    def _dump_profile(profiler, name):
+        folder = os.environ.get(PROFILE_DIR_ENV, os.getcwd())
+        os.makedirs(folder, exist_ok=True)
+        safe_name = re.sub(r'[^\w.-]+', '_', name)
+        path = os.path.join(folder, f'{safe_name}_{int(time.time() * 1000)}.prof')
+        profiler.dump_stats(path)
+        return path
+
+    def to_dict(self):
+        """导出为可 JSON 序列化的 dict"""
+        with self._lock:
+            data = self.totals.to_dict()
+            data['runs'] = [dict(r) for r in self.runs]
+        return data
+
+    def to_json(self, path=None, indent=2):
+        """
+        导出为 JSON
+
+        参数:
+            path (str): 写入的文件路径，为 None 时只返回字符串
+        返回:
+            str: JSON 字符串
+        """
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=indent, default=str)
+        if path is not None:
+            folder = os.path.dirname(os.path.abspath(path))
+            os.makedirs(folder, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+
+_default_recorder = PerfRecorder()
+
+
+def get_recorder():
+    """返回进程内默认的记录器"""
+    return _default_recorder
+
+
+def set_recorder(recorder):
+    """替换进程内默认的记录器，返回旧的记录器"""
+    global _default_recorder
+    old, _default_recorder = _default_recorder, recorder
+    return old
+
+
+def instrumented_run(name=None):
+    """
+    方法装饰器：把一次调用记录为 run，记录器取 self.recorder，没有时用默认记录器
+
+    参数:
+        name (str): run 名称，默认 '类名.方法名'
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            recorder = getattr(self, 'recorder', None) or get_recorder()
+            run_name = name or f'{type(self).__name__}.{method.__name__}'
+            with recorder.run(run_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tushare 接口响应缓存：按 (接口名, 规范化参数) 缓存压缩的列式 DataFrame，多个进程/研究员共享同一份额度
+
+后端:
+    RedisBackend     Redis (或 fakeredis) 客户端，TTL 由 Redis 过期控制，淘汰交给 allkeys-lru 策略
+    InMemoryBackend  进程内实现 (TTL + 按条数/字节的 LRU 淘汰)，用于测试与无 Redis 环境
+
+并发去重 (single-flight):
+    同进程内相同请求只有一个线程真正调用接口，其余线程等待结果；
+    跨进程通过后端的 SET NX 锁保证只有一个进程调用接口，其余进程轮询缓存
+
+环境变量:
+    BACKTEST_REDIS_URL  设置后 DataFetcher 默认使用 Redis 缓存，如 redis://localhost:6379/0
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import get_recorder
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL_ENV = 'BACKTEST_REDIS_URL'
+KEY_PREFIX = 'bt:tushare:'
+
+# 各接口默认缓存时间 (秒)
+DEFAULT_TTL = 12 * 3600
+ENDPOINT_TTL = {
+    'opt_basic': 24 * 3600,
+    'opt_daily': 12 * 3600,
+    'fund_daily': 12 * 3600,
+}
+
+
+def normalize_params(params):
+    """
+    规范化请求参数：去掉 None、值转字符串、fields 去空格后排序，保证同义请求得到同一个键
+    """
+    normalized = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if key == 'fields':
+            value = ','.join(sorted(f.strip() for f in str(value).split(',') if f.strip()))
+        normalized[key] = str(value)
+    return dict(sorted(normalized.items()))
+
+
+def make_cache_key(endpoint, params):
+    """
+    缓存键: 前缀 + 接口名 + 规范化参数的 sha1
+    """
+    payload = json.dumps(normalize_params(params), ensure_ascii=False, sort_keys=True)
+    digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}{endpoint}:{digest}'
+
+
+# 缓存数据格式: zlib( FRAME_MAGIC + 头部长度 (4 字节) + JSON 头部 + 各列数据 )
+# 数值 / 布尔 / 日期列为 np.save(allow_pickle=False) 的字节，其余列为 JSON 数组；
+# 缓存可能被共享 Redis 的任何人写入，解码时不执行任何可反序列化为代码的格式
+FRAME_MAGIC = b'BTFRAME1'
+_NPY_KINDS = 'biufcmM'
+
+
+def _json_value(value):
+    """对象列的单个值 -> JSON 可表示的值 (缺失值为 None)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def encode_frame(df, level=6):
+    """
+    DataFrame -> 压缩的列式字节串 (格式见 FRAME_MAGIC)
+    """
+    header, chunks = [], []
+    for col in df.columns:
+        series = df[col]
+        dtype = str(series.dtype)
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in _NPY_KINDS:
+            buffer = io.BytesIO()
+            np.save(buffer, series.to_numpy(), allow_pickle=False)
+            data, kind = buffer.getvalue(), 'npy'
+        else:
+            values = [_json_value(v) for v in series.to_numpy(dtype=object)]
+            data, kind = json.dumps(values, ensure_ascii=False).encode('utf-8'), 'json'
+        header.append({'name': str(col), 'kind': kind, 'dtype': dtype, 'nbytes': len(data)})
+        chunks.append(data)
+    head = json.dumps({'columns': header}, ensure_ascii=False).encode('utf-8')
+    return zlib.compress(FRAME_MAGIC + struct.pack('>I', len(head)) + head + b''.join(chunks), level)
+
+
+def decode_frame(blob):
+    """
+    压缩的列式字节串 -> DataFrame
+    :raises ValueError: 字节串不是 encode_frame 的格式 (直接拒绝，不尝试其他反序列化方式)
+    """
+    try:
+        raw = zlib.decompress(blob)
+        if not raw.startswith(FRAME_MAGIC):
+            raise ValueError("缓存数据格式标记不符")
+        offset = len(FRAME_MAGIC)
+        (head_len,) = struct.unpack('>I', raw[offset:offset + 4])
+        offset += 4
+        header = json.loads(raw[offset:offset + head_len].decode('utf-8'))['columns']
+        offset += head_len
+        data, names = {}, []
+        for i, meta in enumerate(header):
+            chunk = raw[offset:offset + meta['nbytes']]
+            if len(chunk) != meta['nbytes']:
+                raise ValueError("缓存数据长度不符")
+            offset += meta['nbytes']
+            if meta['kind'] == 'npy':
+                values = pd.Series(np.load(io.BytesIO(chunk), allow_pickle=False))
+            elif meta['kind'] == 'json':
+                values = pd.Series(json.loads(chunk.decode('utf-8')), dtype=object)
+            else:
+                raise ValueError(f"未知的列格式 {meta['kind']}")
+            if str(values.dtype) != meta['dtype'] and meta['dtype'] != 'object':
+                values = values.astype(meta['dtype'])
+            data[i] = values
+            names.append(meta['name'])
+        if offset != len(raw):
+            raise ValueError("缓存数据有多余字节")
+        if len({len(values) for values in data.values()}) > 1:
+            raise ValueError("缓存数据各列长度不一致")
+        df = pd.DataFrame(data)
+    except ValueError:
+        raise
+    except Exception as e:  # 共享缓存的内容不可信，任何解析错误 (含表头中的非法 dtype) 都视为格式无效
+        raise ValueError(f"缓存数据无法解析: {e}") from e
+    df.columns = names
+    return df
+
+
+class InMemoryBackend:
+    """
+    进程内缓存后端：接口与 RedisBackend 相同 (get / set / set_nx / delete)，带 TTL 与 LRU 淘汰
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=512 * 1024 ** 2):
+        """
+        :param max_entries: 最多保留的条目数
+        :param max_bytes: 最多保留的字节数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, expire_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _expired(self, key, now):
+        value, expire_at = self._data[key]
+        if expire_at is not None and expire_at <= now:
+            del self._data[key]
+            self._bytes -= len(value)
+            return True
+        return False
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data or self._expired(key, time.monotonic()):
+                return None
+            self._data.move_to_end(key)
+            return self._data[key][0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, value, ttl)
+        return True
+
+    def _set(self, key, value, ttl):
+        if key in self._data:
+            self._bytes -= len(self._data.pop(key)[0])
+        expire_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expire_at)
+        self._bytes += len(value)
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _, (old, _) = self._data.popitem(last=False)
+            self._bytes -= len(old)
+            self.evictions += 1
+
+    def set_nx(self, key, value, ttl=None):
+        with self._lock:
+            if key in self._data and not self._expired(key, time.monotonic()):
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key, expected=None):
+        with self._lock:
+            if key in self._data and (expected is None or self._data[key][0] == expected):
+                self._bytes -= len(self._data.pop(key)[0])
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Redis 缓存后端，client 可以是 redis.Redis 或 fakeredis.FakeRedis
+    """
+
+    # 只删除自己持有的锁
+    _RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url):
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+    def configure_lru(self, maxmemory=None):
+        """
+        设置服务端 LRU 淘汰策略 (需要 CONFIG 权限，托管 Redis 通常已在服务端配置)
+        :param maxmemory: 如 '2gb'，为 None 时只设置策略
+        """
+        if maxmemory is not None:
+            self.client.config_set('maxmemory', maxmemory)
+        self.client.config_set('maxmemory-policy', 'allkeys-lru')
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, ex=int(ttl) if ttl else None))
+
+    def set_nx(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, nx=True, ex=int(ttl) if ttl else None))
+
+    def delete(self, key, expected=None):
+        if expected is None:
+            self.client.delete(key)
+        else:
+            self.client.eval(self._RELEASE_SCRIPT, 1, key, expected)
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    接口响应缓存 + single-flight 去重
+    """
+
+    def __init__(self, backend=None, default_ttl=DEFAULT_TTL, endpoint_ttl=None, lock_timeout=60,
+                 poll_interval=0.05, recorder=None):
+        """
+        :param backend: RedisBackend / InMemoryBackend，默认进程内后端
+        :param default_ttl: 默认缓存时间 (秒)
+        :param endpoint_ttl: 按接口覆盖缓存时间，如 {'opt_basic': 86400}
+        :param lock_timeout: 跨进程锁的过期时间，也是等待其他进程结果的最长时间 (秒)
+        :param poll_interval: 等待其他进程结果时的轮询间隔 (秒)
+        :param recorder: 性能记录器
+        """
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.default_ttl = default_ttl
+        self.endpoint_ttl = dict(ENDPOINT_TTL, **(endpoint_ttl or {}))
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.recorder = recorder or get_recorder()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """BACKTEST_REDIS_URL 已设置时返回 Redis 缓存，否则返回 None"""
+        url = os.environ.get(REDIS_URL_ENV)
+        if not url:
+            return None
+        return cls(RedisBackend.from_url(url), **kwargs)
+
+    def ttl_for(self, endpoint):
+        return self.endpoint_ttl.get(endpoint, self.default_ttl)
+
+    def _get_cached(self, key, recorder):
+        """读取并解码缓存，未命中或数据格式无效 (视为未命中并删除该键) 时返回 None"""
+        blob = self.backend.get(key)
+        if blob is None:
+            return None
+        try:
+            df = decode_frame(blob)
+        except ValueError as e:
+            logger.warning("丢弃格式无效的缓存 %s: %s", key, e)
+            self.backend.delete(key)
+            return None
+        recorder.incr('api_cache_hits')
+        return df
+
+    def fetch(self, endpoint, params, loader, recorder=None):
+        """
+        读取缓存，未命中时调用 loader() 并写入缓存；相同请求并发时只调用一次 loader
+
+        :param endpoint: 接口名
+        :param params: 请求参数 dict
+        :param loader: 无参函数，返回 DataFrame
+        :param recorder: 记录命中/未命中的性能记录器，默认为缓存自身的记录器 (共享缓存时传入调用方的记录器)
+        :return: DataFrame (每个调用方拿到独立的副本)
+        """
+        recorder = recorder or self.recorder
+        key = make_cache_key(endpoint, params)
+        df = self._get_cached(key, recorder)
+        if df is not None:
+            return df
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            recorder.incr('api_cache_shared')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result.copy()
+
+        try:
+            flight.result = self._load_shared(key, endpoint, loader, recorder)
+            return flight.result.copy()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            flight.event.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load_shared(self, key, endpoint, loader, recorder):
+        """跨进程 single-flight：持有锁的进程调用接口，其余进程轮询缓存"""
+        lock_key = key + ':lock'
+        token = uuid.uuid4().hex.encode()
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            if self.backend.set_nx(lock_key, token, ttl=self.lock_timeout):
+                try:
+                    df = self._get_cached(key, recorder)
+                    if df is not None:
+                        return df
+                    recorder.incr('api_cache_misses')
+                    df = loader()
+                    with recorder.stage('cache_write'):
+                        blob = encode_frame(df)
+                        self.backend.set(key, blob, ttl=self.ttl_for(endpoint))
+                    recorder.incr('api_cache_bytes', len(blob))
+                    return df
+                finally:
+                    self.backend.delete(lock_key, expected=token)
+
+            df = self._get_cached(key, recorder)
+            if df is not None:
+                return df
+            if time.monotonic() > deadline:
+                logger.warning("等待缓存 %s 超时，直接请求接口", key)
+                recorder.incr('api_cache_misses')
+                return loader()
+            time.sleep(self.poll_interval)
+
+
+class CachedProApi:
+    """
+    pro_api 包装：self.pro.opt_daily(...) 等调用先查缓存，只有真正请求接口时才按 min_interval 限频
+    """
+
+    def __init__(self, pro_api, cache, min_interval=0.0, recorder=None):
+        """
+        :param pro_api: tushare pro_api 或 FakeProApi
+        :param cache: ResponseCache
+        :param min_interval: 两次真实接口请求之间的最小间隔 (秒)
+        :param recorder: 性能记录器
+        """
+        self.pro = pro_api
+        self.cache = cache
+        self.min_interval = min_interval
+        self.recorder = recorder or get_recorder()
+        self._last_call = None
+        self._throttle_lock = threading.Lock()
+
+    def _throttle(self):
+        with self._throttle_lock:
+            if self._last_call is not None and self.min_interval:
+                wait = self.min_interval - (time.monotonic() - self._last_call)
+                if wait > 0:
+                    self.recorder.sleep(wait)
+            self._last_call = time.monotonic()
+
+    def __getattr__(self, endpoint):
+        if endpoint.startswith('_'):
+            raise AttributeError(endpoint)
+        upstream = getattr(self.pro, endpoint)
+
+        def call(**kwargs):
+            def loader():
+                self._throttle()
+                self.recorder.incr('api_calls')
+                return upstream(**kwargs)
+
+            df = self.cache.fetch(endpoint, kwargs, loader, recorder=self.recorder)
+            fields = kwargs.get('fields')
+            if fields:
+                requested = [f.strip() for f in fields.split(',') if f.strip()]
+                if all(f in df.columns for f in requested):
+                    df = df[requested]
+            return df
+        return call
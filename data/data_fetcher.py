@@ -5,12 +5,15 @@
 数据获取模块：从Tushare获取中证500ETF期权数据
 """
 
-import tushare as ts
-import pandas as pd
-import datetime
 import os
-import numpy as np
+
+import pandas as pd
+
 from .dataHelper.data_processor import DataProcessor
+from .dataHelper.instrumentation import get_recorder
+from .dataHelper.response_cache import ResponseCache
+
+# tushare 在实例化 DataFetcher 时才导入: 只读取本地缓存或使用回测数据的进程无需加载它
 
 class DataFetcher:
     """
@@ -27,43 +30,117 @@ class DataFetcher:
         '500': '500ETF',
         '1000': '1000ETF'
     }
-    def __init__(self, token=None):
+    def __init__(self, token=None, recorder=None, pro_api=None, data_dir=None, api_interval=None, cache=None):
         """
         初始化Tushare接口
         
         参数:
             token (str): Tushare API token，如果为None则尝试从环境变量获取
+            recorder (PerfRecorder): 性能记录器，默认使用进程内默认记录器
+            pro_api: 已构造好的 pro_api (如基准测试中的 FakeProApi)，传入时不再读取 token
+            data_dir (str): 本地缓存根目录，默认 data/dataHelper
+            api_interval (float): 逐合约请求之间的等待秒数
+            cache (ResponseCache): 接口响应缓存，为 None 时若设置了 BACKTEST_REDIS_URL 则使用共享 Redis 缓存
         """
-        if token is None:
-            token = os.environ.get('TUSHARE_TOKEN')
+        if pro_api is None:
+            if token is None:
+                token = os.environ.get('TUSHARE_TOKEN')
 
-        if token is None:
-            raise ValueError("请提供Tushare API token或设置TUSHARE_TOKEN环境变量")
+            if token is None:
+                raise ValueError("请提供Tushare API token或设置TUSHARE_TOKEN环境变量")
 
-        ts.set_token(token)
-        self.pro = ts.pro_api()
-        self.processor = DataProcessor(self.pro)
+            import tushare as ts
 
-    def prepare_backtest_data_origin(self, start_date, end_date, etf_type='500', exchange='SSE'):
+            ts.set_token(token)
+            pro_api = ts.pro_api()
+        self.pro = pro_api
+        self.recorder = recorder or get_recorder()
+        if cache is None:
+            cache = ResponseCache.from_env(recorder=self.recorder)
+        self.cache = cache
+        self.processor = DataProcessor(self.pro, recorder=self.recorder, data_dir=data_dir,
+                                       api_interval=api_interval, cache=cache)
 
+    def prepare_backtest_data_origin(self, start_date, end_date, etf_type='500', exchange='SSE', live=False):
+        """
+        准备回测数据
 
+        参数:
+            live (bool): True 时合约包含区间末尚未到期的，作为 update_backtest_data 逐日更新的初始缓存
+        """
+        with self.recorder.run('prepare_backtest_data_origin', start_date=start_date, end_date=end_date,
+                               etf_type=etf_type, exchange=exchange, live=live):
+            return self._prepare_backtest_data_origin(start_date, end_date, etf_type, exchange, live)
+
+    def _prepare_backtest_data_origin(self, start_date, end_date, etf_type, exchange, live=False):
         ts_code_etf = self.ETF_MAP.get(etf_type, '510500.SH')
-        _etf_data = self.processor.get_etf_price(ts_code_etf, start_date, end_date)
+        with self.recorder.stage('etf_price'):
+            _etf_data = self.processor.get_etf_price(ts_code_etf, start_date, end_date)
         # 通过etf数据 获取实际交易日
         trade_dates= _etf_data['trade_date'].dt.strftime('%Y%m%d').tolist()
 
         # 获取基础期权数据
-        opt_basic_data = self.processor.get_opt_basic(exchange=exchange, start_date=start_date, end_date=end_date)
+        with self.recorder.stage('opt_basic'):
+            opt_basic_data = self.processor.get_opt_basic(exchange=exchange, start_date=start_date, end_date=end_date,
+                                                         live=live)
 
         # 基础数据中筛选出指定的期权
-        opt_specific_data = self.processor.get_opt_specific(opt_basic_data, trade_dates, option_type=etf_type, exchange=exchange, start_date=start_date, end_date=end_date)
+        with self.recorder.stage('opt_specific'):
+            opt_specific_data = self.processor.get_opt_specific(opt_basic_data, trade_dates, option_type=etf_type, exchange=exchange, start_date=start_date, end_date=end_date, live=live)
         # return opt_specific_data
 
         # 期权日数据获取
-        opt_merged_data = self.processor.get_opt_merge_data(opt_specific_data, trade_dates, option_type=etf_type, exchange=exchange, start_date=start_date, end_date=end_date)
+        with self.recorder.stage('opt_merged'):
+            opt_merged_data = self.processor.get_opt_merge_data(opt_specific_data, trade_dates, option_type=etf_type, exchange=exchange, start_date=start_date, end_date=end_date, live=live)
 
         return _etf_data, opt_merged_data
 
+    def update_backtest_data(self, start_date, prev_end_date, end_date, etf_type='500', exchange='SSE',
+                             discard_previous=True):
+        """
+        逐日更新 live 缓存：ETF 与期权日线只请求 prev_end_date 之后的新交易日 (期权每个交易日一次全市场请求)，
+        合约列表整体刷新一次以纳入新上市合约，写出新结束日期的缓存
+
+        新缓存全部写出之前不改动 prev_end_date 的缓存，任何一次请求失败后都可以按原参数重试
+
+        参数:
+            start_date (str): 缓存的开始日期，格式YYYYMMDD
+            prev_end_date (str): 已有缓存的结束日期
+            end_date (str): 新的结束日期
+            discard_previous (bool): 成功后是否删除 prev_end_date 的缓存；为 False 时由调用方在
+                                     提交 (如保存快照) 之后调用 discard_previous_cache
+
+        返回:
+            tuple: (更新后的全部ETF数据, 新交易日的期权合并数据, 新交易日列表 [Timestamp])
+        """
+        with self.recorder.run('update_backtest_data', start_date=start_date, prev_end_date=prev_end_date,
+                               end_date=end_date, etf_type=etf_type, exchange=exchange):
+            ts_code_etf = self.ETF_MAP.get(etf_type, '510500.SH')
+            with self.recorder.stage('etf_price'):
+                etf_data = self.processor.append_etf_price(ts_code_etf, start_date, prev_end_date, end_date)
+            new_dates = etf_data.loc[etf_data['trade_date'] > pd.Timestamp(prev_end_date), 'trade_date']
+            trade_dates = new_dates.dt.strftime('%Y%m%d').tolist()
+
+            with self.recorder.stage('opt_basic'):
+                opt_basic_data = self.processor.get_opt_basic(exchange, start_date, end_date, live=True)
+            with self.recorder.stage('opt_specific'):
+                opt_specific_data = self.processor.get_opt_specific(opt_basic_data, trade_dates, etf_type, exchange,
+                                                                    start_date, end_date, live=True)
+            with self.recorder.stage('opt_merged'):
+                new_rows = self.processor.append_opt_merge_data(opt_specific_data, trade_dates, etf_type, exchange,
+                                                                start_date, prev_end_date, end_date)
+            if discard_previous:
+                self.discard_previous_cache(start_date, prev_end_date, end_date, etf_type, exchange)
+            return etf_data, new_rows, list(new_dates)
+
+    def discard_previous_cache(self, start_date, prev_end_date, end_date, etf_type='500', exchange='SSE'):
+        """
+        删除被 update_backtest_data 取代的 prev_end_date 缓存 (结束日期未变时不删除)
+        """
+        if end_date != prev_end_date:
+            self.processor.discard_live_cache(self.ETF_MAP.get(etf_type, '510500.SH'), etf_type, exchange,
+                                              start_date, prev_end_date)
+
 if __name__ == '__main__':
     # 测试代码
     # 注意：运行前需要设置TUSHARE_TOKEN环境变量或在初始化时提供token
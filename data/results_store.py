@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+回测结果库：把回测与参数扫描的结果 (参数、绩效指标、每日净值、交易记录) 写入 SQLite，
+批量写入在一个事务内分批 executemany，参数与指标按 (名称, 数值) 建索引，查询结果以 DataFrame / NumPy 返回
+
+用法:
+    store = ResultsStore('results/sweep.db')
+    res = strategy.get_results()
+    store.record_run('monthly_atm_call', params={'contracts': 2}, metrics=res['metrics'], nav=res['nav'],
+                     trades=strategy.trade_log, sweep='2024-contracts')
+    store.leaderboard('sharpe', n=20, sweep='2024-contracts')
+"""
+
+import numbers
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (Column, Float, ForeignKey, Index, Integer, MetaData, String, Table, create_engine, event,
+                        func, select)
+
+metadata = MetaData()
+
+runs = Table(
+    'runs', metadata,
+    Column('run_id', Integer, primary_key=True),
+    Column('strategy', String(64), nullable=False),
+    Column('sweep', String(128)),
+    Column('created_at', String(32), nullable=False),
+    Index('ix_runs_sweep', 'sweep'),
+)
+
+params = Table(
+    'params', metadata,
+    Column('run_id', Integer, ForeignKey('runs.run_id', ondelete='CASCADE'), nullable=False),
+    Column('name', String(64), nullable=False),
+    Column('value_num', Float),
+    Column('value_text', String(256)),
+    Index('ix_params_run', 'run_id'),
+    Index('ix_params_num', 'name', 'value_num'),
+    Index('ix_params_text', 'name', 'value_text'),
+)
+
+metrics = Table(
+    'metrics', metadata,
+    Column('run_id', Integer, ForeignKey('runs.run_id', ondelete='CASCADE'), nullable=False),
+    Column('name', String(64), nullable=False),
+    Column('value', Float),
+    Index('ix_metrics_run', 'run_id'),
+    Index('ix_metrics_value', 'name', 'value'),
+)
+
+nav = Table(
+    'nav', metadata,
+    Column('run_id', Integer, ForeignKey('runs.run_id', ondelete='CASCADE'), nullable=False),
+    Column('trade_date', String(10), nullable=False),
+    Column('nav', Float),
+    Column('cash', Float),
+    Column('margin', Float),
+    Index('ix_nav_run_date', 'run_id', 'trade_date', unique=True),
+)
+
+trades = Table(
+    'trades', metadata,
+    Column('run_id', Integer, ForeignKey('runs.run_id', ondelete='CASCADE'), nullable=False),
+    Column('trade_date', String(10)),
+    Column('type', String(16)),
+    Column('contract', String(32)),
+    Column('price', Float),
+    Column('qty', Float),
+    Column('margin', Float),
+    Index('ix_trades_run', 'run_id'),
+)
+
+NAV_FIELDS = ('nav', 'cash', 'margin')
+TRADE_FIELDS = ('type', 'contract', 'price', 'qty', 'margin')
+
+
+def _is_number(value):
+    return isinstance(value, (numbers.Real, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def _float_or_none(value):
+    if value is None or not _is_number(value) or not np.isfinite(value):
+        return None
+    return float(value)
+
+
+def _date_text(value):
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def _nav_frame(data):
+    """
+    统一净值输入: MarginLedger.history() (索引为交易日)、净值 Series，
+    或 LongETF 策略的 backtest_results (list of dict，date + market_value)
+    """
+    if isinstance(data, pd.Series):
+        return pd.DataFrame({'nav': data})
+    frame = pd.DataFrame(data)
+    if 'date' in frame.columns:
+        frame = frame.set_index('date')
+    elif 'trade_date' in frame.columns:
+        frame = frame.set_index('trade_date')
+    if 'nav' not in frame.columns and 'market_value' in frame.columns:
+        frame = frame.assign(nav=frame['market_value'] + frame.get('cash', 0.0))
+    return frame
+
+
+class ResultsStore:
+    """
+    SQLite 回测结果库
+    """
+
+    def __init__(self, path='backtest_results.db', batch_size=5000, echo=False):
+        """
+        :param path: SQLite 文件路径或 SQLAlchemy URL (如 'sqlite:///:memory:')
+        :param batch_size: executemany 每批行数
+        :param echo: 是否打印 SQL
+        """
+        url = path if '://' in path else f'sqlite:///{os.path.abspath(path)}'
+        self.engine = create_engine(url, echo=echo)
+        self.batch_size = batch_size
+        if self.engine.dialect.name == 'sqlite':
+            self._configure_sqlite()
+        metadata.create_all(self.engine)
+
+    def _configure_sqlite(self):
+        @event.listens_for(self.engine, 'connect')
+        def _on_connect(dbapi_conn, _):
+            # 由 SQLAlchemy 控制事务开始，以便使用 BEGIN IMMEDIATE
+            dbapi_conn.isolation_level = None
+            cursor = dbapi_conn.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')  # 写入时不阻塞其他进程的查询
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute('PRAGMA foreign_keys=ON')
+            cursor.close()
+
+        @event.listens_for(self.engine, 'begin')
+        def _on_begin(conn):
+            # 查询为普通 (DEFERRED) 事务，不取写锁；写入路径通过 _write_transaction 使用 BEGIN IMMEDIATE
+            conn.exec_driver_sql(conn.get_execution_options().get('sqlite_begin', 'BEGIN'))
+
+    def _write_transaction(self):
+        """写事务: SQLite 下开始即取得写锁，多个扫描进程同时写入时 run_id 分配不会冲突"""
+        return self.engine.execution_options(sqlite_begin='BEGIN IMMEDIATE').begin()
+
+    def _insert(self, conn, table, rows):
+        for start in range(0, len(rows), self.batch_size):
+            conn.execute(table.insert(), rows[start:start + self.batch_size])
+
+    def record_run(self, strategy, params=None, metrics=None, nav=None, trades=None, sweep=None):
+        """
+        写入一次回测
+
+        :param strategy: 策略名
+        :param params: 参数 dict，数值参数存 value_num，其余存 value_text
+        :param metrics: 绩效指标 dict (如 get_results()['metrics'])，只保存数值项
+        :param nav: 每日净值 (MarginLedger.history()、Series 或 backtest_results)
+        :param trades: 交易记录 (trade_log，list of dict)
+        :param sweep: 参数扫描批次名
+        :return: run_id
+        """
+        return self.record_runs([{'strategy': strategy, 'params': params, 'metrics': metrics, 'nav': nav,
+                                  'trades': trades, 'sweep': sweep}])[0]
+
+    def record_runs(self, results):
+        """
+        在一个事务内批量写入多次回测
+
+        :param results: 可迭代的 dict，键同 record_run 的参数
+        :return: run_id 列表
+        """
+        results = list(results)
+        created_at = datetime.now().isoformat(timespec='seconds')
+        run_rows, param_rows, metric_rows, nav_rows, trade_rows = [], [], [], [], []
+        with self._write_transaction() as conn:
+            first_id = (conn.execute(select(func.max(runs.c.run_id))).scalar() or 0) + 1
+            run_ids = list(range(first_id, first_id + len(results)))
+            for run_id, result in zip(run_ids, results):
+                run_rows.append({'run_id': run_id, 'strategy': result['strategy'], 'sweep': result.get('sweep'),
+                                 'created_at': created_at})
+                for name, value in (result.get('params') or {}).items():
+                    is_num = _is_number(value)
+                    param_rows.append({'run_id': run_id, 'name': name,
+                                       'value_num': float(value) if is_num else None,
+                                       'value_text': None if is_num else str(value)})
+                for name, value in (result.get('metrics') or {}).items():
+                    if _is_number(value):
+                        metric_rows.append({'run_id': run_id, 'name': name, 'value': _float_or_none(value)})
+                if result.get('nav') is not None:
+                    nav_rows.extend(self._nav_rows(run_id, result['nav']))
+                for trade in result.get('trades') or ():
+                    row = {'run_id': run_id, 'trade_date': _date_text(trade['date']) if 'date' in trade else None}
+                    for field in TRADE_FIELDS:
+                        value = trade.get(field)
+                        row[field] = _float_or_none(value) if field in ('price', 'qty', 'margin') else value
+                    trade_rows.append(row)
+
+            for table, rows in ((runs, run_rows), (params, param_rows), (metrics, metric_rows), (nav, nav_rows),
+                                (trades, trade_rows)):
+                if rows:
+                    self._insert(conn, table, rows)
+        return run_ids
+
+    @staticmethod
+    def _nav_rows(run_id, data):
+        frame = _nav_frame(data)
+        rows = pd.DataFrame({f: frame[f].astype(float) if f in frame.columns else np.nan for f in NAV_FIELDS},
+                            index=frame.index)
+        rows.insert(0, 'trade_date', pd.DatetimeIndex(frame.index).strftime('%Y-%m-%d'))
+        rows.insert(0, 'run_id', run_id)
+        return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+    def _read(self, statement):
+        with self.engine.connect() as conn:
+            result = conn.execute(statement)
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    def find_runs(self, sweep=None, strategy=None, **conditions):
+        """
+        按参数筛选 run_id
+
+        :param conditions: 参数条件，值可以是标量 (相等) 或 (下限, 上限) 闭区间，如 contracts=(1, 3)
+        :return: numpy.ndarray of run_id
+        """
+        statement = select(runs.c.run_id)
+        if sweep is not None:
+            statement = statement.where(runs.c.sweep == sweep)
+        if strategy is not None:
+            statement = statement.where(runs.c.strategy == strategy)
+        for name, cond in conditions.items():
+            sub = select(params.c.run_id).where(params.c.name == name)
+            if isinstance(cond, tuple):
+                sub = sub.where(params.c.value_num.between(float(cond[0]), float(cond[1])))
+            elif _is_number(cond):
+                sub = sub.where(params.c.value_num == float(cond))
+            else:
+                sub = sub.where(params.c.value_text == str(cond))
+            statement = statement.where(runs.c.run_id.in_(sub))
+        return self._read(statement.order_by(runs.c.run_id))['run_id'].to_numpy()
+
+    def _wide(self, table, value_columns, run_ids):
+        statement = select(table.c.run_id, table.c.name, *value_columns)
+        if run_ids is not None:
+            statement = statement.where(table.c.run_id.in_([int(r) for r in run_ids]))
+        long = self._read(statement)
+        if long.empty:
+            return pd.DataFrame(index=pd.Index([], name='run_id'))
+        if len(value_columns) > 1:
+            # 参数: 数值优先，否则取文本
+            long['value'] = long['value_num'].astype(object).where(long['value_num'].notna(), long['value_text'])
+        return long.pivot(index='run_id', columns='name', values='value')
+
+    def load_params(self, run_ids=None):
+        """参数宽表 (行: run_id, 列: 参数名)"""
+        return self._wide(params, [params.c.value_num, params.c.value_text], run_ids)
+
+    def load_metrics(self, run_ids=None):
+        """指标宽表 (行: run_id, 列: 指标名)"""
+        return self._wide(metrics, [metrics.c.value], run_ids)
+
+    def leaderboard(self, metric='sharpe', n=20, ascending=False, sweep=None, strategy=None, **conditions):
+        """
+        按指标排序的前 n 次回测，附带参数与全部指标
+
+        :param metric: 排序指标名
+        :param n: 返回条数
+        :param ascending: True 时升序 (如最大回撤)
+        :param conditions: 参数条件，同 find_runs
+        :return: DataFrame，索引 run_id，列 strategy / sweep / 排序指标 / 参数 / 其余指标
+        """
+        order = metrics.c.value.asc() if ascending else metrics.c.value.desc()
+        statement = (select(metrics.c.run_id, runs.c.strategy, runs.c.sweep, metrics.c.value.label(metric))
+                     .join(runs, runs.c.run_id == metrics.c.run_id)
+                     .where(metrics.c.name == metric, metrics.c.value.isnot(None))
+                     .order_by(order).limit(n))
+        if sweep is not None:
+            statement = statement.where(runs.c.sweep == sweep)
+        if strategy is not None:
+            statement = statement.where(runs.c.strategy == strategy)
+        if conditions:
+            statement = statement.where(metrics.c.run_id.in_(
+                [int(r) for r in self.find_runs(sweep=sweep, strategy=strategy, **conditions)]))
+        top = self._read(statement).set_index('run_id')
+        if top.empty:
+            return top
+        others = self.load_metrics(top.index).drop(columns=[metric], errors='ignore')
+        return top.join(self.load_params(top.index)).join(others, rsuffix='_metric')
+
+    def load_nav(self, run_ids, field='nav', as_array=False):
+        """
+        每日净值
+
+        :param run_ids: 单个 run_id 或列表
+        :param field: nav / cash / margin
+        :param as_array: True 时返回 (交易日数组, 交易日 × 回测 的二维数组)
+        :return: DataFrame (行: 交易日, 列: run_id)
+        """
+        run_ids = [int(run_ids)] if np.ndim(run_ids) == 0 else [int(r) for r in run_ids]
+        statement = (select(nav.c.trade_date, nav.c.run_id, nav.c[field])
+                     .where(nav.c.run_id.in_(run_ids)).order_by(nav.c.run_id, nav.c.trade_date))
+        long = self._read(statement)
+        wide = long.pivot(index='trade_date', columns='run_id', values=field).reindex(columns=run_ids)
+        wide.index = pd.to_datetime(wide.index)
+        if as_array:
+            return wide.index.to_numpy(), wide.to_numpy(dtype=float)
+        return wide
+
+    def load_trades(self, run_id):
+        """交易记录 DataFrame"""
+        statement = select(trades).where(trades.c.run_id == int(run_id))
+        frame = self._read(statement)
+        frame['trade_date'] = pd.to_datetime(frame['trade_date'])
+        return frame
+
+    def delete_runs(self, run_ids):
+        """删除回测及其全部明细"""
+        run_ids = [int(r) for r in run_ids]
+        with self._write_transaction() as conn:
+            for table in (params, metrics, nav, trades, runs):
+                conn.execute(table.delete().where(table.c.run_id.in_(run_ids)))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+收盘后逐日更新：只拉取上次快照之后的新交易日数据追加到 live 缓存，恢复各策略快照、处理新交易日并写出新快照
+
+用法:
+    # 首次: 以 live 缓存跑完整历史并写出快照
+    python scripts/option/daily_update.py bootstrap --start 20240101 --end 20241230 --snapshot snapshots/sse_500.pkl
+    # 之后每个交易日收盘后 (--end 默认为今天)
+    python scripts/option/daily_update.py update --snapshot snapshots/sse_500.pkl
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import sys
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from data.data_fetcher import DataFetcher  # noqa: E402
+from scripts.option.strategies.LongETF_ShortCall_Contrast import LongETFShortCallContrastStrategy  # noqa: E402
+from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+STRATEGIES = {
+    'monthly_atm_call': MonthlyATMCallStrategy,
+    'long_etf_short_call': LongETFShortCallContrastStrategy,
+}
+
+
+def save_snapshot(path, meta, states):
+    """
+    写出快照 (先写临时文件再替换，避免中途失败留下损坏的快照)
+    :param path: 快照路径
+    :param meta: 数据区间与策略参数
+    :param states: {策略名: get_state()}
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': SNAPSHOT_VERSION, 'meta': meta, 'states': states}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """读取快照，返回 (meta, states)"""
+    with open(path, 'rb') as f:
+        snapshot = pickle.load(f)
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"快照版本 {snapshot.get('version')} 与当前版本 {SNAPSHOT_VERSION} 不一致，请重新 bootstrap")
+    return snapshot['meta'], snapshot['states']
+
+
+def bootstrap(fetcher, start_date, end_date, snapshot_path, strategies=('monthly_atm_call',), etf_type='500',
+              exchange='SSE', strategy_kwargs=None):
+    """
+    建立 live 缓存并完整回测一次，写出初始快照
+
+    :param fetcher: DataFetcher
+    :param strategies: 策略名，见 STRATEGIES
+    :param strategy_kwargs: {策略名: 构造参数}
+    :return: {策略名: 策略实例}
+    """
+    strategy_kwargs = strategy_kwargs or {}
+    etf_data, option_data = fetcher.prepare_backtest_data_origin(start_date, end_date, etf_type, exchange, live=True)
+    instances, states = {}, {}
+    for name in strategies:
+        strategy = STRATEGIES[name](etf_data, option_data.copy(), recorder=fetcher.recorder,
+                                    **strategy_kwargs.get(name, {}))
+        strategy.run_backtest()
+        instances[name] = strategy
+        states[name] = strategy.get_state()
+    meta = {'start_date': start_date, 'end_date': end_date, 'etf_type': etf_type, 'exchange': exchange,
+            'strategy_kwargs': strategy_kwargs}
+    save_snapshot(snapshot_path, meta, states)
+    return instances
+
+
+def daily_update(fetcher, snapshot_path, end_date):
+    """
+    逐日更新：追加新交易日数据，恢复快照后只处理新交易日，写出新快照
+
+    :param fetcher: DataFetcher
+    :param snapshot_path: 快照路径
+    :param end_date: 新的结束日期，格式YYYYMMDD
+    :return: {策略名: 策略实例}
+    """
+    meta, states = load_snapshot(snapshot_path)
+    prev_end_date = meta['end_date']
+    if end_date <= prev_end_date:
+        logger.info("快照已更新至 %s，无需处理", prev_end_date)
+        return {}
+
+    with fetcher.recorder.run('daily_update', prev_end_date=prev_end_date, end_date=end_date):
+        # 旧缓存在新快照写出之后才删除: 中途任何一步失败，快照与旧缓存仍然一致，可直接重试
+        etf_data, new_options, new_dates = fetcher.update_backtest_data(
+            meta['start_date'], prev_end_date, end_date, meta['etf_type'], meta['exchange'], discard_previous=False)
+        # 策略只需要新交易日及其前一交易日 (前收盘价) 的ETF数据
+        window_start = etf_data['trade_date'].searchsorted(pd.Timestamp(prev_end_date), side='right') - 1
+        etf_window = etf_data.iloc[max(window_start, 0):].reset_index(drop=True)
+
+        instances = {}
+        for name, state in states.items():
+            strategy = STRATEGIES[name](etf_window, new_options.copy(), recorder=fetcher.recorder,
+                                        **meta['strategy_kwargs'].get(name, {}))
+            strategy.set_state(state)
+            with fetcher.recorder.stage(f'on_bar/{name}'):
+                for date in new_dates:
+                    strategy.on_bar(date)
+            instances[name] = strategy
+            states[name] = strategy.get_state()
+        logger.info("处理新交易日 %d 个，快照更新至 %s", len(new_dates), end_date)
+
+    save_snapshot(snapshot_path, dict(meta, end_date=end_date), states)
+    fetcher.discard_previous_cache(meta['start_date'], prev_end_date, end_date, meta['etf_type'], meta['exchange'])
+    return instances
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    boot = sub.add_parser('bootstrap', help='建立 live 缓存与初始快照')
+    boot.add_argument('--start', required=True)
+    boot.add_argument('--end', required=True)
+    boot.add_argument('--etf-type', default='500')
+    boot.add_argument('--exchange', default='SSE')
+    boot.add_argument('--strategies', nargs='+', default=['monthly_atm_call'], choices=list(STRATEGIES))
+    update = sub.add_parser('update', help='追加新交易日并更新快照')
+    update.add_argument('--end', default=pd.Timestamp.today().strftime('%Y%m%d'))
+    for p in (boot, update):
+        p.add_argument('--snapshot', required=True)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    fetcher = DataFetcher()
+    if args.command == 'bootstrap':
+        instances = bootstrap(fetcher, args.start, args.end, args.snapshot, args.strategies, args.etf_type,
+                              args.exchange)
+    else:
+        instances = daily_update(fetcher, args.snapshot, args.end)
+    for name, strategy in instances.items():
+        if hasattr(strategy, 'get_results'):
+            logger.info("%s: %s", name, strategy.get_results()['metrics'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
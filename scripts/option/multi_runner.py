@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+多策略单次遍历：行情只加载、预处理一次 (MarketData)，交易日历只遍历一次，每个交易日依次分发给各策略的 on_bar
+
+各策略是独立实例，只共享只读行情，持仓、账本与交易记录互不影响；运行器分别累计各策略 on_bar 的耗时并给出占比
+
+用法:
+    market = MarketData(etf_data, option_data)
+    runner = MultiStrategyRunner(market, {
+        'atm_1': MonthlyATMCallStrategy(market=market, contracts=1),
+        'atm_5': MonthlyATMCallStrategy(market=market, contracts=5),
+        'long_etf': LongETFShortCallContrastStrategy(market=market),
+    })
+    report = runner.run()
+"""
+
+import time
+
+import pandas as pd
+
+from data.dataHelper.instrumentation import get_recorder
+
+
+class MultiStrategyRunner:
+    """
+    多策略运行器
+    """
+
+    def __init__(self, market, strategies, recorder=None):
+        """
+        :param market: 共享的 MarketData
+        :param strategies: {策略名: 策略实例}，策略须实现 on_bar(date)，可选实现 on_start()
+        :param recorder: 性能记录器 (PerfRecorder)，默认使用进程内默认记录器
+        """
+        if len({id(s) for s in strategies.values()}) != len(strategies):
+            raise ValueError("同一个策略实例不能重复注册，各策略需使用独立实例")
+        self.market = market
+        self.strategies = dict(strategies)
+        self.recorder = recorder or get_recorder()
+        self.report = None
+
+    def _calendar(self, start=None, end=None):
+        calendar = self.market.calendar
+        if start is not None:
+            calendar = calendar[calendar >= pd.Timestamp(start)]
+        if end is not None:
+            calendar = calendar[calendar <= pd.Timestamp(end)]
+        return calendar
+
+    def run(self, start=None, end=None):
+        """
+        遍历一次交易日历，逐日驱动全部策略
+        :param start: 可选，开始日期 (含)
+        :param end: 可选，结束日期 (含)
+        :return: DataFrame，索引为策略名，列为 bars (处理的交易日数)、seconds (on_start + on_bar 耗时)、
+                 share (占全部策略耗时的比例)
+        """
+        names = list(self.strategies)
+        bars = [self.strategies[name].on_bar for name in names]
+        seconds = [0.0] * len(names)
+        calendar = self._calendar(start, end)
+
+        with self.recorder.run('multi_strategy', strategies=names, n_days=len(calendar)) as record:
+            with self.recorder.stage('on_start'):
+                for i, name in enumerate(names):
+                    on_start = getattr(self.strategies[name], 'on_start', None)
+                    if on_start is not None:
+                        t0 = time.perf_counter()
+                        on_start()
+                        seconds[i] += time.perf_counter() - t0
+
+            with self.recorder.stage('bars'):
+                clock = time.perf_counter
+                for date in calendar:
+                    for i, on_bar in enumerate(bars):
+                        t0 = clock()
+                        on_bar(date)
+                        seconds[i] += clock() - t0
+
+            total = sum(seconds)
+            report = pd.DataFrame({'bars': len(calendar), 'seconds': seconds}, index=pd.Index(names, name='strategy'))
+            report['share'] = report['seconds'] / total if total > 0 else 1.0 / max(len(names), 1)
+            record['strategies'] = report.to_dict(orient='index')
+
+        self.report = report
+        return report
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Black-Scholes 定价与希腊值 (向量化)
+
+所有函数接受可广播的 numpy 数组，用于整条期权链或 (路径 × 交易日 × 行权价) 数组的一次性定价
+"""
+
+import numpy as np
+from scipy.special import ndtr
+
+# 到期时间下限 (年)，避免到期日当天除零
+MIN_TAU = 1e-8
+
+
+def _d1_d2(spot, strike, tau, sigma, rate):
+    tau = np.maximum(tau, MIN_TAU)
+    vol_sqrt = np.maximum(sigma, 1e-12) * np.sqrt(tau)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * sigma ** 2) * tau) / vol_sqrt
+    return d1, d1 - vol_sqrt, tau
+
+
+def bs_price(spot, strike, tau, sigma, rate=0.0, is_call=True):
+    """
+    欧式期权价格
+    :param spot: 标的价格
+    :param strike: 行权价
+    :param tau: 剩余期限 (年)
+    :param sigma: 波动率
+    :param rate: 无风险利率
+    :param is_call: True 为认购，False 为认沽，可为布尔数组
+    :return: 期权价格数组
+    """
+    d1, d2, tau = _d1_d2(spot, strike, tau, sigma, rate)
+    discount = strike * np.exp(-rate * tau)
+    call = spot * ndtr(d1) - discount * ndtr(d2)
+    return np.where(is_call, call, call - spot + discount)
+
+
+def bs_delta(spot, strike, tau, sigma, rate=0.0, is_call=True):
+    """欧式期权 delta (每一份标的)"""
+    d1, _, _ = _d1_d2(spot, strike, tau, sigma, rate)
+    call_delta = ndtr(d1)
+    return np.where(is_call, call_delta, call_delta - 1.0)
+
+
+def bs_vega(spot, strike, tau, sigma, rate=0.0):
+    """欧式期权 vega (波动率变动 1.00 对应的价格变动)"""
+    d1, _, tau = _d1_d2(spot, strike, tau, sigma, rate)
+    return spot * np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi) * np.sqrt(tau)
+
+
+def implied_vol(price, spot, strike, tau, rate=0.0, is_call=True, lower=1e-4, upper=5.0, n_iter=60):
+    """
+    隐含波动率：对整条链同时做二分 + 牛顿迭代，价格越出无套利区间时返回 nan
+    :return: 隐含波动率数组
+    """
+    price, spot, strike, tau, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(tau, dtype=float), np.asarray(is_call, dtype=bool))
+    lo = np.full(price.shape, lower)
+    hi = np.full(price.shape, upper)
+    sigma = np.full(price.shape, 0.3)
+    for _ in range(n_iter):
+        model = bs_price(spot, strike, tau, sigma, rate, is_call)
+        diff = model - price
+        hi = np.where(diff > 0, sigma, hi)
+        lo = np.where(diff <= 0, sigma, lo)
+        vega = bs_vega(spot, strike, tau, sigma, rate)
+        newton = sigma - diff / np.where(vega > 1e-10, vega, np.nan)
+        # 牛顿步越出当前区间时退回二分
+        inside = (newton > lo) & (newton < hi)
+        sigma = np.where(inside, newton, 0.5 * (lo + hi))
+    valid = np.abs(bs_price(spot, strike, tau, sigma, rate, is_call) - price) < 1e-6 * np.maximum(price, 1.0)
+    return np.where(valid, sigma, np.nan)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+波动率指数 (iVIX，CBOE VIX 方法)：对整个期权面板按 (时点, 期限) 分组一次性计算，不逐日循环
+
+步骤:
+    1. 每个时点选剩余天数 >= min_days 的最近两个到期日作为近月、次近月
+    2. 远期价格: |认购 - 认沽| 最小的行权价 K*，F = K* + e^{RT} (C - P)
+    3. K0 为不高于 F 的最大行权价；K0 以下取认沽、以上取认购、K0 处取两者均值
+    4. σ² = 2/T Σ ΔK/K² e^{RT} Q(K) - 1/T (F/K0 - 1)²
+    5. 按剩余期限线性插值到 target_days 天并年化，iVIX = 100 σ
+
+面板只有收盘价，没有买卖报价，因此以 price_col (默认收盘价，缺失时用结算价) 代替中间价，
+也不做 CBOE 的"连续两个零报价后截断"处理
+"""
+
+import numpy as np
+import pandas as pd
+
+from data.dataHelper.contract_master import ContractMaster
+
+# 期权到期与日线收盘的时刻
+CLOSE_TIME = pd.Timedelta(hours=15)
+SECONDS_PER_YEAR = 365 * 86400
+
+
+def _to_datetime(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.to_datetime(values)
+    return pd.to_datetime(values.astype(str))
+
+
+def _prepare(option_data, time_col, price_col, min_days, exclude_adjusted):
+    """
+    标准化为 (时点, 到期, 行权价, 认购/认沽, 价格) 并剔除无效报价、调整合约与过近的到期日
+    :return: (DataFrame, 是否为日线数据)
+    """
+    t = _to_datetime(option_data[time_col])
+    # 只有日期的数据视为收盘时点
+    daily = bool((t == t.dt.normalize()).all())
+    if daily:
+        t = t + CLOSE_TIME
+    expiry_col = 'maturity_date' if 'maturity_date' in option_data.columns else 'expire_date'
+    expiry = _to_datetime(option_data[expiry_col]).dt.normalize() + CLOSE_TIME
+
+    price = pd.to_numeric(option_data[price_col], errors='coerce')
+    if 'settle' in option_data.columns and price_col != 'settle':
+        price = price.fillna(pd.to_numeric(option_data['settle'], errors='coerce'))
+
+    frame = pd.DataFrame({
+        't': t.to_numpy(),
+        'expiry': expiry.to_numpy(),
+        'strike': pd.to_numeric(option_data['exercise_price'], errors='coerce').to_numpy(),
+        'is_call': (option_data['call_put'] == 'C').to_numpy(),
+        'price': price.to_numpy(),
+    })
+    keep = (frame['price'] > 0) & frame['strike'].notna()
+    if exclude_adjusted and 'name' in option_data.columns:
+        # 除息调整合约的行权价不在标准网格上，混入会扭曲 ΔK 与远期价格
+        contracts = option_data.drop_duplicates('ts_code')
+        adjusted = ContractMaster(contracts).lookup(option_data['ts_code'])['adjusted']
+        keep &= ~adjusted.fillna(False).to_numpy(dtype=bool)
+    days = (frame['expiry'].dt.normalize() - frame['t'].dt.normalize()).dt.days
+    keep &= days >= min_days
+    return frame[keep.to_numpy()], daily
+
+
+def _term_variance(chain, rate):
+    """
+    每个 (时点, 期限) 的方差 σ²
+    :param chain: 列 t, term, strike, call, put, tau
+    :return: DataFrame，索引 (t, term)，列 tau, forward, k0, sigma2
+    """
+    keys = ['t', 'term']
+    chain = chain.sort_values(keys + ['strike'], ignore_index=True)
+    chain['disc'] = np.exp(rate * chain['tau'])
+
+    # 远期价格: 同时有认购、认沽报价且价差最小的行权价
+    both = chain.dropna(subset=['call', 'put'])
+    atm = both.loc[(both['call'] - both['put']).abs().groupby([both['t'], both['term']]).idxmin()]
+    forward = pd.Series((atm['strike'] + atm['disc'] * (atm['call'] - atm['put'])).to_numpy(),
+                        index=pd.MultiIndex.from_frame(atm[keys]), name='forward')
+    chain = chain.join(forward, on=keys, how='inner')
+
+    # K0: 不高于远期价格的最大行权价，全部高于远期时取最小行权价
+    below = chain['strike'].where(chain['strike'] <= chain['forward'])
+    grouped = chain.groupby(keys)['strike']
+    chain['k0'] = below.groupby([chain['t'], chain['term']]).transform('max').fillna(grouped.transform('min'))
+
+    strike = chain['strike']
+    chain['q'] = np.where(strike < chain['k0'], chain['put'],
+                          np.where(strike > chain['k0'], chain['call'], (chain['call'] + chain['put']) / 2))
+    chain = chain[chain['q'] > 0]
+
+    # ΔK: 相邻行权价间距的一半，两端取与唯一相邻行权价的间距
+    grouped = chain.groupby(keys)['strike']
+    prev_k, next_k = grouped.shift(1), grouped.shift(-1)
+    delta_k = ((next_k - prev_k) / 2).fillna(next_k - chain['strike']).fillna(chain['strike'] - prev_k).fillna(0.0)
+    chain = chain.assign(contrib=delta_k / chain['strike'] ** 2 * chain['disc'] * chain['q'])
+
+    terms = chain.groupby(keys).agg(tau=('tau', 'first'), forward=('forward', 'first'), k0=('k0', 'first'),
+                                    total=('contrib', 'sum'))
+    terms['sigma2'] = 2 / terms['tau'] * terms['total'] - (terms['forward'] / terms['k0'] - 1) ** 2 / terms['tau']
+    return terms.drop(columns='total')
+
+
+def compute_ivix(option_data, rate=0.02, time_col='trade_date', price_col='close', min_days=7, target_days=30,
+                 exclude_adjusted=True):
+    """
+    计算整个面板每个时点的波动率指数
+
+    :param option_data: 期权合并数据 (DataProcessor.get_opt_merge_data 的输出或日内快照)，
+                        需含 ts_code, exercise_price, call_put, maturity_date (或 expire_date) 与价格列
+    :param rate: 年化无风险利率 (连续复利)
+    :param time_col: 时点列，日线为 trade_date，日内快照可传带时分的时间列
+    :param price_col: 期权价格列
+    :param min_days: 近月合约的最少剩余天数，不足时滚动到下一到期日
+    :param target_days: 插值的目标期限 (天)
+    :param exclude_adjusted: 是否剔除除息调整合约 (需 name 列)
+    :return: DataFrame，索引为时点，列 ivix, near_expiry, next_expiry, near_sigma2, next_sigma2,
+             near_forward, next_forward；只有一个可用期限的时点直接使用该期限的方差
+    """
+    frame, daily = _prepare(option_data, time_col, price_col, min_days, exclude_adjusted)
+
+    # 每个时点的近月 (term 0) 与次近月 (term 1)
+    terms = frame[['t', 'expiry']].drop_duplicates().sort_values(['t', 'expiry'], ignore_index=True)
+    terms['term'] = terms.groupby('t').cumcount()
+    terms = terms[terms['term'] < 2]
+    terms['tau'] = (terms['expiry'] - terms['t']).dt.total_seconds() / SECONDS_PER_YEAR
+    frame = frame.merge(terms, on=['t', 'expiry'], how='inner')
+
+    # 同一行权价的认购、认沽并排
+    chain = frame.pivot_table(index=['t', 'term', 'strike'], columns='is_call', values='price', aggfunc='mean')
+    chain = chain.rename(columns={True: 'call', False: 'put'}).reindex(columns=['call', 'put']).reset_index()
+    chain.columns.name = None
+    chain = chain.merge(terms[['t', 'term', 'tau']], on=['t', 'term'], how='left')
+
+    variance = _term_variance(chain, rate).join(terms.set_index(['t', 'term'])['expiry'])
+    wide = variance.unstack('term')
+    near_tau, near_var = wide[('tau', 0)], wide[('sigma2', 0)]
+    if ('tau', 1) in wide.columns:
+        next_tau, next_var = wide[('tau', 1)], wide[('sigma2', 1)]
+    else:
+        next_tau = next_var = pd.Series(np.nan, index=wide.index)
+
+    target = target_days / 365
+    weight = (next_tau - target) / (next_tau - near_tau)
+    blended = (near_tau * near_var * weight + next_tau * next_var * (1 - weight)) / target
+    sigma2 = blended.fillna(near_var)
+    result = pd.DataFrame({
+        'ivix': 100 * np.sqrt(sigma2.clip(lower=0)),
+        'near_expiry': wide[('expiry', 0)],
+        'next_expiry': wide[('expiry', 1)] if ('expiry', 1) in wide.columns else pd.NaT,
+        'near_sigma2': near_var,
+        'next_sigma2': next_var,
+        'near_forward': wide[('forward', 0)],
+        'next_forward': wide[('forward', 1)] if ('forward', 1) in wide.columns else np.nan,
+    })
+    if daily:
+        result.index = result.index - CLOSE_TIME
+    result.index.name = time_col
+    return result
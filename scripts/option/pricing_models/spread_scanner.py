@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+价差扫描：对面板中每个交易日的整条期权链，枚举
+    垂直价差   同一到期日、同一认购/认沽的全部行权价对
+    日历价差   同一行权价、同一认购/认沽的全部到期日对
+计算价差价格、无套利区间的偏离与持有收益，输出按偏离金额排序的候选表
+
+价差方向统一为"买入 long 腿、卖出 short 腿"，价差 = long 价格 - short 价格 (>0 为付出权利金):
+    认购垂直 (买低卖高)  0 <= 价差 <= (K2 - K1) e^{-rT}
+    认沽垂直 (买高卖低)  0 <= 价差 <= (K2 - K1) e^{-rT}
+    认购日历 (买远卖近)  价差 >= 0
+    认沽日历 (买远卖近)  价差 >= -K (e^{-rT1} - e^{-rT2})   (欧式认沽允许远月略低于近月)
+
+持有收益 (carry) = short 腿每日时间价值衰减 - long 腿每日时间价值衰减 (元/组/日，按合约单位计)，
+时间价值 = 价格 - 内在价值，需要标的收盘价 (etf_data)
+
+实现: 按 (交易日, 到期日, 认购/认沽) 或 (交易日, 行权价, 认购/认沽) 分组后填充为 (组 × 组内序号) 的矩阵，
+两两组合通过 (组 × 序号 × 序号) 广播一次性计算；按 max_cells 分块控制内存
+"""
+
+import numpy as np
+import pandas as pd
+
+from data.dataHelper.contract_master import ContractMaster
+from scripts.option.utils.margin import CONTRACT_UNIT
+
+CANDIDATE_COLUMNS = ['trade_date', 'kind', 'call_put', 'long_code', 'short_code', 'long_strike', 'short_strike',
+                     'long_expiry', 'short_expiry', 'long_price', 'short_price', 'spread', 'lower', 'upper',
+                     'violation', 'edge', 'carry', 'min_volume']
+
+
+def _to_datetime(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.to_datetime(values)
+    return pd.to_datetime(values.astype(str))
+
+
+def _prepare(option_data, etf_data, rate, price_col, min_days, exclude_adjusted):
+    """标准化期权链: 交易日、到期日、行权价、价格、成交量、剩余期限与折现因子，剔除无效报价与调整合约"""
+    expiry_col = 'maturity_date' if 'maturity_date' in option_data.columns else 'expire_date'
+    price = pd.to_numeric(option_data[price_col], errors='coerce')
+    if 'settle' in option_data.columns and price_col != 'settle':
+        price = price.fillna(pd.to_numeric(option_data['settle'], errors='coerce'))
+    frame = pd.DataFrame({
+        'trade_date': _to_datetime(option_data['trade_date']).to_numpy(),
+        'expiry': _to_datetime(option_data[expiry_col]).dt.normalize().to_numpy(),
+        'ts_code': option_data['ts_code'].to_numpy(),
+        'strike': pd.to_numeric(option_data['exercise_price'], errors='coerce').to_numpy(),
+        'is_call': (option_data['call_put'] == 'C').to_numpy(),
+        'price': price.to_numpy(),
+        'volume': pd.to_numeric(option_data['vol'], errors='coerce').to_numpy()
+        if 'vol' in option_data.columns else np.nan,
+    })
+    keep = (frame['price'] > 0) & frame['strike'].notna()
+    if exclude_adjusted and 'name' in option_data.columns:
+        contracts = option_data.drop_duplicates('ts_code')
+        adjusted = ContractMaster(contracts).lookup(option_data['ts_code'])['adjusted']
+        keep &= ~adjusted.fillna(False).to_numpy(dtype=bool)
+    days = (frame['expiry'] - frame['trade_date']).dt.days
+    keep &= days >= min_days
+    frame = frame[keep.to_numpy()].reset_index(drop=True)
+
+    frame['tau'] = (frame['expiry'] - frame['trade_date']).dt.days.to_numpy(dtype=float) / 365
+    frame['discount'] = np.exp(-rate * frame['tau'])
+    if etf_data is not None:
+        spot = pd.Series(etf_data['close'].to_numpy(dtype=float), index=_to_datetime(etf_data['trade_date']))
+        spot = spot[~spot.index.duplicated()]
+        frame['spot'] = spot.reindex(frame['trade_date']).to_numpy()
+        intrinsic = np.where(frame['is_call'], frame['spot'] - frame['strike'], frame['strike'] - frame['spot'])
+        time_value = frame['price'] - np.maximum(intrinsic, 0.0)
+        # 每日时间价值衰减 (按剩余自然日均摊)
+        frame['decay'] = time_value / np.maximum(frame['tau'] * 365, 1.0)
+    else:
+        frame['decay'] = np.nan
+    return frame
+
+
+def _padded_pairs(frame, group_cols, order_col, max_cells):
+    """
+    按 group_cols 分组、组内按 order_col 排序，分块产出填充矩阵下标与两两组合掩码
+    :return: (排序后的 frame, 分块生成器)，生成器逐块产出 idx (组 × 序号，行号)、valid (组 × 序号)、
+             pair_mask (组 × 序号 × 序号，a < b)
+    """
+    frame = frame.sort_values(group_cols + [order_col], ignore_index=True)
+    group_id = frame.groupby(group_cols, sort=False).ngroup().to_numpy()
+    starts = np.flatnonzero(np.diff(group_id, prepend=-1) != 0)
+    sizes = np.diff(np.append(starts, len(frame)))
+    multi = sizes > 1
+    starts, sizes = starts[multi], sizes[multi]
+    if not starts.size:
+        return frame, []
+    width = int(sizes.max())
+    offsets = np.arange(width)
+    per_chunk = max(1, max_cells // (width * width))
+
+    def chunks():
+        for lo in range(0, starts.size, per_chunk):
+            s, n = starts[lo:lo + per_chunk], sizes[lo:lo + per_chunk]
+            valid = offsets[None, :] < n[:, None]
+            idx = np.where(valid, s[:, None] + offsets[None, :], 0)
+            pair_mask = valid[:, :, None] & valid[:, None, :] & (offsets[:, None] < offsets[None, :])[None]
+            yield idx, valid, pair_mask
+    return frame, chunks()
+
+
+def _scan(frame, kind, max_cells):
+    """
+    枚举一种价差的全部组合
+    :param kind: 'vertical' (组内按行权价) 或 'calendar' (组内按到期日)
+    :return: DataFrame (CANDIDATE_COLUMNS 中除 edge / min_volume 外的列)
+    """
+    if kind == 'vertical':
+        frame, chunks = _padded_pairs(frame, ['trade_date', 'expiry', 'is_call'], 'strike', max_cells)
+    else:
+        frame, chunks = _padded_pairs(frame, ['trade_date', 'strike', 'is_call'], 'expiry', max_cells)
+    cols = {c: frame[c].to_numpy() for c in ('price', 'strike', 'discount', 'decay', 'volume')}
+    is_call = frame['is_call'].to_numpy()
+
+    parts = []
+    for idx, valid, pair_mask in chunks:
+        pad = {c: np.where(valid, v[idx], np.nan) for c, v in cols.items()}
+        call = is_call[idx[:, 0]][:, None, None]
+        # a 为组内较小的行权价 / 较近的到期日，b 为较大 / 较远
+        lo = {c: v[:, :, None] for c, v in pad.items()}
+        hi = {c: v[:, None, :] for c, v in pad.items()}
+        if kind == 'vertical':
+            # 认购买低卖高，认沽买高卖低
+            long_is_a = np.broadcast_to(call, pair_mask.shape)
+            width = hi['strike'] - lo['strike']
+            upper = width * lo['discount']
+            lower = np.zeros_like(upper)
+        else:
+            # 买远卖近
+            long_is_a = np.zeros(pair_mask.shape, dtype=bool)
+            upper = np.full(pair_mask.shape, np.inf)
+            lower = np.where(call, 0.0, -lo['strike'] * (lo['discount'] - hi['discount']))
+        long_price = np.where(long_is_a, lo['price'], hi['price'])
+        short_price = np.where(long_is_a, hi['price'], lo['price'])
+        spread = long_price - short_price
+        violation = np.maximum(np.maximum(lower - spread, spread - upper), 0.0)
+        carry = np.where(long_is_a, hi['decay'] - lo['decay'], lo['decay'] - hi['decay'])
+        min_volume = np.fmin(lo['volume'], hi['volume'])
+
+        g, a, b = np.nonzero(pair_mask)
+        row_a, row_b = idx[g, a], idx[g, b]
+        long_is_a = long_is_a[g, a, b]
+        parts.append(pd.DataFrame({
+            'long_row': np.where(long_is_a, row_a, row_b),
+            'short_row': np.where(long_is_a, row_b, row_a),
+            'spread': spread[g, a, b],
+            'lower': lower[g, a, b],
+            'upper': upper[g, a, b],
+            'violation': violation[g, a, b],
+            'carry': carry[g, a, b],
+            'min_volume': min_volume[g, a, b],
+        }))
+    if not parts:
+        return pd.DataFrame(columns=[c for c in CANDIDATE_COLUMNS if c not in ('edge',)])
+
+    pairs = pd.concat(parts, ignore_index=True)
+    long_leg = frame.iloc[pairs['long_row'].to_numpy()].reset_index(drop=True)
+    short_leg = frame.iloc[pairs['short_row'].to_numpy()].reset_index(drop=True)
+    return pd.DataFrame({
+        'trade_date': long_leg['trade_date'],
+        'kind': kind,
+        'call_put': np.where(long_leg['is_call'], 'C', 'P'),
+        'long_code': long_leg['ts_code'],
+        'short_code': short_leg['ts_code'],
+        'long_strike': long_leg['strike'],
+        'short_strike': short_leg['strike'],
+        'long_expiry': long_leg['expiry'],
+        'short_expiry': short_leg['expiry'],
+        'long_price': long_leg['price'],
+        'short_price': short_leg['price'],
+        'spread': pairs['spread'],
+        'lower': pairs['lower'],
+        'upper': pairs['upper'],
+        'violation': pairs['violation'],
+        'carry': pairs['carry'],
+        'min_volume': pairs['min_volume'],
+    })
+
+
+def scan_spreads(option_data, etf_data=None, rate=0.02, price_col='close', kinds=('vertical', 'calendar'),
+                 min_days=1, min_volume=0, tolerance=0.0, include_all=False, multiplier=CONTRACT_UNIT,
+                 exclude_adjusted=True, max_cells=4_000_000):
+    """
+    扫描整个面板的垂直价差与日历价差
+
+    :param option_data: 期权合并数据 (DataProcessor.get_opt_merge_data 的输出)
+    :param etf_data: 标的日线 (trade_date, close)，用于计算时间价值与 carry，缺省时 carry 为 nan
+    :param rate: 年化无风险利率 (连续复利)
+    :param price_col: 期权价格列，缺失时用结算价
+    :param kinds: 扫描的价差类型
+    :param min_days: 剩余天数下限 (不含到期日当天的合约)
+    :param min_volume: 两条腿当日成交量 (张) 的下限
+    :param tolerance: 偏离无套利区间超过该值 (元/份) 才视为候选
+    :param include_all: 为 True 时返回全部组合，否则只返回偏离超过 tolerance 的候选
+    :param multiplier: 合约单位，edge 与 carry 按每组 (各 1 张) 折算为元
+    :param exclude_adjusted: 是否剔除除息调整合约 (需 name 列)
+    :param max_cells: 每块广播矩阵 (组 × 序号 × 序号) 的元素数上限
+    :return: DataFrame (CANDIDATE_COLUMNS + rank)，按 edge (偏离金额，元) 降序、carry 降序排列
+    """
+    frame = _prepare(option_data, etf_data, rate, price_col, min_days, exclude_adjusted)
+    tables = [_scan(frame, kind, max_cells) for kind in kinds]
+    result = pd.concat([t for t in tables if len(t)], ignore_index=True) if any(len(t) for t in tables) \
+        else pd.DataFrame(columns=[c for c in CANDIDATE_COLUMNS if c != 'edge'])
+
+    result['edge'] = result['violation'].astype(float) * multiplier
+    result['carry'] = result['carry'].astype(float) * multiplier
+    keep = np.ones(len(result), dtype=bool)
+    if min_volume:
+        keep &= result['min_volume'].to_numpy(dtype=float) >= min_volume
+    if not include_all:
+        keep &= result['violation'].to_numpy(dtype=float) > tolerance
+    result = result[keep].sort_values(['edge', 'carry'], ascending=False, ignore_index=True)
+    result = result[CANDIDATE_COLUMNS]
+    result['rank'] = np.arange(1, len(result) + 1)
+    return result
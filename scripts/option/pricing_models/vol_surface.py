@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+参数化波动率曲面：平值水平 + 期限斜率 + 偏斜 + 曲率
+
+sigma(k, tau) = atm_vol * level + term_slope * (sqrt(tau) - sqrt(ref_tau)) + skew * k + curvature * k^2
+其中 k = ln(K / S)，level 可以是逐路径逐日的波动率水平 (如 Heston 的 sqrt(v) / sqrt(theta))
+"""
+
+import numpy as np
+
+
+class VolSurface:
+    """
+    参数化隐含波动率曲面
+    """
+
+    def __init__(self, atm_vol=0.22, skew=-0.15, curvature=0.5, term_slope=0.0, ref_tau=30 / 365,
+                 floor=0.03):
+        """
+        :param atm_vol: 参考期限的平值波动率
+        :param skew: 对数价值度的一阶系数 (负值为认沽偏斜)
+        :param curvature: 对数价值度的二阶系数 (微笑)
+        :param term_slope: 期限结构斜率 (对 sqrt(tau))
+        :param ref_tau: 参考期限 (年)
+        :param floor: 波动率下限
+        """
+        self.atm_vol = atm_vol
+        self.skew = skew
+        self.curvature = curvature
+        self.term_slope = term_slope
+        self.ref_tau = ref_tau
+        self.floor = floor
+
+    def vol(self, spot, strike, tau, level=1.0):
+        """
+        查询曲面，参数均可广播
+        :param spot: 标的价格
+        :param strike: 行权价
+        :param tau: 剩余期限 (年)
+        :param level: 平值波动率缩放 (逐路径/逐日的波动率状态)
+        :return: 隐含波动率数组
+        """
+        k = np.log(strike / spot)
+        sigma = (self.atm_vol * level
+                 + self.term_slope * (np.sqrt(np.maximum(tau, 0.0)) - np.sqrt(self.ref_tau))
+                 + self.skew * k + self.curvature * k ** 2)
+        return np.maximum(sigma, self.floor)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+卖出认购的 delta 对冲模拟：由期权链价格反推隐含波动率与 delta，得到每日期权腿的净 delta (折合 ETF 份数)，
+对多种对冲规则同时模拟 ETF 对冲交易、对冲盈亏与成交成本
+
+对冲规则 (可一次评估任意多个):
+    daily     每个交易日调整到目标对冲量
+    every_n   每 n 个交易日调整一次
+    band      对冲缺口超过 band × 持仓张数 × 合约单位 (即每张合约 band 个 delta) 时调整
+
+期权持仓变化 (开仓、平仓、展期) 当日所有规则都会重新对冲 (rehedge_on_roll)。
+交易日循环只有一次，每一步对全部规则的数组同时计算
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.option.pricing_models.black_scholes import bs_delta, implied_vol
+from scripts.option.utils.fills import ETF_SPEC
+from scripts.option.utils.margin import CONTRACT_UNIT
+
+
+def holdings_from_trade_log(trade_log, calendar):
+    """
+    由 MonthlyATMCallStrategy 的交易记录还原每日收盘持仓
+    :param trade_log: 交易记录 (type 为 sell / close)
+    :param calendar: 交易日 (DatetimeIndex)
+    :return: DataFrame，索引为交易日，列为合约代码，值为收盘持仓张数 (卖出为负)
+    """
+    calendar = pd.DatetimeIndex(calendar)
+    trades = pd.DataFrame(trade_log, columns=['date', 'type', 'contract', 'qty'])
+    if trades.empty:
+        return pd.DataFrame(index=calendar)
+    trades['signed'] = np.where(trades['type'] == 'sell', -1.0, 1.0) * trades['qty'].astype(float)
+    flows = trades.pivot_table(index='date', columns='contract', values='signed', aggfunc='sum')
+    return flows.reindex(calendar, fill_value=0.0).fillna(0.0).cumsum()
+
+
+def make_policies(every_n=(1, 5, 10), bands=(0.05, 0.1, 0.2)):
+    """
+    生成对冲规则列表
+    :param every_n: 固定频率 (交易日)，1 即 daily
+    :param bands: delta 带宽 (每张合约的 delta)
+    :return: [dict(name, kind, n, band)]
+    """
+    policies = []
+    for n in every_n:
+        name = 'daily' if n == 1 else f'every_{n}'
+        policies.append({'name': name, 'kind': 'every_n', 'n': int(n), 'band': np.nan})
+    for band in bands:
+        policies.append({'name': f'band_{band:g}', 'kind': 'band', 'n': 0, 'band': float(band)})
+    return policies
+
+
+class DeltaHedgeSimulator:
+    """
+    期权持仓的 delta 对冲模拟器
+    """
+
+    def __init__(self, market, holdings, rate=0.02, multiplier=CONTRACT_UNIT, price_col='settle', fill_engine=None,
+                 rehedge_on_roll=True):
+        """
+        :param market: MarketData
+        :param holdings: 每日收盘期权持仓 (索引为交易日，列为合约代码，卖出为负)，见 holdings_from_trade_log
+        :param rate: 无风险利率
+        :param multiplier: 合约单位
+        :param price_col: 计算隐含波动率与盯市的期权价格字段
+        :param fill_engine: ETF 成交模拟器 (FillEngine(ETF_SPEC))，为 None 时按收盘价全部成交、不计费用
+        :param rehedge_on_roll: 期权持仓变化当日是否对所有规则强制重新对冲
+        """
+        self.market = market
+        self.calendar = market.calendar
+        self.holdings = holdings.reindex(self.calendar).fillna(0.0)
+        self.rate = rate
+        self.multiplier = multiplier
+        self.price_col = price_col
+        self.fill_engine = fill_engine
+        self.lot = (fill_engine.spec if fill_engine is not None else ETF_SPEC)['lot']
+        self.rehedge_on_roll = rehedge_on_roll
+        self._chain_greeks()
+
+    @classmethod
+    def from_strategy(cls, strategy, **kwargs):
+        """
+        以已运行完毕的 MonthlyATMCallStrategy 的期权持仓构建
+        :param strategy: MonthlyATMCallStrategy
+        :param kwargs: 其余参数，见 __init__
+        """
+        kwargs.setdefault('multiplier', strategy.multiplier)
+        holdings = holdings_from_trade_log(strategy.trade_log, strategy.market.calendar)
+        return cls(strategy.market, holdings, **kwargs)
+
+    def _chain_greeks(self):
+        """持仓合约的 (交易日 × 合约) 价格、delta，期权腿每日 delta (ETF 份数) 与盯市盈亏"""
+        etf = self.market.etf
+        self.spot = etf['close'].to_numpy(dtype=float)
+        codes = list(self.holdings.columns)
+        qty = self.holdings.to_numpy(dtype=float)
+        n_days = len(self.calendar)
+        if not codes:
+            self.delta = np.zeros((n_days, 0))
+            self.option_delta = np.zeros(n_days)
+            self.option_pnl = np.zeros(n_days)
+            return
+
+        index = pd.MultiIndex.from_product([self.calendar, codes])
+        rows = self.market.options_frame().reindex(index)
+        shape = (n_days, len(codes))
+        price = rows[self.price_col].to_numpy(dtype=float).reshape(shape)
+        strike = pd.DataFrame(rows['exercise_price'].to_numpy(dtype=float).reshape(shape)).ffill().bfill().to_numpy()
+        expire = pd.Series(rows['expire_date'].to_numpy()).groupby(np.tile(np.arange(len(codes)), n_days)) \
+            .transform('first').to_numpy().reshape(shape)
+        is_call = (rows['call_put'].groupby(np.tile(np.arange(len(codes)), n_days)).transform('first')
+                   .to_numpy().reshape(shape) == 'C')
+        days_left = (pd.DatetimeIndex(expire.ravel()) - pd.DatetimeIndex(np.repeat(self.calendar, len(codes)))).days
+        tau = np.maximum(np.asarray(days_left, dtype=float).reshape(shape), 0.0) / 365
+
+        spot = self.spot[:, None]
+        sigma = np.full(shape, np.nan)
+        valid = np.isfinite(price) & (price > 0) & (tau > 0)
+        sigma[valid] = implied_vol(price[valid], np.broadcast_to(spot, shape)[valid], strike[valid], tau[valid],
+                                   self.rate, is_call[valid])
+        # 无法反推的日期沿用该合约最近的隐含波动率，仍缺失时 delta 取到期内在值的方向
+        sigma = pd.DataFrame(sigma).ffill().bfill().to_numpy()
+        intrinsic = np.where(is_call, (spot > strike).astype(float), -(spot < strike).astype(float))
+        delta = np.where(np.isfinite(sigma) & (tau > 0),
+                         bs_delta(spot, strike, tau, np.nan_to_num(sigma, nan=0.2), self.rate, is_call), intrinsic)
+        self.delta = delta
+        self.option_delta = np.sum(qty * delta, axis=1) * self.multiplier
+
+        # 期权腿按价格逐日盯市: 前一日收盘持仓 × 价格变动
+        marked = pd.DataFrame(price).ffill().to_numpy()
+        change = np.nan_to_num(np.diff(marked, axis=0), nan=0.0)
+        self.option_pnl = np.concatenate([[0.0], np.sum(qty[:-1] * change, axis=1) * self.multiplier])
+
+    def simulate(self, policies=None):
+        """
+        同时模拟多种对冲规则
+        :param policies: make_policies 的返回，默认 make_policies()
+        :return: dict，hedge (交易日 × 规则的 ETF 持仓份数)、pnl (交易日 × 规则的期权 + 对冲日盈亏)、
+                 option_delta (期权腿每日 delta)、summary (每个规则的交易次数、成交份数、成本、盈亏与日盈亏波动)
+        """
+        policies = policies or make_policies()
+        names = [p['name'] for p in policies]
+        is_band = np.array([p['kind'] == 'band' for p in policies])
+        period = np.array([max(p['n'], 1) for p in policies])
+        band = np.array([p['band'] if p['kind'] == 'band' else 0.0 for p in policies], dtype=float)
+
+        etf = self.market.etf
+        volume = etf['vol'].to_numpy(dtype=float) if 'vol' in etf else np.full(len(etf), np.nan)
+        high = etf['high'].to_numpy(dtype=float) if 'high' in etf else self.spot
+        low = etf['low'].to_numpy(dtype=float) if 'low' in etf else self.spot
+        qty = self.holdings.to_numpy(dtype=float)
+        gross = np.abs(qty).sum(axis=1) * self.multiplier
+        changed = np.concatenate([[True], np.any(qty[1:] != qty[:-1], axis=1)])
+
+        n_days, n_policies = len(self.calendar), len(policies)
+        hedge = np.zeros(n_policies)
+        hedge_hist = np.zeros((n_days, n_policies))
+        hedge_pnl = np.zeros((n_days, n_policies))
+        cost = np.zeros((n_days, n_policies))
+        n_trades = np.zeros(n_policies, dtype=int)
+        traded = np.zeros(n_policies)
+
+        for t in range(n_days):
+            if t:
+                hedge_pnl[t] = hedge * (self.spot[t] - self.spot[t - 1])
+            gap = -self.option_delta[t] - hedge
+            due = np.where(is_band, np.abs(gap) > band * gross[t], t % period == 0)
+            if self.rehedge_on_roll and changed[t]:
+                due[:] = True
+            order = np.where(due, np.round(gap / self.lot) * self.lot, 0.0)
+            if not order.any():
+                hedge_hist[t] = hedge
+                continue
+            if self.fill_engine is None:
+                filled = order
+            else:
+                fill = self.fill_engine.fill(np.abs(order), np.sign(order), self.spot[t], volume[t], high[t], low[t])
+                filled = np.sign(order) * fill['filled']
+                cost[t] = fill['commission'] + fill['slippage']
+            hedge = hedge + filled
+            n_trades += filled != 0
+            traded += np.abs(filled)
+            hedge_hist[t] = hedge
+
+        hedge_pnl -= cost
+        total = hedge_pnl + self.option_pnl[:, None]
+        summary = pd.DataFrame({
+            'n_trades': n_trades,
+            'traded_shares': traded,
+            'cost': cost.sum(axis=0),
+            'hedge_pnl': hedge_pnl.sum(axis=0),
+            'option_pnl': self.option_pnl.sum(),
+            'total_pnl': total.sum(axis=0),
+            'pnl_std': total.std(axis=0),
+        }, index=pd.Index(names, name='policy'))
+        summary['unhedged_std'] = self.option_pnl.std()
+        return {
+            'hedge': pd.DataFrame(hedge_hist, index=self.calendar, columns=names),
+            'pnl': pd.DataFrame(total, index=self.calendar, columns=names),
+            'option_delta': pd.Series(self.option_delta, index=self.calendar, name='option_delta'),
+            'summary': summary,
+        }
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+蒙特卡洛路径引擎：批量生成 ETF 路径 (GBM / Heston / 历史收益自助抽样)，按波动率曲面给出
+(路径 × 交易日 × 行权价) 的合成期权链，并对所有路径同时执行 MonthlyATMCallStrategy 式的
+每月卖出平值认购规则，输出盈亏分布、VaR 与回撤分位数
+
+路径按内存预算分块生成与处理，每块使用由 seed 派生的独立随机数流，路径数与内存预算不变时结果可复现
+"""
+
+import numpy as np
+
+from scripts.option.pricing_models.black_scholes import bs_price
+from scripts.option.pricing_models.vol_surface import VolSurface
+from scripts.option.utils.metrics import distribution_summary, max_drawdown
+
+TRADING_DAYS = 252
+
+
+def sse_strike_step(price):
+    """上交所ETF期权行权价间距 (向量化)"""
+    price = np.asarray(price, dtype=float)
+    return np.select([price <= 3, price <= 5, price <= 10], [0.05, 0.1, 0.25], default=0.5)
+
+
+def simulate_gbm(rng, n_paths, n_days, s0, mu, sigma):
+    """
+    几何布朗运动
+    :return: (路径 × 交易日) 收盘价，第 0 日为 s0
+    """
+    dt = 1 / TRADING_DAYS
+    shocks = rng.standard_normal((n_paths, n_days - 1))
+    log_ret = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+    log_path = np.concatenate([np.zeros((n_paths, 1)), np.cumsum(log_ret, axis=1)], axis=1)
+    return s0 * np.exp(log_path)
+
+
+def simulate_heston(rng, n_paths, n_days, s0, mu, v0, kappa, theta, xi, rho):
+    """
+    Heston 随机波动率 (Euler, full truncation)，时间步循环、路径维向量化
+    :return: (收盘价, 方差)，形状均为 (路径 × 交易日)
+    """
+    dt = 1 / TRADING_DAYS
+    spot = np.empty((n_paths, n_days))
+    var = np.empty((n_paths, n_days))
+    spot[:, 0] = s0
+    var[:, 0] = v0
+    log_s = np.full(n_paths, np.log(s0))
+    v = np.full(n_paths, float(v0))
+    for t in range(1, n_days):
+        z1 = rng.standard_normal(n_paths)
+        z2 = rho * z1 + np.sqrt(1 - rho ** 2) * rng.standard_normal(n_paths)
+        v_pos = np.maximum(v, 0.0)
+        log_s += (mu - 0.5 * v_pos) * dt + np.sqrt(v_pos * dt) * z1
+        v = v + kappa * (theta - v_pos) * dt + xi * np.sqrt(v_pos * dt) * z2
+        spot[:, t] = np.exp(log_s)
+        var[:, t] = np.maximum(v, 0.0)
+    return spot, var
+
+
+def bootstrap_paths(rng, n_paths, n_days, s0, returns, block_size=5):
+    """
+    历史对数收益的分块自助抽样 (保留短期自相关与波动聚集)
+    :param returns: 历史日对数收益 (一维)
+    :param block_size: 块长度 (交易日)
+    :return: (路径 × 交易日) 收盘价
+    """
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    n_ret = n_days - 1
+    n_blocks = -(-n_ret // block_size)
+    starts = rng.integers(0, len(returns), (n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_ret] % len(returns)
+    log_path = np.concatenate([np.zeros((n_paths, 1)), np.cumsum(returns[idx], axis=1)], axis=1)
+    return s0 * np.exp(log_path)
+
+
+class MonteCarloEngine:
+    """
+    蒙特卡洛压力测试引擎
+
+    模拟日历：每月 days_per_month 个交易日，当月合约在月内第 expiry_offset 个交易日到期
+    (约为第四个星期三)，每月首日以该日收盘价为中心挂出 n_strikes 个行权价
+    """
+
+    MODELS = ('gbm', 'heston', 'bootstrap')
+
+    def __init__(self, model='gbm', n_paths=10000, n_days=252, s0=5.5, mu=0.03, sigma=0.22,
+                 heston=None, historical_returns=None, block_size=5, surface=None, rate=0.02,
+                 n_strikes=9, days_per_month=21, expiry_offset=16, memory_budget_mb=256, seed=0):
+        """
+        :param model: 'gbm' / 'heston' / 'bootstrap'
+        :param n_paths: 路径数
+        :param n_days: 每条路径的交易日数
+        :param s0: 初始价格
+        :param mu: 年化漂移
+        :param sigma: 年化波动率 (GBM 波动率，Heston 默认长期方差为 sigma^2)
+        :param heston: Heston 参数 dict (v0, kappa, theta, xi, rho)，缺省项取默认
+        :param historical_returns: bootstrap 模式的历史日对数收益
+        :param block_size: bootstrap 块长度
+        :param surface: VolSurface，默认以 sigma 为平值波动率
+        :param rate: 无风险利率
+        :param n_strikes: 每月挂牌的行权价个数 (奇数时中间为平值)
+        :param days_per_month: 每月交易日数
+        :param expiry_offset: 当月合约到期日在月内的交易日序号 (从 0 开始)
+        :param memory_budget_mb: 单块期权链数组的内存预算
+        :param seed: 随机种子
+        """
+        if model not in self.MODELS:
+            raise ValueError(f"未知的路径模型 {model}，可选 {self.MODELS}")
+        if model == 'bootstrap' and historical_returns is None:
+            raise ValueError("bootstrap 模式需要提供 historical_returns")
+        self.model = model
+        self.n_paths = n_paths
+        self.n_days = n_days
+        self.s0 = s0
+        self.mu = mu
+        self.sigma = sigma
+        self.heston = {'v0': sigma ** 2, 'kappa': 2.0, 'theta': sigma ** 2, 'xi': 0.5, 'rho': -0.6}
+        self.heston.update(heston or {})
+        self.historical_returns = historical_returns
+        self.block_size = block_size
+        self.surface = surface or VolSurface(atm_vol=sigma)
+        self.rate = rate
+        self.n_strikes = n_strikes
+        self.days_per_month = days_per_month
+        self.expiry_offset = expiry_offset
+        self.memory_budget_mb = memory_budget_mb
+        self.seed = seed
+        self._build_schedule()
+
+    def _build_schedule(self):
+        days = np.arange(self.n_days)
+        self.month_id = days // self.days_per_month
+        self.open_days = np.arange(0, self.n_days, self.days_per_month)
+        self.expiry_days = self.open_days + self.expiry_offset
+        # 当日所在月份合约的剩余期限 (年)，到期后记为 0
+        remaining = self.expiry_days[self.month_id] - days
+        self.tau = np.maximum(remaining, 0) / TRADING_DAYS
+
+    @property
+    def chunk_size(self):
+        """按内存预算确定每块路径数：期权链及定价中间量约为 6 个同形状 float64 数组"""
+        per_path = self.n_days * self.n_strikes * 8 * 6
+        return int(max(1, min(self.n_paths, self.memory_budget_mb * 1024 ** 2 // per_path)))
+
+    def _chunks(self):
+        size = self.chunk_size
+        n_chunks = -(-self.n_paths // size)
+        streams = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        for i, stream in enumerate(streams):
+            yield min(size, self.n_paths - i * size), np.random.default_rng(stream)
+
+    def simulate(self, rng, n_paths):
+        """
+        生成一块路径
+        :return: (收盘价, 波动率水平)，形状均为 (路径 × 交易日)；波动率水平用于缩放曲面的平值波动率
+        """
+        if self.model == 'gbm':
+            spot = simulate_gbm(rng, n_paths, self.n_days, self.s0, self.mu, self.sigma)
+            return spot, np.ones_like(spot)
+        if self.model == 'heston':
+            p = self.heston
+            spot, var = simulate_heston(rng, n_paths, self.n_days, self.s0, self.mu,
+                                        p['v0'], p['kappa'], p['theta'], p['xi'], p['rho'])
+            return spot, np.sqrt(var / p['theta'])
+        spot = bootstrap_paths(rng, n_paths, self.n_days, self.s0, self.historical_returns, self.block_size)
+        return spot, np.ones_like(spot)
+
+    def strike_grid(self, spot):
+        """
+        每月首日以收盘价为中心的行权价网格
+        :param spot: (路径 × 交易日) 收盘价
+        :return: (路径 × 交易日 × 行权价)，同一月内各日相同
+        """
+        open_spot = spot[:, self.open_days]
+        step = sse_strike_step(open_spot)
+        center = np.round(open_spot / step) * step
+        half = self.n_strikes // 2
+        offsets = np.arange(-half, self.n_strikes - half)
+        grid = center[:, :, None] + step[:, :, None] * offsets
+        return grid[:, self.month_id, :]
+
+    def price_chain(self, spot, level, strikes, is_call=True):
+        """
+        按波动率曲面为整条链定价
+        :return: (路径 × 交易日 × 行权价) 期权价格
+        """
+        s = spot[:, :, None]
+        tau = self.tau[None, :, None]
+        sigma = self.surface.vol(s, strikes, tau, level=level[:, :, None])
+        return bs_price(s, strikes, tau, sigma, self.rate, is_call)
+
+    def run_monthly_atm_call(self, contracts=10, multiplier=10000, strike_offsets=(0,), close_before_days=5,
+                             fee_per_contract=0.0, initial_capital=1000000, keep_nav=False):
+        """
+        对所有路径执行每月卖出认购规则：月初卖出 (平值 + offset 档) 认购，到期前 close_before_days 个交易日买回
+
+        :param contracts: 每月卖出张数
+        :param multiplier: 合约单位
+        :param strike_offsets: 相对平值的行权价档位，可一次评估多个 (0 为平值，正数为虚值)
+        :param close_before_days: 到期前平仓的交易日数 (原策略为到期前 7 个自然日)
+        :param fee_per_contract: 每张每次交易的费用
+        :param initial_capital: 初始资金
+        :param keep_nav: 是否返回完整净值路径 (路径数 × 交易日，注意内存)
+        :return: dict，pnl / max_drawdown 形状为 (档位数 × 路径数)，summary 为每个档位的分布汇总
+        """
+        half = self.n_strikes // 2
+        cols = np.array([half + o for o in strike_offsets])
+        if cols.min() < 0 or cols.max() >= self.n_strikes:
+            raise ValueError(f"strike_offsets 超出行权价网格 (共 {self.n_strikes} 档)")
+
+        # 持仓窗口: 开仓日之后到平仓日 (含) 的日度盈亏计入
+        close_days = np.minimum(self.expiry_days - close_before_days, self.n_days - 1)
+        days = np.arange(self.n_days)
+        in_window = (days > self.open_days[self.month_id]) & (days <= close_days[self.month_id])
+        traded = close_days > self.open_days
+        n_trades = int(np.sum(traded))
+        position = contracts * multiplier
+        # 开平仓费用记在平仓日
+        fees = np.zeros(self.n_days)
+        np.add.at(fees, close_days[traded], fee_per_contract * contracts * 2)
+
+        pnl_chunks, dd_chunks, nav_chunks = [], [], []
+        for n, rng in self._chunks():
+            spot, level = self.simulate(rng, n)
+            chain = self.price_chain(spot, level, self.strike_grid(spot))
+            held = chain[:, :, cols]  # (路径 × 交易日 × 档位)
+            daily = np.zeros_like(held)
+            daily[:, 1:, :] = -np.diff(held, axis=1) * position * in_window[1:, None]
+            daily -= fees[None, :, None]
+            nav = initial_capital + np.cumsum(daily, axis=1)
+            nav = np.moveaxis(nav, 2, 0)  # (档位 × 路径 × 交易日)
+            pnl_chunks.append(nav[:, :, -1] - initial_capital)
+            dd_chunks.append(max_drawdown(nav, axis=-1))
+            if keep_nav:
+                nav_chunks.append(nav)
+
+        pnl = np.concatenate(pnl_chunks, axis=1)
+        max_dd = np.concatenate(dd_chunks, axis=1)
+        result = {
+            'strike_offsets': list(strike_offsets),
+            'n_trades_per_path': n_trades,
+            'pnl': pnl,
+            'max_drawdown': max_dd,
+            'summary': {o: distribution_summary(pnl[i], max_dd[i]) for i, o in enumerate(strike_offsets)},
+        }
+        if keep_nav:
+            result['nav'] = np.concatenate(nav_chunks, axis=1)
+        return result
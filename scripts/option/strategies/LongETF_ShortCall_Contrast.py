@@ -1,18 +1,30 @@
+import copy
+
 import pandas as pd
 
+from data.dataHelper.instrumentation import instrumented_run
+from scripts.option.utils.market_data import MarketData
+
 class LongETFShortCallContrastStrategy:
     """
     Long ETF + Short Call Contrast Ratio 策略
     """
 
-    def __init__(self, etf_data, option_data, initial_stock_capital=1000000, initial_option_capital=200000):
+    def __init__(self, etf_data=None, option_data=None, initial_stock_capital=1000000,
+                 initial_option_capital=200000, recorder=None, fill_engine=None, market=None):
         """
         初始化策略
         :param etf_data: ETF历史数据 (DataFrame)
         :param option_data: 期权历史数据 (DataFrame)
+        :param recorder: 性能记录器 (PerfRecorder)，默认使用进程内默认记录器
+        :param fill_engine: ETF 成交模拟器 (FillEngine(ETF_SPEC))，为 None 时按收盘价买入整数份额、不计费用
+        :param market: 共享的 MarketData，传入时忽略 etf_data / option_data
         """
-        self.etf = etf_data.set_index('trade_date',drop=False)
-        self.options = option_data.set_index('trade_date',drop=False)
+        self.recorder = recorder
+        self.fill_engine = fill_engine
+        self.market = market if market is not None else MarketData(etf_data, option_data)
+        self.etf = self.market.etf  # 以交易日为索引 (保留 trade_date 列)
+        self.options = self.market.options_frame()
         self.stock_capital = initial_stock_capital
         self.stock_shares = 0
         self.option_capital = initial_option_capital
@@ -22,12 +34,6 @@ class LongETFShortCallContrastStrategy:
         self.positions = {'stock': {}, 'option': {}}  # {'stock': {...}, 'option': {...}}
         # 合并交易日志
         self.trade_log = []  # [{'type': 'stock'/'option', ...}, ...]
-        # 预处理期权数据
-        self._preprocess_data()
-
-    def _preprocess_data(self):
-        # handle etf data
-        self.etf['trade_date'] = pd.to_datetime(self.etf['trade_date'])
 
     def buy_etf(self, buy_date, principal=None):
         """
@@ -39,13 +45,21 @@ class LongETFShortCallContrastStrategy:
             principal = self.stock_capital
         if isinstance(buy_date, str):
             buy_date = pd.to_datetime(buy_date)
-        row = self.etf.loc[self.etf['trade_date'] == buy_date]
-        if row.empty:
+        if buy_date not in self.etf.index:
             raise ValueError(f"买入日期 {buy_date} 不在ETF数据中")
-        buy_price = row.iloc[0]['close']
-        shares = principal // buy_price  # 整除，买入整数份额
+        bar = self.etf.loc[buy_date]
+        buy_price = bar['close']
+        fee = 0.0
+        if self.fill_engine is None:
+            shares = principal // buy_price  # 整除，买入整数份额
+        else:
+            # 按手数、成交量参与率、价差与费用计算实际买入
+            fill = self.fill_engine.affordable_qty(principal, buy_price, bar['vol'], bar['high'], bar['low'])
+            shares, fee = float(fill['filled']), float(fill['commission'])
+            if shares > 0:
+                buy_price = float(fill['price'])
         invested = shares * buy_price
-        cash_left = principal - invested
+        cash_left = principal - invested - fee
         self.etf_buy_date = buy_date
         self.etf_buy_price = buy_price
         self.etf_shares = shares
@@ -57,7 +71,8 @@ class LongETFShortCallContrastStrategy:
             'buy_price': buy_price,
             'shares': shares,
             'invested': invested,
-            'cash_left': cash_left
+            'cash_left': cash_left,
+            'fee': fee
         }
 
     def get_etf_value(self, query_date):
@@ -70,34 +85,66 @@ class LongETFShortCallContrastStrategy:
             raise Exception("请先调用 buy_etf 方法进行买入")
         if isinstance(query_date, str):
             query_date = pd.to_datetime(query_date)
-        row = self.etf.loc[self.etf['trade_date'] == query_date]
-        if row.empty:
+        if query_date not in self.etf.index:
             raise ValueError(f"查询日期 {query_date} 不在ETF数据中")
-        price = row.iloc[0]['close']
+        price = self.etf.at[query_date, 'close']
         value = self.etf_shares * price
         profit = value - self.etf_invested
         profit_rate = profit / self.etf_invested
         return {'market_value': value, 'profit': profit, 'profit_rate': profit_rate}
 
+    @instrumented_run()
     def run_backtest(self, buy_date=None):
         """
         只回测ETF部分，不开期权仓位。
         :param buy_date: 可选，买入日期（str 或 datetime），不传则为第一个交易日
         """
-        results = []
+        self.on_start(buy_date)
+        for date in self.etf.index:
+            self.on_bar(date)
+        return self.backtest_results
+
+    def on_start(self, buy_date=None):
+        """
+        回测开始前买入ETF并清空逐日结果 (run_backtest 与多策略运行器共用)
+        :param buy_date: 可选，买入日期，不传则为第一个交易日
+        """
+        self.backtest_results = []
         if buy_date is None:
             buy_date = self.etf.index[0]
         self.buy_etf(buy_date)
-        for date in self.etf.index:
-            if date < buy_date:
-                continue  # 买入前不计入回测
-            daily = self.get_etf_value(date)
-            results.append({
-                'date': date,
-                'market_value': daily['market_value'],
-                'profit': daily['profit'],
-                'profit_rate': daily['profit_rate'],
-                'cash': self.etf_cash
-            })
-        self.backtest_results = results
-        return results
\ No newline at end of file
+
+    def on_bar(self, date):
+        """
+        处理单个交易日：记录ETF市值 (回测循环与逐日更新共用，需先调用 buy_etf)
+        :param date: 交易日
+        """
+        if date < self.etf_buy_date:
+            return  # 买入前不计入回测
+        daily = self.get_etf_value(date)
+        self.backtest_results.append({
+            'date': date,
+            'market_value': daily['market_value'],
+            'profit': daily['profit'],
+            'profit_rate': daily['profit_rate'],
+            'cash': self.etf_cash
+        })
+
+    # 快照包含的状态: 买入信息与逐日结果
+    STATE_ATTRS = ('etf_buy_date', 'etf_buy_price', 'etf_shares', 'etf_principal', 'etf_invested', 'etf_cash',
+                   'backtest_results')
+
+    def get_state(self):
+        """
+        策略状态 (可 pickle)，用于逐日更新的快照
+        :return: dict
+        """
+        return {name: copy.deepcopy(getattr(self, name)) for name in self.STATE_ATTRS}
+
+    def set_state(self, state):
+        """
+        从快照恢复状态，之后可直接对新交易日调用 on_bar
+        :param state: get_state 返回的 dict
+        """
+        for name in self.STATE_ATTRS:
+            setattr(self, name, copy.deepcopy(state[name]))
\ No newline at end of file
@@ -1,5 +1,12 @@
+import copy
+
+import numpy as np
 import pandas as pd
-from datetime import timedelta
+
+from data.dataHelper.instrumentation import instrumented_run
+from scripts.option.utils.ledger import MarginLedger
+from scripts.option.utils.margin import CONTRACT_UNIT, short_option_margin
+from scripts.option.utils.market_data import MarketData
 
 
 class MonthlyATMCallStrategy:
@@ -7,37 +14,35 @@ class MonthlyATMCallStrategy:
     每月卖出平值看涨策略原生实现
     """
 
-    def __init__(self, etf_data, option_data, initial_capital=1000000):
+    def __init__(self, etf_data=None, option_data=None, initial_capital=1000000, contracts=1,
+                 multiplier=CONTRACT_UNIT, recorder=None, fill_engine=None, market=None):
         """
         初始化策略
         :param etf_data: ETF历史数据 (DataFrame)
         :param option_data: 期权历史数据 (DataFrame)
         :param initial_capital: 初始资金
+        :param contracts: 每次卖出张数
+        :param multiplier: 合约单位
+        :param recorder: 性能记录器 (PerfRecorder)，默认使用进程内默认记录器
+        :param fill_engine: 成交模拟器 (FillEngine)，为 None 时按收盘价全部成交、不计费用
+        :param market: 共享的 MarketData，传入时忽略 etf_data / option_data (多个策略实例共用一次预处理)
         """
-        self.etf = etf_data.set_index('trade_date')
-        self.options = option_data
-        self.capital = initial_capital
+        self.recorder = recorder
+        self.fill_engine = fill_engine
+        self.market = market if market is not None else MarketData(etf_data, option_data)
+        self.etf = self.market.etf
+        self.options = self.market.options_frame('C')
+        self.contracts = contracts
+        self.multiplier = multiplier
+        self.ledger = MarginLedger(initial_capital, multiplier=multiplier)  # 现金、保证金与逐日盯市
         self.positions = {}  # 当前持仓
         self.trade_log = []  # 交易记录
+        self.last_date = None  # 最近处理的交易日
 
-        # 预处理期权数据
-        self._preprocess_data()
-
-    def _preprocess_data(self):
-        """数据预处理"""
-        # 转换日期格式
-        self.options['trade_date'] = pd.to_datetime(self.options['trade_date'])
-        self.options['expire_date'] = pd.to_datetime(self.options['expire_date'])
-
-        # 筛选看涨期权
-        self.options = self.options[self.options['call_put'] == 'C']
-
-        # 创建多层索引 (交易日期, 期权代码)
-        self.options.set_index(['trade_date', 'ts_code'], inplace=True)
-
-    def _get_month_start_trade_dates(self):
-        """获取每月首个交易日"""
-        return self.etf.resample('MS').first().index
+    @property
+    def capital(self):
+        """可用资金 (现金 - 维持保证金)"""
+        return self.ledger.available
 
     def _find_atm_option(self, trade_date):
         """
@@ -48,93 +53,182 @@ class MonthlyATMCallStrategy:
         etf_price = self.etf.loc[trade_date, 'close']
 
         # 筛选当月到期期权
-        valid_options = self.options.loc[trade_date]
+        valid_options = self.market.options_on(trade_date, 'C')
+        if valid_options is None:
+            return None
+        valid_options = valid_options[
+            (valid_options['expire_date'] - trade_date).dt.days > 7
+            ]
         valid_options = valid_options[
             (valid_options['exercise_price'] >= etf_price * 0.98) &
             (valid_options['exercise_price'] <= etf_price * 1.02)
             ]
 
         if not valid_options.empty:
-            # 取行权价最接近的
-            return valid_options.nsmallest(1, 'price_diff').iloc[0]
+            # 取行权价最接近的, 同一行权价取最近到期
+            valid_options = valid_options.assign(price_diff=(valid_options['exercise_price'] - etf_price).abs())
+            return valid_options.sort_values(['price_diff', 'expire_date']).iloc[0]
         return None
 
+    @instrumented_run()
     def run_backtest(self):
         """运行回测"""
-        # 获取所有调仓日期
-        rebalance_dates = self._get_month_start_trade_dates()
-
         for date in self.etf.index:
-            # 检查是否需要展期
-            self._check_expiration(date)
+            self.on_bar(date)
+
+    def on_bar(self, date):
+        """
+        处理单个交易日 (回测循环与逐日更新共用)
+        :param date: 交易日，须在 etf_data 中且晚于已处理的交易日
+        """
+        # 检查是否需要展期
+        self._check_expiration(date)
+
+        # 每月首个交易日开仓
+        if self.last_date is None or self.last_date.to_period('M') != date.to_period('M'):
+            self._open_position(date)
 
-            # 每月首个交易日开仓
-            if date in rebalance_dates:
-                self._open_position(date)
+        # 更新每日净值
+        self._update_value(date)
+        self.last_date = date
 
-            # 更新每日净值
-            self._update_value(date)
+    # 快照包含的状态: 账本 (现金、持仓数组、保证金与每日记录)、持仓明细、交易记录与最近处理的交易日
+    STATE_ATTRS = ('ledger', 'positions', 'trade_log', 'last_date', 'contracts', 'multiplier')
+
+    def get_state(self):
+        """
+        策略状态 (可 pickle)，用于逐日更新的快照
+        :return: dict
+        """
+        return {name: copy.deepcopy(getattr(self, name)) for name in self.STATE_ATTRS}
+
+    def set_state(self, state):
+        """
+        从快照恢复状态，之后可直接对新交易日调用 on_bar
+        :param state: get_state 返回的 dict
+        """
+        for name in self.STATE_ATTRS:
+            setattr(self, name, copy.deepcopy(state[name]))
 
     def _open_position(self, trade_date):
         """开仓操作"""
         # 寻找平值期权
         option = self._find_atm_option(trade_date)
 
-        if option and self.capital > 0:
-            # 计算保证金 (假设保证金为期权价值的15%)
-            margin = option['close'] * 10000 * 0.15  # 假设合约乘数10000
+        if option is not None and self.capital > 0:
+            # 开仓保证金: 合约前结算价 + 标的前收盘价 (上交所公式)
+            margin_per_contract = float(short_option_margin(
+                option['pre_settle'], self.etf.loc[trade_date, 'pre_close'], option['exercise_price'],
+                True, self.multiplier))
+            margin = margin_per_contract * self.contracts
 
             if margin < self.capital:
+                qty, price, fee = self.contracts, option['close'], 0.0
+                if self.fill_engine is not None:
+                    # 按当日成交量限制卖出张数，成交价含价差与冲击成本
+                    fill = self.fill_engine.fill(self.contracts, -1, option['close'], option['vol'],
+                                                 option['high'], option['low'])
+                    qty, price, fee = float(fill['filled']), float(fill['price']), float(fill['commission'])
+                    if qty <= 0:
+                        return
+                    margin = margin_per_contract * qty
+
                 # 记录交易
                 self.positions[option.name] = {
                     'entry_date': trade_date,
-                    'entry_price': option['close'],
+                    'entry_price': price,
+                    'qty': qty,
                     'margin': margin,
                     'expire_date': option['expire_date']
                 }
 
-                # 更新资金
-                self.capital -= margin
+                # 收取权利金并占用保证金
+                self.ledger.open_short(option.name, qty, price, option['exercise_price'], True, margin_per_contract,
+                                       fee=fee)
                 self.trade_log.append({
                     'date': trade_date,
                     'type': 'sell',
-                    'price': option['close'],
+                    'price': price,
                     'contract': option.name,
-                    'margin': margin
+                    'qty': qty,
+                    'margin': margin,
+                    'fee': fee
                 })
 
     def _check_expiration(self, current_date):
         """检查持仓到期"""
-        to_close = []
-        for contract, pos in self.positions.items():
-            # 到期前7天平仓
-            if (pos['expire_date'] - current_date).days <= 7:
-                to_close.append(contract)
-
-        for contract in to_close:
-            # 释放保证金
-            self.capital += pos['margin']
-
-            # 记录平仓
-            self.trade_log.append({
-                'date': current_date,
-                'type': 'close',
-                'price': self.options.loc[(current_date, contract), 'close'],
-                'contract': contract,
-                'margin': pos['margin']
-            })
-
+        # 到期前7天平仓
+        to_close = [contract for contract, pos in self.positions.items()
+                    if (pos['expire_date'] - current_date).days <= 7]
+        if not to_close:
+            return
+
+        # 同一交易日的全部平仓订单一起撮合
+        rows = self.options.reindex(pd.MultiIndex.from_tuples([(current_date, c) for c in to_close]))
+        index = [self.ledger.position_index(c) for c in to_close]
+        held = self.ledger.qty[index]
+        last_settle = self.ledger.last_settle[index]
+        close = rows['close'].to_numpy(dtype=float)
+        # 到期仍未平掉的部分按标的收盘价的内在价值 max(S_T - K, 0) 了结
+        expired = np.array([current_date >= self.positions[c]['expire_date'] for c in to_close])
+        intrinsic = np.maximum(self.etf.loc[current_date, 'close'] - self.ledger.strike[index], 0.0)
+        if self.fill_engine is None:
+            # 当日无成交时按上一结算价平仓 (已到期的按内在价值)
+            filled, fees = held, np.zeros(len(to_close))
+            prices = np.where(np.isnan(close), np.where(expired, intrinsic, last_settle), close)
+        else:
+            fill = self.fill_engine.fill(held, 1, close, rows['vol'].to_numpy(dtype=float),
+                                         rows['high'].to_numpy(dtype=float), rows['low'].to_numpy(dtype=float))
+            filled, prices, fees = fill['filled'], fill['price'], fill['commission']
+        # 未成交部分次日继续平仓
+        settled = np.where(expired, held - filled, 0.0)
+
+        for i, contract in enumerate(to_close):
+            for qty, price, fee in ((filled[i], prices[i], fees[i]), (settled[i], intrinsic[i], 0.0)):
+                if qty > 0:
+                    self._close(current_date, contract, qty, price, fee)
+
+    def _close(self, date, contract, qty, price, fee):
+        """平掉 qty 张，按平仓张数占比释放开仓保证金；全部平掉时删除持仓"""
+        pos = self.positions[contract]
+        margin = pos['margin'] * qty / pos['qty']
+        # 支付权利金并释放保证金
+        self.ledger.close_short(contract, price, fee=fee, qty=qty)
+
+        # 记录平仓
+        self.trade_log.append({
+            'date': date,
+            'type': 'close',
+            'price': price,
+            'contract': contract,
+            'qty': qty,
+            'margin': margin,
+            'fee': fee
+        })
+
+        pos['qty'] -= qty
+        pos['margin'] -= margin
+        if pos['qty'] <= 0:
             del self.positions[contract]
 
     def _update_value(self, date):
-        """更新每日净值"""
-        # 实现市值计算逻辑
-        pass
-
-    def get_results(self):
-        """获取回测结果"""
-        # 实现绩效分析逻辑
+        """更新每日净值: 按结算价盯市并重算全部持仓的维持保证金"""
+        codes = self.ledger.codes
+        settle = np.full(codes.size, np.nan)
+        day = self.market.options_on(date, 'C') if codes.size else None
+        if day is not None:
+            settle = day['settle'].reindex(codes).to_numpy(dtype=float)
+        self.ledger.mark(date, settle, self.etf.loc[date, 'close'])
+
+    def get_results(self, risk_free=0.02):
+        """
+        获取回测结果
+        :param risk_free: 年化无风险利率 (夏普比率)
+        :return: {'nav': 每日现金/保证金/净值 DataFrame, 'metrics': 绩效与保证金峰值}
+        """
+        metrics = self.ledger.report(risk_free=risk_free)
+        metrics['n_trades'] = len(self.trade_log)
         return {
-            'nav': self._calculate_net_value(),
-            'metrics': self._calculate_metrics()
+            'nav': self.ledger.history(),
+            'metrics': metrics
         }
\ No newline at end of file
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+成交模拟 (向量化)：对同一根K线上的一批订单一次性计算可成交数量、成交价与费用
+
+    可成交数量 = min(委托数量, 参与率 × 当日成交量)，按最小交易单位向下取整
+    成交价     = 参考价 ± (半个价差 + 冲击成本)，买入加、卖出减
+    半个价差   = max(half_spread_ticks × 最小变动价位, spread_range_ratio × (最高价 - 最低价))
+    冲击成本   = impact_coef × (最高价 - 最低价) × sqrt(成交数量 / 当日成交量)
+    费用       = max(commission_rate × 成交金额 + commission_per_unit × 成交数量, min_commission)
+
+成交量单位: fund_daily 的 vol 为手 (100 份)，opt_daily 的 vol 为张，由 volume_unit 换算为交易单位
+"""
+
+import numpy as np
+
+# 上交所 ETF: 100 份一手，价格最小变动 0.001 元
+ETF_SPEC = {
+    'lot': 100,
+    'volume_unit': 100,
+    'tick': 0.001,
+    'multiplier': 1,
+    'commission_rate': 0.0001,
+    'commission_per_unit': 0.0,
+    'min_commission': 0.0,
+}
+
+# 上交所 ETF 期权: 1 张起，价格最小变动 0.0001 元，合约单位 10000，按张收费
+OPTION_SPEC = {
+    'lot': 1,
+    'volume_unit': 1,
+    'tick': 0.0001,
+    'multiplier': 10000,
+    'commission_rate': 0.0,
+    'commission_per_unit': 2.0,
+    'min_commission': 0.0,
+}
+
+
+class FillEngine:
+    """
+    成交模拟器，参数对一批订单统一生效，订单字段均为可广播的数组
+    """
+
+    def __init__(self, spec=OPTION_SPEC, participation=0.1, half_spread_ticks=1.0, spread_range_ratio=0.05,
+                 impact_coef=0.1):
+        """
+        :param spec: 品种参数 (ETF_SPEC / OPTION_SPEC 或同结构的 dict)
+        :param participation: 单笔订单最多占当日成交量的比例
+        :param half_spread_ticks: 半个价差的最小跳数
+        :param spread_range_ratio: 以当日振幅估计半个价差的比例
+        :param impact_coef: 冲击成本系数
+        """
+        self.spec = dict(spec)
+        self.participation = participation
+        self.half_spread_ticks = half_spread_ticks
+        self.spread_range_ratio = spread_range_ratio
+        self.impact_coef = impact_coef
+
+    def fill(self, qty, side, price, volume, high=None, low=None):
+        """
+        计算一批订单的成交
+
+        :param qty: 委托数量 (ETF 为份，期权为张)
+        :param side: 1 买入，-1 卖出
+        :param price: 参考价 (通常为收盘价)
+        :param volume: 当日成交量 (原始单位，见 volume_unit)，nan 或 0 表示无法成交
+        :param high: 当日最高价，缺省时只计最小价差
+        :param low: 当日最低价
+        :return: dict，filled (成交数量)、price (成交价)、commission (费用)、slippage (相对参考价的成本，元)、
+                 unfilled (未成交数量)
+        """
+        spec = self.spec
+        qty, side, price, volume = np.broadcast_arrays(
+            np.asarray(qty, dtype=float), np.asarray(side, dtype=float), np.asarray(price, dtype=float),
+            np.asarray(volume, dtype=float))
+        lot = spec['lot']
+
+        # 参与率上限，按最小交易单位向下取整
+        market_qty = np.where(np.isfinite(volume), volume, 0.0) * spec['volume_unit']
+        cap = np.floor(self.participation * market_qty / lot) * lot
+        filled = np.minimum(np.floor(qty / lot) * lot, cap)
+        filled = np.where(np.isfinite(price) & (price > 0), np.maximum(filled, 0.0), 0.0)
+
+        day_range = np.zeros_like(price)
+        if high is not None and low is not None:
+            day_range = np.nan_to_num(np.asarray(high, dtype=float) - np.asarray(low, dtype=float), nan=0.0)
+            day_range = np.maximum(day_range, 0.0)
+        half_spread = np.maximum(self.half_spread_ticks * spec['tick'], self.spread_range_ratio * day_range)
+        share = np.divide(filled, market_qty, out=np.zeros_like(filled), where=market_qty > 0)
+        impact = self.impact_coef * day_range * np.sqrt(share)
+
+        fill_price = price + side * (half_spread + impact)
+        # 成交价按最小变动价位取整 (对交易者不利的方向)，且不低于一个跳
+        tick = spec['tick']
+        fill_price = np.where(side > 0, np.ceil(fill_price / tick - 1e-9), np.floor(fill_price / tick + 1e-9)) * tick
+        fill_price = np.maximum(fill_price, tick)
+
+        notional = fill_price * filled * spec['multiplier']
+        commission = spec['commission_rate'] * notional + spec['commission_per_unit'] * filled
+        commission = np.where(filled > 0, np.maximum(commission, spec['min_commission']), 0.0)
+        slippage = (fill_price - price) * side * filled * spec['multiplier']
+        return {
+            'filled': filled,
+            'price': np.where(filled > 0, fill_price, np.nan),
+            'commission': commission,
+            'slippage': slippage,
+            'unfilled': qty - filled,
+        }
+
+    def affordable_qty(self, cash, price, volume, high=None, low=None):
+        """
+        买入时在给定资金内 (含价差、冲击与费用) 可成交的最大数量
+
+        :return: dict，同 fill 的返回
+        """
+        spec = self.spec
+        cash = np.asarray(cash, dtype=float)
+        price = np.asarray(price, dtype=float)
+        unit_cost = price * spec['multiplier']
+        qty = np.floor(cash / unit_cost / spec['lot']) * spec['lot']
+        result = self.fill(qty, 1, price, volume, high, low)
+        # 成交价高于参考价后资金不足时，按实际单位成本重新计算一次
+        unit_cost = np.nan_to_num(result['price'], nan=price) * spec['multiplier'] * (1 + spec['commission_rate']) \
+            + spec['commission_per_unit']
+        total = result['filled'] * np.nan_to_num(result['price']) * spec['multiplier'] + result['commission']
+        over = total > cash
+        if np.any(over):
+            budget = np.maximum(cash - spec['min_commission'], 0.0)
+            qty = np.where(over, np.floor(budget / unit_cost / spec['lot']) * spec['lot'], qty)
+            result = self.fill(qty, 1, price, volume, high, low)
+        return result
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+义务仓逐日盯市账本：持仓以平行数组保存，每日对全部持仓一次性计算结算价盯市与交易所维持保证金，
+现金、保证金占用、负债与净值按日记录为数组，最后输出绩效与保证金峰值报告
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.option.utils.margin import CONTRACT_UNIT, short_option_margin
+from scripts.option.utils.metrics import performance_report
+
+_HISTORY_FIELDS = ('cash', 'margin', 'liability', 'nav')
+
+
+class MarginLedger:
+    """
+    卖方期权账本
+
+    现金含权利金收支；净值 = 现金 - 按结算价计的义务仓市值；可用资金 = 现金 - 维持保证金
+    """
+
+    def __init__(self, initial_cash, multiplier=CONTRACT_UNIT):
+        """
+        :param initial_cash: 初始资金
+        :param multiplier: 合约单位
+        """
+        self.initial_cash = float(initial_cash)
+        self.cash = float(initial_cash)
+        self.multiplier = multiplier
+        # 持仓: 平行数组，qty 为卖出张数
+        self.codes = np.empty(0, dtype=object)
+        self.qty = np.empty(0)
+        self.strike = np.empty(0)
+        self.is_call = np.empty(0, dtype=bool)
+        self.last_settle = np.empty(0)
+        self.margin = np.empty(0)
+        # 每日记录 (按容量倍增的数组)
+        self._n = 0
+        self._dates = np.empty(0, dtype='datetime64[ns]')
+        self._history = {f: np.empty(0) for f in _HISTORY_FIELDS}
+
+    @property
+    def margin_used(self):
+        """当前保证金占用"""
+        return float(self.margin.sum())
+
+    @property
+    def available(self):
+        """可用资金"""
+        return self.cash - self.margin_used
+
+    def position_index(self, ts_code):
+        """合约在持仓数组中的位置，不存在时返回 None"""
+        idx = np.flatnonzero(self.codes == ts_code)
+        return int(idx[0]) if idx.size else None
+
+    def open_short(self, ts_code, qty, price, strike, is_call, margin_per_contract, fee=0.0):
+        """
+        卖出开仓：收取权利金，按开仓保证金占用资金
+        :param ts_code: 合约代码
+        :param qty: 卖出张数
+        :param price: 成交价
+        :param strike: 行权价
+        :param is_call: 是否认购
+        :param margin_per_contract: 每张开仓保证金
+        :param fee: 交易费用
+        """
+        self.cash += price * qty * self.multiplier - fee
+        idx = self.position_index(ts_code)
+        if idx is not None:
+            self.qty[idx] += qty
+            self.margin[idx] += margin_per_contract * qty
+            return
+        self.codes = np.append(self.codes, ts_code)
+        self.qty = np.append(self.qty, float(qty))
+        self.strike = np.append(self.strike, float(strike))
+        self.is_call = np.append(self.is_call, bool(is_call))
+        self.last_settle = np.append(self.last_settle, float(price))
+        self.margin = np.append(self.margin, margin_per_contract * qty)
+
+    def close_short(self, ts_code, price, fee=0.0, qty=None):
+        """
+        买入平仓：支付权利金并按比例释放保证金
+        :param qty: 平仓张数，默认全部
+        :return: 平仓张数
+        """
+        idx = self.position_index(ts_code)
+        if idx is None:
+            raise KeyError(f"没有合约 {ts_code} 的持仓")
+        held = self.qty[idx]
+        qty = held if qty is None else min(float(qty), held)
+        self.cash -= price * qty * self.multiplier + fee
+        if qty < held:
+            self.margin[idx] *= (held - qty) / held
+            self.qty[idx] = held - qty
+            return qty
+        keep = np.arange(self.codes.size) != idx
+        for name in ('codes', 'qty', 'strike', 'is_call', 'last_settle', 'margin'):
+            setattr(self, name, getattr(self, name)[keep])
+        return qty
+
+    def mark(self, date, settle, underlying_close):
+        """
+        日终盯市：更新结算价与维持保证金，并记录当日现金、保证金、负债与净值
+
+        :param date: 交易日
+        :param settle: 与 self.codes 对齐的当日结算价数组，nan 表示当日无行情 (沿用上一结算价)
+        :param underlying_close: 标的收盘价
+        """
+        settle = np.asarray(settle, dtype=float)
+        if settle.size:
+            self.last_settle = np.where(np.isnan(settle), self.last_settle, settle)
+        self.margin = short_option_margin(self.last_settle, underlying_close, self.strike, self.is_call,
+                                          self.multiplier) * self.qty
+        liability = float(np.sum(self.last_settle * self.qty) * self.multiplier)
+        self._append(date, cash=self.cash, margin=self.margin_used, liability=liability,
+                     nav=self.cash - liability)
+
+    def _append(self, date, **values):
+        if self._n == self._dates.size:
+            capacity = max(64, 2 * self._n)
+            self._dates = np.resize(self._dates, capacity)
+            for f in _HISTORY_FIELDS:
+                self._history[f] = np.resize(self._history[f], capacity)
+        self._dates[self._n] = np.datetime64(pd.Timestamp(date), 'ns')
+        for f in _HISTORY_FIELDS:
+            self._history[f][self._n] = values[f]
+        self._n += 1
+
+    def history(self):
+        """
+        每日账本
+        :return: DataFrame，索引为交易日，列为 cash / margin / liability / nav / margin_ratio
+        """
+        df = pd.DataFrame({f: self._history[f][:self._n] for f in _HISTORY_FIELDS},
+                          index=pd.DatetimeIndex(self._dates[:self._n], name='trade_date'))
+        df['margin_ratio'] = df['margin'] / df['nav'].where(df['nav'] > 0)
+        return df
+
+    def report(self, risk_free=0.02):
+        """
+        绩效与保证金报告
+        :param risk_free: 年化无风险利率
+        :return: dict
+        """
+        nav = np.concatenate([[self.initial_cash], self._history['nav'][:self._n]])
+        report = performance_report(nav, risk_free=risk_free)
+        margin = self._history['margin'][:self._n]
+        if self._n:
+            peak = int(np.argmax(margin))
+            navs = self._history['nav'][:self._n]
+            ratio = margin / np.where(navs > 0, navs, np.nan)
+            report.update({
+                'peak_margin': float(margin[peak]),
+                'peak_margin_date': pd.Timestamp(self._dates[peak]),
+                'peak_margin_ratio': float(np.nanmax(ratio)) if np.isfinite(ratio).any() else np.nan,
+                'avg_margin_ratio': float(np.nanmean(ratio)) if np.isfinite(ratio).any() else np.nan,
+            })
+        report['final_nav'] = float(nav[-1])
+        return report
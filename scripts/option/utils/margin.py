@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+上交所ETF期权卖方 (义务仓) 保证金 (向量化)
+
+维持保证金 (每日收盘后):
+    认购: [合约结算价 + Max(12% × 标的收盘价 - 认购期权虚值, 7% × 标的收盘价)] × 合约单位
+    认沽: Min[合约结算价 + Max(12% × 标的收盘价 - 认沽期权虚值, 7% × 行权价), 行权价] × 合约单位
+开仓保证金: 同一公式，结算价与标的收盘价换成合约前结算价与标的前收盘价
+虚值: 认购为 Max(行权价 - 标的价格, 0)，认沽为 Max(标的价格 - 行权价, 0)
+"""
+
+import numpy as np
+
+CONTRACT_UNIT = 10000
+UPPER_RATIO = 0.12
+LOWER_RATIO = 0.07
+
+
+def short_option_margin(settle, underlying_close, strike, is_call, multiplier=CONTRACT_UNIT,
+                        upper_ratio=UPPER_RATIO, lower_ratio=LOWER_RATIO):
+    """
+    每张义务仓的保证金，参数均可广播 (如 交易日 × 持仓 数组)
+
+    :param settle: 合约结算价 (开仓保证金时传前结算价)
+    :param underlying_close: 标的收盘价 (开仓保证金时传标的前收盘价)
+    :param strike: 行权价
+    :param is_call: True 为认购，可为布尔数组
+    :param multiplier: 合约单位
+    :return: 保证金数组 (元/张)
+    """
+    settle = np.asarray(settle, dtype=float)
+    underlying_close = np.asarray(underlying_close, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    call_otm = np.maximum(strike - underlying_close, 0.0)
+    put_otm = np.maximum(underlying_close - strike, 0.0)
+    call_margin = settle + np.maximum(upper_ratio * underlying_close - call_otm, lower_ratio * underlying_close)
+    put_margin = np.minimum(settle + np.maximum(upper_ratio * underlying_close - put_otm, lower_ratio * strike),
+                            strike)
+    return np.where(is_call, call_margin, put_margin) * multiplier
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+行情数据容器：ETF 与期权数据只做一次类型转换、排序和索引，多个策略实例共享同一份只读数据
+
+期权按 (交易日, 合约代码) 排序，预先记录每个交易日在数组中的起止位置，按日取数是一次切片而不是全表扫描
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class MarketData:
+    """
+    共享行情数据 (策略不得修改其中的 DataFrame)
+    """
+
+    def __init__(self, etf_data, option_data):
+        """
+        :param etf_data: ETF数据 (DataProcessor.get_etf_price 的输出)
+        :param option_data: 期权合并数据 (DataProcessor.get_opt_merge_data 的输出)
+        """
+        etf = etf_data.copy()
+        etf['trade_date'] = pd.to_datetime(etf['trade_date'])
+        etf = etf.sort_values('trade_date').set_index('trade_date', drop=False)
+        # 开仓保证金使用标的前收盘价: 优先使用行情中的 pre_close (除息日已调整)，缺失时以前一日收盘价代替
+        prev_close = etf['close'].shift(1).fillna(etf['close'])
+        etf['pre_close'] = etf['pre_close'].fillna(prev_close) if 'pre_close' in etf.columns else prev_close
+        self.etf = etf
+
+        options = option_data.copy()
+        options['trade_date'] = pd.to_datetime(options['trade_date'].astype(str)) \
+            if not pd.api.types.is_datetime64_any_dtype(options['trade_date']) else options['trade_date']
+        # get_opt_merge_data 返回的到期日字段为 maturity_date
+        if 'expire_date' not in options.columns:
+            options['expire_date'] = options['maturity_date']
+        options['expire_date'] = pd.to_datetime(options['expire_date'].astype(str))
+        self.options = options.set_index(['trade_date', 'ts_code']).sort_index()
+        self._by_type = {}
+
+    @property
+    def calendar(self):
+        """交易日 (DatetimeIndex)"""
+        return self.etf.index
+
+    def _typed(self, call_put):
+        """按认购/认沽筛选的期权及其每个交易日的起止位置 (首次使用时构建)"""
+        if call_put not in self._by_type:
+            frame = self.options if call_put is None else self.options[self.options['call_put'] == call_put]
+            dates = frame.index.get_level_values(0).to_numpy()
+            days, starts = np.unique(dates, return_index=True)
+            stops = np.append(starts[1:], len(dates))
+            spans = {pd.Timestamp(d): (int(a), int(b)) for d, a, b in zip(days, starts, stops)}
+            self._by_type[call_put] = (frame, spans)
+        return self._by_type[call_put]
+
+    def options_frame(self, call_put=None):
+        """
+        全部期权 (多层索引: 交易日, 合约代码)
+        :param call_put: 'C' / 'P'，None 为全部
+        """
+        return self._typed(call_put)[0]
+
+    def options_on(self, date, call_put=None):
+        """
+        某交易日的期权
+        :param date: 交易日
+        :param call_put: 'C' / 'P'，None 为全部
+        :return: 以合约代码为索引的 DataFrame，当日无数据时返回 None
+        """
+        frame, spans = self._typed(call_put)
+        span = spans.get(pd.Timestamp(date))
+        if span is None:
+            return None
+        return frame.iloc[span[0]:span[1]].droplevel(0)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+绩效与风险指标 (向量化)：最大回撤、VaR/CVaR、分布分位数
+
+净值/盈亏数组的最后一维为时间，前面的维度 (如蒙特卡洛路径、参数组合) 一次性批量计算
+"""
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def drawdown(nav, axis=-1):
+    """
+    回撤序列 (<= 0)
+    :param nav: 净值数组
+    :param axis: 时间维
+    :return: 与 nav 同形状的回撤比例
+    """
+    nav = np.asarray(nav, dtype=float)
+    peak = np.maximum.accumulate(nav, axis=axis)
+    return nav / peak - 1.0
+
+
+def max_drawdown(nav, axis=-1):
+    """最大回撤 (正数表示回撤幅度)"""
+    return -np.min(drawdown(nav, axis=axis), axis=axis)
+
+
+def value_at_risk(pnl, level=0.95):
+    """
+    历史模拟 VaR：损失超过该值的概率为 1 - level，以正数表示损失
+    :param pnl: 盈亏样本 (沿第 0 维)
+    """
+    return -np.quantile(np.asarray(pnl, dtype=float), 1 - level, axis=0)
+
+
+def conditional_var(pnl, level=0.95):
+    """CVaR / 期望损失：超过 VaR 部分的平均损失，以正数表示"""
+    pnl = np.asarray(pnl, dtype=float)
+    cutoff = np.quantile(pnl, 1 - level, axis=0)
+    tail = np.where(pnl <= cutoff, pnl, np.nan)
+    return -np.nanmean(tail, axis=0)
+
+
+def distribution_summary(pnl, max_dd=None, levels=(0.95, 0.99), quantiles=(0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)):
+    """
+    盈亏分布汇总
+    :param pnl: 每条路径的期末盈亏 (一维)
+    :param max_dd: 每条路径的最大回撤 (一维，可选)
+    :param levels: VaR/CVaR 置信水平
+    :param quantiles: 输出的分位点
+    :return: dict
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    summary = {
+        'n_paths': int(pnl.shape[0]),
+        'mean': float(pnl.mean()),
+        'std': float(pnl.std(ddof=1)) if pnl.shape[0] > 1 else 0.0,
+        'prob_loss': float((pnl < 0).mean()),
+        'pnl_quantiles': {q: float(v) for q, v in zip(quantiles, np.quantile(pnl, quantiles))},
+    }
+    for level in levels:
+        summary[f'var_{level:g}'] = float(value_at_risk(pnl, level))
+        summary[f'cvar_{level:g}'] = float(conditional_var(pnl, level))
+    if max_dd is not None:
+        max_dd = np.asarray(max_dd, dtype=float)
+        summary['max_drawdown_quantiles'] = {q: float(v) for q, v in zip(quantiles, np.quantile(max_dd, quantiles))}
+    return summary
+
+
+def performance_report(nav, risk_free=0.0, periods_per_year=TRADING_DAYS):
+    """
+    净值绩效指标
+    :param nav: 净值序列 (一维，按时间排序)
+    :param risk_free: 年化无风险利率 (用于夏普比率)
+    :param periods_per_year: 每年期数
+    :return: dict (total_return, annual_return, annual_vol, sharpe, max_drawdown, calmar)
+    """
+    nav = np.asarray(nav, dtype=float)
+    if nav.size < 2 or nav[0] == 0:
+        return {'total_return': 0.0, 'annual_return': 0.0, 'annual_vol': 0.0, 'sharpe': np.nan,
+                'max_drawdown': 0.0, 'calmar': np.nan}
+    returns = nav[1:] / nav[:-1] - 1.0
+    total_return = nav[-1] / nav[0] - 1.0
+    years = returns.size / periods_per_year
+    annual_return = (nav[-1] / nav[0]) ** (1 / years) - 1.0 if nav[-1] > 0 else -1.0
+    annual_vol = returns.std(ddof=1) * np.sqrt(periods_per_year) if returns.size > 1 else 0.0
+    excess = returns - risk_free / periods_per_year
+    sharpe = excess.mean() / excess.std(ddof=1) * np.sqrt(periods_per_year) \
+        if returns.size > 1 and excess.std(ddof=1) > 0 else np.nan
+    mdd = float(max_drawdown(nav))
+    return {
+        'total_return': float(total_return),
+        'annual_return': float(annual_return),
+        'annual_vol': float(annual_vol),
+        'sharpe': float(sharpe),
+        'max_drawdown': mdd,
+        'calmar': float(annual_return / mdd) if mdd > 0 else np.nan,
+    }
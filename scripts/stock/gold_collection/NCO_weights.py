@@ -6,32 +6,16 @@ Created on Tue May 16 20:43:14 2023
 """
 
 import numpy as np
-import pandas as pd
-import matplotlib
-import matplotlib.pyplot as plt
-from sklearn.neighbors import KernelDensity
-from scipy.optimize import minimize
-from scipy.linalg import block_diag
-from numpy import *
 from numpy.linalg import multi_dot
-from sklearn.model_selection import learning_curve,GridSearchCV
-from sklearn.model_selection import LeaveOneOut
-from scipy.linalg import eigh, cholesky
-from scipy.stats import norm
-import scipy.optimize as sco
-import time
-import os
-from scipy.cluster.hierarchy import dendrogram
-from scipy.cluster.hierarchy import set_link_color_palette
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_samples
-import matplotlib.pylab as plt
-import matplotlib
-plt.rcParams['font.sans-serif']=['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+
+# sklearn (KMeans/silhouette)、scipy.optimize、pandas 在首次使用时才导入,
+# 并行回测的 worker 导入本模块只需 numpy; 绘图字体设置放在真正画图的脚本里。
 
 
 def clusterKMeansBase1(corr0,maxNumClusters=6,n_init=10):
+    import pandas as pd
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_samples
     x,silh=((1-corr0.fillna(0))/2.)**.5,pd.Series()# observations matrix
     for init in range(n_init):
         for i in range(2,maxNumClusters+1):
@@ -65,7 +49,7 @@ def calculate_portfolio_var(w,sigma):
     return multi_dot([w.T,sigma,w])
 
 def calculate_risk_contribution(w,sigma):
-    vols = sqrt(calculate_portfolio_var(w,sigma))
+    vols = np.sqrt(calculate_portfolio_var(w,sigma))
     MRC = np.dot(sigma,w)/vols
     RC = np.multiply(MRC,w)
     return RC
@@ -73,10 +57,10 @@ def calculate_risk_contribution(w,sigma):
 def risk_budget_objective(x,pars):
     sigma = pars[0]
     x_t = pars[1]
-    sig_p = sqrt(calculate_portfolio_var(x,sigma))
+    sig_p = np.sqrt(calculate_portfolio_var(x,sigma))
     risk_target = np.multiply(sig_p,x_t)
     asset_RC = calculate_risk_contribution(x,sigma)
-    error = sum((asset_RC-risk_target)**2)
+    error = np.sum((asset_RC-risk_target)**2)
     return error
 
 def total_weight_constraint(x):
@@ -86,10 +70,10 @@ def long_only_constraint(x):
 
 def portfolio_stats(weights,mu,cov):
     
-    weights = array(weights)[:,newaxis]
-    port_rets =  weights.T @ mu    
-    port_vols = sqrt(multi_dot([weights.T, cov, weights])) 
-    
+    weights = np.array(weights)[:,np.newaxis]
+    port_rets =  np.ravel(weights.T @ mu)
+    port_vols = np.ravel(np.sqrt(multi_dot([weights.T, cov, weights])))
+
     return np.array([port_rets, port_vols, port_rets/port_vols]).flatten()
 
 def cov2corr(cov):
@@ -100,8 +84,10 @@ def cov2corr(cov):
     return corr
 
 def nco_weights(cov,cor,annual_rtns):
+    import pandas as pd
+    import scipy.optimize as sco
     corr1, clstrs, silh = clusterKMeansBase1(cor)
-    wIntra = pd.DataFrame(0, index=cov.index, columns=clstrs.keys())
+    wIntra = pd.DataFrame(0., index=cov.index, columns=clstrs.keys())
     for i in clstrs:
         initial_wts = len(clstrs[i])*[1./len(clstrs[i])]
         cov_sp = cov.loc[clstrs[i], clstrs[i]]
@@ -123,11 +109,103 @@ def nco_weights(cov,cor,annual_rtns):
 #bnds1 = tuple((0.,1) for x in range(sigma.shape[0]))
     
     cons = ({'type': 'eq', 'fun': total_weight_constraint},{'type': 'ineq', 'fun': long_only_constraint})
-    res= minimize(risk_budget_objective, w0, args=[sigma,x_t], method='SLSQP',constraints=cons,bounds=bnds1,tol=1e-10 ,options={'disp': True})
+    res= sco.minimize(risk_budget_objective, w0, args=[sigma,x_t], method='SLSQP',constraints=cons,bounds=bnds1,tol=1e-10 ,options={'disp': True})
     weight_final= res['x']
     wInter = pd.Series(weight_final.flatten(), index=cov2.index)
     w_nco = wIntra.mul(wInter, axis=1).sum(axis=1).sort_index()
     w_nco =pd.DataFrame(w_nco,index=w_nco.index)
     w_nco = w_nco.rename(index= str,columns={0:'NCO'})
     w_nco = w_nco.sort_index()
-    return w_nco,wIntra,wInter
\ No newline at end of file
+    return w_nco,wIntra,wInter
+
+### large universe: low-rank plus diagonal covariance (denoised_corr.cal_corr_lowrank)
+def clusterKMeansLowRank(corr_lr,maxNumClusters=10,n_init=3,sample_size=2000,seed=0):
+    """
+    clusterKMeansBase1 的低秩版本：不构造 N×N 距离矩阵，以去噪相关矩阵的因子载荷行 (单位化) 作为观测，
+    其欧氏距离平方 = 2 (1 - 信号部分的相关系数)；轮廓系数在 sample_size 个样本上估计
+    返回 (clstrs {簇: 成员下标}, labels)
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_samples
+    x = corr_lr.factor/np.maximum(np.linalg.norm(corr_lr.factor,axis=1),1e-12)[:,None]
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(x.shape[0],min(sample_size,x.shape[0]),replace=False)
+    best,labels = None,np.zeros(x.shape[0],dtype=int)
+    for init in range(n_init):
+        for i in range(2,min(maxNumClusters,x.shape[0]-1)+1):
+            kmeans_=KMeans(n_clusters=i,n_init=10,random_state=seed+init).fit(x)
+            if np.unique(kmeans_.labels_[sample]).size<2:
+                continue
+            silh_=silhouette_samples(x[sample],kmeans_.labels_[sample])
+            stat=silh_.mean()/silh_.std()
+            if best is None or stat>best:
+                best,labels = stat,kmeans_.labels_
+    clstrs={i:np.flatnonzero(labels==i) for i in np.unique(labels)}
+    return clstrs,labels
+
+def _intraWeightsLowRank(sub,mu=None,min_weight=0.05,slsqp_max=50):
+    """
+    单个簇的簇内多头权重 (和为 1)
+    簇内资产数 <= slsqp_max 时在协方差子块上用 SLSQP 求解，约束与 nco_weights 相同:
+        mu 给定时最大化夏普比率，否则最小化方差；权重下限 min_weight (min_weight × 资产数 > 1 时下限取 0)
+    更大的簇不构造子块，取 Woodbury 求解的 Σ^{-1}μ (mu 为 None 时 Σ^{-1}1) 截去负值后归一化 (不施加下限)；
+    截断后权重和过小 (如 μ 全为负) 时退回最小方差解 Σ^{-1}1，其元素和 1^T Σ^{-1} 1 > 0，截断后仍为正
+    """
+    m = sub.shape[0]
+    if m == 1:
+        return np.ones(1)
+    if m <= slsqp_max:
+        import scipy.optimize as sco
+        cov_sp = sub.to_dense()
+        lb = min_weight if min_weight*m <= 1 else 0.
+        bnds = tuple((lb, 1) for x in range(m))
+        cons = ({'type': 'eq', 'fun': total_weight_constraint})
+        if mu is None:
+            objective = lambda weights: calculate_portfolio_var(weights,cov_sp)
+        else:
+            objective = lambda weights: -portfolio_stats(weights,mu=mu,cov=cov_sp)[2]
+        res = sco.minimize(objective, m*[1./m], method='SLSQP',tol=1e-10, bounds=bnds,constraints=cons)
+        return res['x'].flatten()
+    w = np.clip(sub.solve(np.ones(m) if mu is None else mu),0.,None)
+    if w.sum() <= 1e-12*np.abs(w).max(initial=1.):
+        w = np.clip(sub.solve(np.ones(m)),0.,None)
+    return w/w.sum()
+
+def nco_weights_lowrank(cov_lr,annual_rtns=None,maxNumClusters=10,n_init=3,corr_lr=None,clstrs=None,
+                        min_weight=0.05,slsqp_max=50):
+    """
+    nco_weights 的低秩版本，全程不构造 N×N 矩阵:
+        簇内: 多头权重，见 _intraWeightsLowRank。annual_rtns 给定时为最大夏普，否则为最小方差；
+              簇内资产数 <= slsqp_max 时与 nco_weights 相同 (SLSQP，权重下限 min_weight)，
+              更大的簇为 Woodbury 解析解截去空头后归一化，与 nco_weights 的约束解不完全一致
+        簇间: 簇协方差 W^T Σ W (簇数×簇数) 上的风险平价 (与 nco_weights 相同)
+    cov_lr: 协方差 LowRankDiag；corr_lr: 用于聚类的相关 LowRankDiag，缺省由 cov_lr 归一化
+    clstrs: 可选，给定的聚类 {簇: 成员下标}，缺省由 clusterKMeansLowRank 聚类
+    返回 (w_nco, wIntra, wInter)，与 nco_weights 相同
+    """
+    import pandas as pd
+    import scipy.optimize as sco
+    if corr_lr is None:
+        corr_lr = cov_lr.scale(1./np.sqrt(cov_lr.diagonal()))
+    index = cov_lr.index if cov_lr.index is not None else pd.RangeIndex(cov_lr.shape[0])
+    if clstrs is None:
+        clstrs, _ = clusterKMeansLowRank(corr_lr,maxNumClusters=maxNumClusters,n_init=n_init)
+    mu_all = None if annual_rtns is None else np.asarray(annual_rtns,dtype=float).ravel()
+    wIntra = np.zeros((cov_lr.shape[0],len(clstrs)))
+    for j,i in enumerate(clstrs):
+        members = np.asarray(clstrs[i])
+        mu = None if mu_all is None else mu_all[members]
+        wIntra[members,j] = _intraWeightsLowRank(cov_lr.sub(members),mu,min_weight=min_weight,slsqp_max=slsqp_max)
+    # W^T Σ W = (W^T F)(W^T F)^T + W^T D W
+    wf = wIntra.T @ cov_lr.factor
+    cov2 = wf @ wf.T + (wIntra*cov_lr.diag[:,None]).T @ wIntra
+    x_t = (cov2.shape[0])*[1./(cov2.shape[0])]
+    w0 = (cov2.shape[0])*[1./(cov2.shape[0])]
+    bnds1 = tuple((0, 1) for x in range(cov2.shape[0]))
+    cons = ({'type': 'eq', 'fun': total_weight_constraint},{'type': 'ineq', 'fun': long_only_constraint})
+    res= sco.minimize(risk_budget_objective, w0, args=[cov2,x_t], method='SLSQP',constraints=cons,bounds=bnds1,tol=1e-10)
+    wIntra = pd.DataFrame(wIntra, index=index, columns=list(clstrs))
+    wInter = pd.Series(res['x'].flatten(), index=wIntra.columns)
+    w_nco = wIntra.mul(wInter, axis=1).sum(axis=1).sort_index()
+    w_nco = pd.DataFrame(w_nco, index=w_nco.index).rename(index=str, columns={0:'NCO'})
+    return w_nco,wIntra,wInter
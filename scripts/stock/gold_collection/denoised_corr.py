@@ -6,34 +6,10 @@ Created on Mon May 15 10:16:27 2023
 """
 
 import numpy as np
-import pandas as pd
-import matplotlib
-import matplotlib.pyplot as plt
-from sklearn.neighbors import KernelDensity
-from scipy.optimize import minimize
-from scipy.linalg import block_diag
-from numpy import *
-from numpy.linalg import multi_dot
-from sklearn.model_selection import learning_curve,GridSearchCV
-from sklearn.model_selection import LeaveOneOut
-from scipy.linalg import eigh, cholesky
-from scipy.stats import norm
-import scipy.optimize as sco
-
-import tushare as ts
-pro = ts.pro_api('7e33b6a3e2bad955cd087c9e5a6e69ad34dc797daee4ff6de9cb08f7')
-
-import time
-import os
-
-from scipy.cluster.hierarchy import dendrogram
-from scipy.cluster.hierarchy import set_link_color_palette
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_samples
-import matplotlib.pylab as plt
-import matplotlib
-plt.rcParams['font.sans-serif']=['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+
+# sklearn / scipy.optimize / pandas 等重依赖在首次使用时才导入,
+# 并行回测的 worker 只需 numpy 即可加载本模块的数值核心 (cov2corr、getPCA、denoisedCorr)。
+# 绘图字体设置放在真正画图的脚本里 (见 mutual_fund.py)。
 
 
 ### calculate cov to corr or corr to cov
@@ -50,7 +26,8 @@ def corr2cov(corr, std):
 
 ### PCA get eigenvalue
 def getPCA(matrix): #corr matrix
-    eVal, eVec = np.linalg.eig(matrix) #complex Hermitian (conjugate symmetric) or a real symmetric matrix.
+    # 实对称矩阵用 eigh: 特征值为实数、特征向量正交 (eig 在 T < N 的秩亏矩阵上会返回复数且不正交的零空间向量)
+    eVal, eVec = np.linalg.eigh(matrix)
     indices = eVal.argsort()[::-1] #arguments for sorting eval desc
     eVal,eVec = eVal[indices],eVec[:,indices]
     eVal = np.diagflat(eVal) # identity matrix with eigenvalues as diagonal
@@ -58,6 +35,8 @@ def getPCA(matrix): #corr matrix
 
 ###GridSearch find bWidth
 def findOptimalBWidth(eigenvalues):
+    from sklearn.model_selection import GridSearchCV, LeaveOneOut
+    from sklearn.neighbors import KernelDensity
     bandwidths = 10 ** np.linspace(-1, 1, 100)
     grid = GridSearchCV(KernelDensity(kernel='gaussian'),
                         {'bandwidth': bandwidths},
@@ -67,6 +46,7 @@ def findOptimalBWidth(eigenvalues):
 
 ### denoise use random matrix
 def mpPDF(var,q,pts):
+    import pandas as pd
     eMin,eMax = var*(1-(1./q)**.5)**2, var*(1+(1./q)**.5)**2
     eVal = np.linspace(eMin, eMax, pts)
     pdf = q/(2*np.pi*var*eVal)*((eMax-eVal)*(eVal-eMin))**.5
@@ -76,6 +56,8 @@ def mpPDF(var,q,pts):
 def fitKDE(obs, bWidth, kernel='gaussian', x=None):
     #Fit kernel to a series of obs, and derive the prob of obs
     # x is the array of values on which the fit KDE will be evaluated
+    import pandas as pd
+    from sklearn.neighbors import KernelDensity
     #print(len(obs.shape) == 1)
     if len(obs.shape) == 1: obs = obs.reshape(-1,1)
     kde = KernelDensity(kernel = kernel, bandwidth = bWidth).fit(obs)
@@ -96,6 +78,7 @@ def errPDFs(var, eVal, q, bWidth, pts=1000):
     return sse 
 
 def findMaxEval(eVal, q, bWidth):
+    from scipy.optimize import minimize
     out = minimize(lambda *x: errPDFs(*x), x0=np.array(0.5), args=(eVal, q, bWidth), bounds=((1E-5, 1-1E-5),))
     print("found errPDFs"+str(out['x'][0]))
     if out['success']: var = out['x'][0]
@@ -114,6 +97,7 @@ def denoisedCorr(eVal,eVec,nFacts):
     return corr1
 
 def cal_corr(data,start,end):
+    import pandas as pd
     df = data[start:end]
     riskfree = 0.02
     
@@ -121,9 +105,9 @@ def cal_corr(data,start,end):
     
     annual_rtn = excess_returns.mean()*252
     
-    annual_rtns = array(excess_returns.mean()*252)[:,newaxis]
+    annual_rtns = np.asarray(excess_returns.mean()*252)[:,np.newaxis]
     
-    annual_vols = (excess_returns.std()*sqrt(252))[:,newaxis]
+    annual_vols = np.asarray(excess_returns.std()*np.sqrt(252))[:,np.newaxis]
     
     cov = excess_returns.cov()*252
     corr = cov2corr(cov)
@@ -144,6 +128,141 @@ def cal_corr(data,start,end):
     return cor_denoise2,cov_denoised,annual_rtn
 
 
+
+### large universe: truncated eigensolver + low-rank plus diagonal
+# 股票池 N 较大 (如全A 5000 只) 时不构造 N×N 矩阵：只求信号特征对，去噪后的相关矩阵表示为 F F^T + diag(d)
+class LowRankDiag:
+    """
+    低秩加对角矩阵 M = F F^T + diag(d)，F 为 N×k，只保存 F 与 d (O(Nk) 内存)
+    """
+
+    def __init__(self, factor, diag, index=None):
+        self.factor = np.asarray(factor, dtype=float)
+        self.diag = np.asarray(diag, dtype=float)
+        self.index = index
+
+    @property
+    def shape(self):
+        n = self.diag.shape[0]
+        return n, n
+
+    def matvec(self, x):
+        """M @ x，x 可为向量或 N×m 矩阵"""
+        x = np.asarray(x, dtype=float)
+        d = self.diag if x.ndim == 1 else self.diag[:, None]
+        return self.factor @ (self.factor.T @ x) + d * x
+
+    def solve(self, b):
+        """M^{-1} b (Woodbury 公式，只需解 k×k 方程组)"""
+        b = np.asarray(b, dtype=float)
+        dinv = 1. / self.diag if b.ndim == 1 else 1. / self.diag[:, None]
+        fd = self.factor / self.diag[:, None]  # D^{-1} F
+        inner = np.eye(self.factor.shape[1]) + self.factor.T @ fd
+        return dinv * b - fd @ np.linalg.solve(inner, fd.T @ b)
+
+    def block(self, rows, cols=None):
+        """取子块 M[rows, cols] 为稠密矩阵 (rows/cols 为位置下标)"""
+        rows = np.asarray(rows)
+        cols = rows if cols is None else np.asarray(cols)
+        out = self.factor[rows] @ self.factor[cols].T
+        same = rows[:, None] == cols[None, :]
+        out[same] += np.broadcast_to(self.diag[rows][:, None], same.shape)[same]
+        return out
+
+    def sub(self, rows):
+        """子矩阵 M[rows, rows]，仍为低秩加对角"""
+        rows = np.asarray(rows)
+        index = None if self.index is None else self.index[rows]
+        return LowRankDiag(self.factor[rows], self.diag[rows], index)
+
+    def scale(self, std):
+        """S M S (S = diag(std))，相关矩阵 -> 协方差矩阵"""
+        std = np.asarray(std, dtype=float).ravel()
+        return LowRankDiag(self.factor * std[:, None], self.diag * std ** 2, self.index)
+
+    def diagonal(self):
+        return np.einsum('ij,ij->i', self.factor, self.factor) + self.diag
+
+    def to_dense(self):
+        """稠密矩阵 (仅用于小 N 或校验)"""
+        return self.factor @ self.factor.T + np.diag(self.diag)
+
+
+def topEigen(x, k, method='lanczos', n_oversample=10, n_iter=4, seed=0):
+    """
+    相关矩阵 C = x^T x / T 的前 k 个特征对，不构造 C
+    x: T×N 标准化收益 (列均值 0、方差 1)
+    method: 'lanczos' (scipy eigsh，按需导入) 或 'randomized' (随机子空间迭代，仅 numpy)
+    返回按特征值降序的 (eVal 向量, eVec N×k)
+    """
+    T, N = x.shape
+    k = int(min(k, N - 1))
+    if method == 'lanczos':
+        from scipy.sparse.linalg import LinearOperator, eigsh
+        op = LinearOperator((N, N), matvec=lambda v: x.T @ (x @ v) / T, dtype=float)
+        eVal, eVec = eigsh(op, k=k, which='LA')
+    elif method == 'randomized':
+        rng = np.random.default_rng(seed)
+        q, _ = np.linalg.qr(x.T @ (x @ rng.standard_normal((N, k + n_oversample))))
+        for _ in range(n_iter):
+            q, _ = np.linalg.qr(x.T @ (x @ q))
+        # 子空间内的 Rayleigh-Ritz
+        small = (x @ q).T @ (x @ q) / T
+        eVal, w = np.linalg.eigh(small)
+        eVal, eVec = eVal[-k:], q @ w[:, -k:]
+    else:
+        raise ValueError("method 须为 'lanczos' 或 'randomized'")
+    indices = eVal.argsort()[::-1]
+    return eVal[indices], eVec[:, indices]
+
+
+def mpMaxEval(q, var=1.):
+    """
+    Marchenko-Pastur 上界的解析值 eMax = var (1 + sqrt(1/q))^2
+    替代 findMaxEval 的 KDE 拟合 (需要全部特征值)；var 默认 1，即纯噪声相关矩阵的理论上界
+    """
+    return var * (1 + (1. / q) ** .5) ** 2
+
+
+def denoisedCorrLowRank(eVal, eVec, nFacts, N):
+    """
+    与 denoisedCorr 相同的去噪 (噪声特征值替换为其均值) 并按 cov2corr 归一化对角线，结果表示为低秩加对角:
+        C1 = V (Λ - λ̄) V^T + λ̄ I,  C = D^{-1/2} C1 D^{-1/2},  D = diag(C1)
+    只需信号特征对，噪声特征值均值由迹 (= N) 得到
+    """
+    V, L = eVec[:, :nFacts], eVal[:nFacts]
+    lam = (N - L.sum()) / float(N - nFacts)
+    factor = V * np.sqrt(np.maximum(L - lam, 0.))
+    d = np.einsum('ij,ij->i', factor, factor) + lam
+    return LowRankDiag(factor / np.sqrt(d)[:, None], lam / d)
+
+
+def cal_corr_lowrank(data, start, end, k=100, method='lanczos'):
+    """
+    cal_corr 的大样本版本：截断特征分解 + 解析 MP 上界，返回低秩加对角的相关矩阵与协方差矩阵
+    k: 最多计算的特征对个数，信号个数达到 k 时自动加倍
+    返回 (corr LowRankDiag, cov LowRankDiag, annual_rtn Series)
+    """
+    df = data[start:end]
+    riskfree = 0.02
+    excess_returns = df.pct_change().fillna(0) - riskfree/252
+    annual_rtn = excess_returns.mean()*252
+    x = excess_returns.to_numpy(dtype=float)
+    T, N = x.shape
+    std = x.std(axis=0, ddof=1)
+    z = (x - x.mean(axis=0)) / np.where(std > 0, std, 1.) / np.sqrt((T - 1.) / T)  # C = z^T z / T
+    q = T / float(N)
+    while True:
+        eVal, eVec = topEigen(z, k, method=method)
+        nFacts = int(np.sum(eVal > mpMaxEval(q)))
+        if nFacts < eVal.shape[0] or eVal.shape[0] >= N - 1:
+            break
+        k *= 2
+    corr = denoisedCorrLowRank(eVal, eVec, max(nFacts, 1), N)
+    corr.index = df.columns
+    cov = corr.scale(std * np.sqrt(252))
+    return corr, cov, annual_rtn
+
 # df_1 = pd.read_csv('C:\\jupyter_work\\port_mana\\FOF_20221208.csv',encoding='gbk',index_col=0)
 # df_1.index = pd.to_datetime(df_1.index)
 
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from data.dataHelper.contract_master import ContractMaster
+
+OPT_BASIC_FILE = os.path.join(grand_parent_dir, 'data', 'dataHelper', 'opt_basic', 'SSE',
+                              'opt_basic_SSE_20240101_20241231.csv')
+
+
+def _opt_basic():
+    return pd.read_csv(OPT_BASIC_FILE, dtype={'name': str, 'list_date': str, 'delist_date': str})
+
+
+def test_parse_typed_fields():
+    basic = pd.DataFrame({
+        'ts_code': ['1.SH', '2.SH', '3.SH'],
+        'name': ['南方中证500ETF期权2401认购4.60', '华夏上证50ETF期权2312认沽2.65A', '华夏上证科创板50ETF期权2406认购1.051'],
+        'opt_code': ['OP510500.SH', 'OP510050.SH', 'OP588000.SH'],
+    })
+    frame = ContractMaster(basic).frame
+    assert list(frame['underlying']) == ['510500.SH', '510050.SH', '588000.SH']
+    assert list(frame['expiry_month']) == [202401, 202312, 202406]
+    assert list(frame['call_put']) == ['C', 'P', 'C']
+    assert list(frame['strike']) == [4.6, 2.65, 1.051]
+    assert list(frame['adjusted']) == [False, True, True]
+    assert list(frame['underlying_name']) == ['南方中证500ETF', '华夏上证50ETF', '华夏上证科创板50ETF']
+
+
+def test_select_matches_name_scan():
+    basic = _opt_basic()
+    master = ContractMaster(basic)
+    expected = basic.loc[basic['name'].str.contains('500ETF')]
+    assert master.select(underlying='510500.SH').equals(expected)
+    assert master.select(underlying_name='南方中证500ETF').equals(expected)
+
+
+def test_same_suffix_underlyings_stay_separate():
+    # 上证50ETF 与两只科创50ETF 名称均以 50ETF 结尾，按标的代码和完整名称索引互不混淆
+    master = ContractMaster(_opt_basic())
+    codes = {u: set(master.select(underlying=u)['opt_code']) for u in ('510050.SH', '588000.SH', '588080.SH')}
+    assert codes == {u: {'OP' + u} for u in codes}
+    names = set(master.select(underlying_name='华夏上证50ETF')['opt_code'])
+    assert names == {'OP510050.SH'}
+
+
+def test_chain_strike_range_lookup():
+    basic = _opt_basic()
+    master = ContractMaster(basic)
+    picked = master.select(underlying='510500.SH', expiry_month=202406, call_put='C', strike_min=5.0, strike_max=6.0)
+    mask = (basic['opt_code'] == 'OP510500.SH') & (basic['maturity_date'].astype(str).str[:6] == '202406') & \
+        (basic['call_put'] == 'C') & basic['exercise_price'].between(5.0, 6.0)
+    assert sorted(picked['ts_code']) == sorted(basic.loc[mask, 'ts_code'])
+    assert len(picked) > 0
@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from data.dataHelper.data_processor import DataProcessor
+from data.dataHelper.instrumentation import PerfRecorder, instrumented_run
+
+
+class _FakePro:
+    def fund_daily(self, **kwargs):
+        return pd.DataFrame({'ts_code': [kwargs['ts_code']], 'trade_date': ['20240102'], 'close': [5.5]})
+
+
+def test_stage_nesting_and_counters():
+    recorder = PerfRecorder()
+    with recorder.run('outer', tag='x') as record:
+        with recorder.stage('api'):
+            with recorder.stage('parse'):
+                pass
+        recorder.incr('rows_read', 10)
+    recorder.incr('rows_read', 5)
+
+    assert record['counters'] == {'rows_read': 10}
+    assert recorder.totals.counters['rows_read'] == 15
+    assert 'outer/api/parse' in recorder.totals.stages
+    assert record['meta'] == {'tag': 'x'}
+    assert json.loads(recorder.to_json())['runs'][0]['name'] == 'outer'
+
+
+def test_profile_env_records_tracemalloc(monkeypatch):
+    monkeypatch.setenv('BACKTEST_PROFILE', 'tracemalloc')
+    recorder = PerfRecorder()
+    with recorder.run('alloc'):
+        _ = [0] * 10000
+    assert recorder.runs[0]['tracemalloc']['peak_bytes'] > 0
+
+
+def test_instrumented_run_uses_instance_recorder():
+    class Strategy:
+        def __init__(self, recorder):
+            self.recorder = recorder
+
+        @instrumented_run()
+        def run_backtest(self):
+            return 42
+
+    recorder = PerfRecorder()
+    assert Strategy(recorder).run_backtest() == 42
+    assert recorder.runs[0]['name'] == 'Strategy.run_backtest'
+
+
+def test_processor_counts_api_and_cache_hits():
+    recorder = PerfRecorder()
+    processor = DataProcessor(_FakePro(), recorder=recorder)
+    etf = processor.get_etf_price('510500.SH', '20240101', '20241231')
+
+    counters = recorder.totals.counters
+    # 本地文件命中时不再请求接口
+    assert counters.get('api_calls', 0) == 0
+    assert counters['cache_hits'] == 1
+    assert counters['rows_read'] == len(etf)
+    assert counters['bytes_read'] > 0
+
+
+def test_threads_keep_own_stages_and_runs():
+    import threading
+
+    recorder = PerfRecorder()
+    barrier = threading.Barrier(4)
+    records = {}
+
+    def work(i):
+        with recorder.run(f'run{i}') as record:
+            barrier.wait()
+            for _ in range(200):
+                with recorder.stage(f'stage{i}'):
+                    recorder.incr('api_calls')
+        records[i] = record
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert recorder.totals.counters['api_calls'] == 800
+    for i, record in records.items():
+        assert record['counters'] == {'api_calls': 200}
+        assert set(record['stages']) == {f'run{i}/stage{i}'}
+        assert record['stages'][f'run{i}/stage{i}']['calls'] == 200
+
+
+def test_runs_are_capped():
+    recorder = PerfRecorder(max_runs=3)
+    for i in range(10):
+        with recorder.run(f'run{i}'):
+            pass
+    assert [r['name'] for r in recorder.runs] == ['run7', 'run8', 'run9']
+    recorder.reset()
+    assert len(recorder.runs) == 0 and recorder.max_runs == 3
+
+
+def test_reset_keeps_other_threads_running():
+    import threading
+
+    recorder = PerfRecorder()
+    lock = recorder._lock
+    inside, resumed = threading.Event(), threading.Event()
+    records = {}
+
+    def work():
+        with recorder.run('worker') as record:
+            with recorder.stage('outer'):
+                inside.set()
+                resumed.wait()
+                with recorder.stage('inner'):
+                    recorder.incr('api_calls')
+        records['worker'] = record
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    inside.wait()
+    recorder.reset()
+    resumed.set()
+    thread.join()
+    assert recorder._lock is lock
+    # reset 之后完成的阶段仍按原来的嵌套计入，run 仍被记录
+    assert recorder.totals.counters == {'api_calls': 1}
+    assert 'worker/outer/inner' in recorder.totals.stages
+    assert [r['name'] for r in recorder.runs] == ['worker']
+    assert records['worker']['counters'] == {'api_calls': 1}
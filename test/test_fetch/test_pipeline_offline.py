@@ -0,0 +1,35 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import FakeProApi, SyntheticMarket
+from data.data_fetcher import DataFetcher
+from data.dataHelper.instrumentation import PerfRecorder
+
+
+def test_synthetic_market_is_deterministic():
+    a = SyntheticMarket(n_days=40, seed=3)
+    b = SyntheticMarket(n_days=40, seed=3)
+    assert a.opt_daily.equals(b.opt_daily)
+    assert a.etf_daily['510500.SH'].equals(b.etf_daily['510500.SH'])
+
+
+def test_prepare_backtest_data_origin_offline(tmp_path):
+    market = SyntheticMarket(n_days=60, underlyings=('510500.SH', '510300.SH'))
+    fake = FakeProApi(market)
+    recorder = PerfRecorder()
+    fetcher = DataFetcher(pro_api=fake, recorder=recorder, data_dir=str(tmp_path), api_interval=0)
+
+    etf, merged = fetcher.prepare_backtest_data_origin(market.start_date, market.end_date, '500', 'SSE')
+
+    assert len(etf) == 60
+    assert set(merged['opt_code']) == {'OP510500.SH'}
+    assert recorder.runs[-1]['counters']['api_calls'] == fake.calls['opt_daily'] + fake.calls['fund_daily'] + 1
+
+    # 第二次全部命中本地缓存, 不再请求期权接口
+    calls_before = dict(fake.calls)
+    _, merged_again = fetcher.prepare_backtest_data_origin(market.start_date, market.end_date, '500', 'SSE')
+    assert fake.calls['opt_daily'] == calls_before['opt_daily']
+    assert len(merged_again) == len(merged)
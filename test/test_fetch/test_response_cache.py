@@ -0,0 +1,150 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import FakeProApi, SyntheticMarket
+from data.data_fetcher import DataFetcher
+from data.dataHelper.instrumentation import PerfRecorder
+from data.dataHelper.response_cache import (InMemoryBackend, ResponseCache, decode_frame, encode_frame,
+                                            make_cache_key)
+
+
+def test_key_ignores_param_order_and_field_spacing():
+    a = make_cache_key('opt_daily', {'ts_code': '1.SH', 'fields': 'ts_code, close,settle'})
+    b = make_cache_key('opt_daily', {'fields': 'settle,ts_code,close', 'ts_code': '1.SH', 'trade_date': None})
+    assert a == b
+    assert a != make_cache_key('fund_daily', {'ts_code': '1.SH', 'fields': 'ts_code,close,settle'})
+
+
+def test_encode_decode_roundtrip():
+    df = pd.DataFrame({'ts_code': ['a', None], 'close': [1.5, np.nan], 'vol': [10, 20],
+                       'trade_date': pd.to_datetime(['2024-01-02', '2024-01-03']), 'flag': [True, False],
+                       'n': pd.array([1, None], dtype='Int64')})
+    decoded = decode_frame(encode_frame(df))
+    pd.testing.assert_frame_equal(decoded, df)
+
+
+def test_decode_rejects_pickle_and_corrupt_blobs():
+    import pickle
+    import zlib
+
+    class Exploit:
+        def __reduce__(self):
+            return (os.system, ('echo pwned',))
+
+    blobs = [zlib.compress(pickle.dumps(Exploit())), zlib.compress(pickle.dumps({'columns': []})),
+             b'not zlib', encode_frame(pd.DataFrame({'a': [1.0]}))[:-3]]
+    for blob in blobs:
+        try:
+            decode_frame(blob)
+        except ValueError:
+            continue
+        raise AssertionError('invalid blob was decoded')
+
+    # 缓存中格式无效的数据视为未命中并被替换
+    backend = InMemoryBackend()
+    cache = ResponseCache(backend, recorder=PerfRecorder())
+    key = make_cache_key('fund_daily', {'ts_code': '1.SH'})
+    backend.set(key, blobs[0])
+    df = pd.DataFrame({'close': [1.0]})
+    assert cache.fetch('fund_daily', {'ts_code': '1.SH'}, lambda: df).equals(df)
+    assert decode_frame(backend.get(key)).equals(df)
+
+
+
+def _with_header(blob, **changes):
+    """改写 encode_frame 结果中第一列的表头字段"""
+    import json
+    import struct
+    import zlib
+    from data.dataHelper.response_cache import FRAME_MAGIC
+    raw = zlib.decompress(blob)
+    offset = len(FRAME_MAGIC)
+    (head_len,) = struct.unpack('>I', raw[offset:offset + 4])
+    header = json.loads(raw[offset + 4:offset + 4 + head_len])
+    header['columns'][0].update(changes)
+    head = json.dumps(header).encode('utf-8')
+    return zlib.compress(FRAME_MAGIC + struct.pack('>I', len(head)) + head + raw[offset + 4 + head_len:])
+
+
+def test_malformed_header_is_cache_miss():
+    blob = encode_frame(pd.DataFrame({'ts_code': ['a', 'b'], 'close': [1.0, 2.0]}))
+    bad = [_with_header(blob, dtype='no_such_dtype'), _with_header(blob, dtype='int64'),
+           _with_header(blob, dtype=['int64']), _with_header(blob, nbytes='3'), _with_header(blob, kind=None)]
+    backend = InMemoryBackend()
+    recorder = PerfRecorder()
+    cache = ResponseCache(backend, recorder=recorder)
+    key = make_cache_key('fund_daily', {'ts_code': '1.SH'})
+    for blob in bad:
+        backend.set(key, blob)
+        assert cache._get_cached(key, recorder) is None
+        assert backend.get(key) is None
+    assert recorder.totals.counters.get('api_cache_hits', 0) == 0
+
+
+def test_backend_ttl_and_lru():
+    backend = InMemoryBackend(max_entries=2)
+    backend.set('a', b'1')
+    backend.set('b', b'2')
+    backend.get('a')
+    backend.set('c', b'3')
+    assert backend.get('b') is None and backend.get('a') == b'1'
+    backend.set('d', b'4', ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('d') is None
+    assert backend.set_nx('lock', b'x') and not backend.set_nx('lock', b'y')
+
+
+def test_single_flight_across_threads_and_processes():
+    backend = InMemoryBackend()
+    # 两个 ResponseCache 共享一个后端，模拟两个进程
+    caches = [ResponseCache(backend, poll_interval=0.005), ResponseCache(backend, poll_interval=0.005)]
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return pd.DataFrame({'x': [1, 2, 3]})
+
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(c.fetch('opt_basic', {'exchange': 'SSE'}, loader)))
+               for c in caches * 4]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len(results) == 8 and all(r['x'].tolist() == [1, 2, 3] for r in results)
+
+
+def test_fetchers_share_cache(tmp_path):
+    market = SyntheticMarket(n_days=40)
+    cache = ResponseCache(InMemoryBackend())
+    first, second = FakeProApi(market), FakeProApi(market)
+
+    recorder = PerfRecorder()
+    etf, merged = DataFetcher(pro_api=first, recorder=recorder, data_dir=str(tmp_path / 'a'), api_interval=0,
+                              cache=cache).prepare_backtest_data_origin(market.start_date, market.end_date)
+    assert first.calls['fund_daily'] == 1
+    assert recorder.runs[-1]['counters']['api_cache_misses'] == sum(first.calls.values())
+    assert recorder.runs[-1]['counters']['api_calls'] == sum(first.calls.values())
+
+    # 另一个研究员的本地目录为空，但所有接口响应都来自共享缓存
+    recorder2 = PerfRecorder()
+    etf2, merged2 = DataFetcher(pro_api=second, recorder=recorder2, data_dir=str(tmp_path / 'b'),
+                                api_interval=0, cache=cache).prepare_backtest_data_origin(market.start_date,
+                                                                                          market.end_date)
+    assert second.calls == {}
+    # 缓存命中不计入 api_calls
+    counters = recorder2.runs[-1]['counters']
+    assert counters.get('api_calls', 0) == 0
+    assert counters['api_cache_hits'] == sum(first.calls.values())
+    assert etf2.equals(etf)
+    assert len(merged2) == len(merged)
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# 获取仓库根目录
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+
+HEAVY = ['sklearn', 'matplotlib', 'tushare', 'scipy.optimize', 'pandas']
+
+
+def _loaded_after_import(module):
+    code = (
+        "import sys, json\n"
+        f"import {module}\n"
+        f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=grand_parent_dir,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', [
+    'scripts.stock.gold_collection.denoised_corr',
+    'scripts.stock.gold_collection.NCO_weights',
+])
+def test_numeric_core_imports_numpy_only(module):
+    assert _loaded_after_import(module) == []
+
+
+def test_data_fetcher_does_not_import_tushare():
+    assert 'tushare' not in _loaded_after_import('data.data_fetcher')
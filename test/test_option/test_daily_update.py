@@ -0,0 +1,92 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import FakeProApi, SyntheticMarket
+from data.data_fetcher import DataFetcher
+from data.dataHelper.instrumentation import PerfRecorder
+from scripts.option.daily_update import bootstrap, daily_update, load_snapshot
+
+STRATEGIES = ('monthly_atm_call', 'long_etf_short_call')
+
+
+def _fetcher(market, data_dir):
+    return DataFetcher(pro_api=FakeProApi(market), recorder=PerfRecorder(), data_dir=str(data_dir), api_interval=0)
+
+
+def test_daily_update_matches_full_run(tmp_path):
+    market = SyntheticMarket(n_days=90)
+    dates = market.calendar.strftime('%Y%m%d')
+    start, end = dates[0], dates[-1]
+
+    full = bootstrap(_fetcher(market, tmp_path / 'full'), start, end, str(tmp_path / 'full.pkl'), STRATEGIES)
+
+    snapshot = str(tmp_path / 'live.pkl')
+    bootstrap(_fetcher(market, tmp_path / 'live'), start, dates[-8], snapshot, STRATEGIES)
+    # 两次只有一个新交易日，一次包含多个新交易日
+    for new_end in (dates[-7], dates[-6], end):
+        fetcher = _fetcher(market, tmp_path / 'live')
+        updated = daily_update(fetcher, snapshot, new_end)
+        calls = fetcher.pro.calls
+        assert calls['fund_daily'] == 1 and calls['opt_basic'] == 1
+        assert calls['opt_daily'] == len(updated['monthly_atm_call'].etf) - 1
+
+    meta, states = load_snapshot(snapshot)
+    assert meta['end_date'] == end
+    pd.testing.assert_frame_equal(updated['monthly_atm_call'].ledger.history(),
+                                  full['monthly_atm_call'].ledger.history())
+    assert updated['monthly_atm_call'].trade_log == full['monthly_atm_call'].trade_log
+    assert states['long_etf_short_call']['backtest_results'] == full['long_etf_short_call'].backtest_results
+
+    # 追加后的 live 缓存与一次性建立的缓存行一致
+    def merged(folder):
+        path = os.path.join(folder, 'opt_merged', 'SSE', f'opt_merged_500ETF_SSE_{start}_{end}_live.csv')
+        return pd.read_csv(path).sort_values(['ts_code', 'trade_date']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(merged(tmp_path / 'live'), merged(tmp_path / 'full'))
+
+
+class FlakyProApi(FakeProApi):
+    """第 fail_at 次 opt_daily 请求抛出 ConnectionError"""
+
+    def __init__(self, market, fail_at):
+        super().__init__(market)
+        self.fail_at = fail_at
+
+    def opt_daily(self, **kwargs):
+        if self.calls.get('opt_daily', 0) + 1 == self.fail_at:
+            self._record('opt_daily')
+            raise ConnectionError('opt_daily 请求失败')
+        return super().opt_daily(**kwargs)
+
+
+def test_daily_update_retry_after_api_error(tmp_path):
+    market = SyntheticMarket(n_days=60)
+    dates = market.calendar.strftime('%Y%m%d')
+    start, prev_end, end = dates[0], dates[-5], dates[-1]
+    full = bootstrap(_fetcher(market, tmp_path / 'full'), start, end, str(tmp_path / 'full.pkl'), STRATEGIES)
+
+    snapshot = str(tmp_path / 'live.pkl')
+    bootstrap(_fetcher(market, tmp_path / 'live'), start, prev_end, snapshot, STRATEGIES)
+    flaky = DataFetcher(pro_api=FlakyProApi(market, fail_at=2), recorder=PerfRecorder(),
+                        data_dir=str(tmp_path / 'live'), api_interval=0)
+    with pytest.raises(ConnectionError):
+        daily_update(flaky, snapshot, end)
+    # 快照与 prev_end 的缓存都未改动
+    assert load_snapshot(snapshot)[0]['end_date'] == prev_end
+    assert os.path.exists(tmp_path / 'live' / 'etc_specific' / f'etf_specific_500ETF_{start}_{prev_end}.csv')
+
+    updated = daily_update(_fetcher(market, tmp_path / 'live'), snapshot, end)
+    assert load_snapshot(snapshot)[0]['end_date'] == end
+    assert updated['monthly_atm_call'].trade_log == full['monthly_atm_call'].trade_log
+    pd.testing.assert_frame_equal(updated['monthly_atm_call'].ledger.history(),
+                                  full['monthly_atm_call'].ledger.history())
+    # 成功后旧缓存被删除，只留下新结束日期的缓存
+    for folder in ('etc_specific', os.path.join('opt_basic', 'SSE'), os.path.join('opt_specific', 'SSE'),
+                   os.path.join('opt_merged', 'SSE')):
+        names = os.listdir(tmp_path / 'live' / folder)
+        assert names and all(end in name and not name.endswith('.tmp') for name in names), names
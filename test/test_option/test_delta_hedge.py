@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from scripts.option.simulation.delta_hedge import DeltaHedgeSimulator, holdings_from_trade_log, make_policies
+from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+from scripts.option.utils.fills import ETF_SPEC, FillEngine
+
+
+def _strategy():
+    market = SyntheticMarket(n_days=160)
+    strategy = MonthlyATMCallStrategy(market.etf_frame(), market.merged_frame(), contracts=10)
+    strategy.run_backtest()
+    return strategy
+
+
+def test_holdings_match_ledger():
+    strategy = _strategy()
+    holdings = holdings_from_trade_log(strategy.trade_log, strategy.market.calendar)
+    last = holdings.iloc[-1]
+    held = dict(zip(strategy.ledger.codes, strategy.ledger.qty))
+    assert {c: -q for c, q in last[last != 0].items()} == held
+
+
+def test_policies_batched():
+    strategy = _strategy()
+    policies = make_policies(every_n=(1, 5), bands=(0.1, 100.0))
+    ideal = DeltaHedgeSimulator.from_strategy(strategy).simulate(policies)
+    summary = ideal['summary']
+    assert list(summary.index) == ['daily', 'every_5', 'band_0.1', 'band_100']
+    # 每日对冲显著降低日盈亏波动，无成本时成本为 0
+    assert summary.loc['daily', 'pnl_std'] < 0.5 * summary.loc['daily', 'unhedged_std']
+    assert (summary['cost'] == 0).all()
+    # 对冲持仓为整手，且每日对冲跟踪目标在一手以内
+    hedge = ideal['hedge']
+    assert (hedge % 100 == 0).all().all()
+    held = ideal['option_delta'] != 0
+    assert (np.abs(hedge['daily'] + ideal['option_delta'])[held] <= 50).all()
+    # 带宽极大时只在期权持仓变化当日对冲
+    assert summary.loc['band_100', 'n_trades'] < summary.loc['band_0.1', 'n_trades'] <= summary.loc['daily', 'n_trades']
+
+    costly = DeltaHedgeSimulator.from_strategy(strategy, fill_engine=FillEngine(ETF_SPEC)).simulate(policies)
+    assert (costly['summary']['cost'] > 0).all()
+    assert np.allclose(costly['pnl'].sum().to_numpy(), costly['summary']['total_pnl'].to_numpy())
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from scripts.option.strategies.LongETF_ShortCall_Contrast import LongETFShortCallContrastStrategy
+from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+from scripts.option.utils.fills import ETF_SPEC, OPTION_SPEC, FillEngine
+
+
+def test_participation_cap_and_costs():
+    engine = FillEngine(OPTION_SPEC, participation=0.1)
+    fill = engine.fill(qty=[5, 50, 5, 5], side=[-1, -1, 1, 1], price=[0.2, 0.2, 0.2, 0.2],
+                       volume=[100, 100, np.nan, 0], high=0.22, low=0.18)
+    assert list(fill['filled']) == [5, 10, 0, 0]
+    assert list(fill['unfilled']) == [0, 40, 5, 5]
+    # 卖出低于参考价，成交越多冲击越大
+    assert fill['price'][0] < 0.2 and fill['price'][1] < fill['price'][0]
+    assert np.isnan(fill['price'][2])
+    assert np.allclose(fill['commission'], [10.0, 20.0, 0.0, 0.0])
+    assert (fill['slippage'][:2] > 0).all()
+
+
+def test_etf_lots_and_affordable():
+    engine = FillEngine(ETF_SPEC, participation=0.5)
+    fill = engine.fill(qty=1234, side=1, price=5.5, volume=10, high=5.6, low=5.4)
+    assert fill['filled'] == 500  # 10 手 × 100 份 × 50%
+    result = engine.affordable_qty(100000, 5.5, volume=1e6, high=5.6, low=5.4)
+    cost = result['filled'] * result['price'] + result['commission']
+    assert result['filled'] % 100 == 0 and cost <= 100000 and 100000 - cost < 600
+
+
+def test_strategies_with_fill_engine():
+    market = SyntheticMarket(n_days=120)
+    etf, options = market.etf_frame(), market.merged_frame()
+
+    ideal = MonthlyATMCallStrategy(etf, options.copy(), contracts=5)
+    ideal.run_backtest()
+    engine = FillEngine(OPTION_SPEC, participation=0.001)
+    real = MonthlyATMCallStrategy(etf, options.copy(), contracts=5, fill_engine=engine)
+    real.run_backtest()
+    sells = [t for t in real.trade_log if t['type'] == 'sell']
+    assert sells and all(0 < t['qty'] < 5 and t['fee'] > 0 for t in sells)
+    # 成交量不足时平仓分多日完成，账本持仓与交易记录一致
+    closed = sum(t['qty'] for t in real.trade_log if t['type'] == 'close')
+    assert sum(t['qty'] for t in sells) - closed == real.ledger.qty.sum()
+    assert len(real.trade_log) > len(ideal.trade_log)
+
+    etf_strategy = LongETFShortCallContrastStrategy(etf, options, fill_engine=FillEngine(ETF_SPEC))
+    bought = etf_strategy.buy_etf(etf['trade_date'].iloc[0])
+    assert bought['shares'] % 100 == 0 and bought['fee'] > 0 and bought['cash_left'] >= 0
+
+
+def test_partial_closes_prorate_margin():
+    market = SyntheticMarket(n_days=120)
+    real = MonthlyATMCallStrategy(market.etf_frame(), market.merged_frame(), contracts=5,
+                                  fill_engine=FillEngine(OPTION_SPEC, participation=0.001))
+    real.run_backtest()
+    for contract in {t['contract'] for t in real.trade_log if t['type'] == 'sell'} - set(real.positions):
+        sold = [t for t in real.trade_log if t['contract'] == contract and t['type'] == 'sell']
+        closes = [t for t in real.trade_log if t['contract'] == contract and t['type'] == 'close']
+        # 每笔平仓按张数释放开仓保证金，合计等于开仓保证金
+        assert np.isclose(sum(t['margin'] for t in closes), sum(t['margin'] for t in sold))
+        for t in closes:
+            assert np.isclose(t['margin'], sold[0]['margin'] * t['qty'] / sold[0]['qty'])
+
+
+def test_unfilled_short_call_settles_at_intrinsic_on_expiry():
+    import pandas as pd
+
+    market = SyntheticMarket(n_days=120)
+    etf, options = market.etf_frame(), market.merged_frame()
+    probe = MonthlyATMCallStrategy(etf, options.copy(), contracts=5)
+    probe.run_backtest()
+    first = probe.trade_log[0]
+    contract, opened = first['contract'], first['date']
+
+    # 开仓后该合约再无行情 (无法平仓，结算价停在开仓日)，其后标的上涨 20%
+    trade_date = pd.to_datetime(options['trade_date'])
+    options = options[(options['ts_code'] != contract) | (trade_date <= opened)]
+    etf = etf.copy()
+    etf.loc[etf['trade_date'] > opened, ['open', 'high', 'low', 'close']] *= 1.2
+
+    strategy = MonthlyATMCallStrategy(etf, options.copy(), contracts=5,
+                                      fill_engine=FillEngine(OPTION_SPEC, participation=1.0))
+    strategy.run_backtest()
+    sold = [t for t in strategy.trade_log if t['contract'] == contract and t['type'] == 'sell']
+    closes = [t for t in strategy.trade_log if t['contract'] == contract and t['type'] == 'close']
+    assert sold and len(closes) == 1
+    expire = pd.Timestamp(options.loc[options['ts_code'] == contract, 'maturity_date'].iloc[0])
+    settle_day = strategy.etf.index[strategy.etf.index >= expire][0]
+    strike = options.loc[options['ts_code'] == contract, 'exercise_price'].iloc[0]
+    intrinsic = strategy.etf.loc[settle_day, 'close'] - strike
+    assert intrinsic > sold[0]['price']  # 与停留在开仓日的结算价明显不同
+    assert closes[0]['date'] == settle_day and closes[0]['qty'] == sold[0]['qty']
+    assert np.isclose(closes[0]['price'], intrinsic) and closes[0]['fee'] == 0
+    assert contract not in strategy.positions and contract not in set(strategy.ledger.codes)
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from scripts.option.pricing_models.black_scholes import bs_price
+from scripts.option.pricing_models.ivix import compute_ivix
+
+
+def _flat_vol_chain(sigma=0.2, spot=3.0, rate=0.02, trade_date='20240102', expiries=('20240124', '20240228')):
+    rows = []
+    strikes = np.round(np.arange(1.5, 4.55, 0.05), 2)
+    t0 = pd.Timestamp(trade_date)
+    for expiry in expiries:
+        tau = (pd.Timestamp(expiry) - t0).days / 365
+        for cp in ('C', 'P'):
+            prices = bs_price(spot, strikes, tau, sigma, rate, cp == 'C')
+            for k, p in zip(strikes, prices):
+                rows.append({'ts_code': f'{expiry}{cp}{k}', 'trade_date': trade_date, 'maturity_date': expiry,
+                             'exercise_price': k, 'call_put': cp, 'close': p})
+    return pd.DataFrame(rows)
+
+
+def test_flat_vol_recovers_sigma():
+    result = compute_ivix(_flat_vol_chain())
+    assert abs(result['ivix'].iloc[0] - 20) < 0.5
+    assert result['near_forward'].iloc[0] > 3.0
+
+
+def test_near_term_rolls_inside_min_days():
+    chain = _flat_vol_chain(trade_date='20240120', expiries=('20240124', '20240228', '20240327'))
+    result = compute_ivix(chain)
+    assert result['near_expiry'].iloc[0].strftime('%Y%m%d') == '20240228'
+    assert result['next_expiry'].iloc[0].strftime('%Y%m%d') == '20240327'
+
+
+def test_panel_matches_single_day_computation():
+    panel = SyntheticMarket(n_days=60).merged_frame()
+    full = compute_ivix(panel)
+    assert len(full) == 60 and full['ivix'].between(10, 40).all()
+    for day in ('20240105', '20240228'):
+        single = compute_ivix(panel[panel['trade_date'] == day])
+        assert np.isclose(single['ivix'].iloc[0], full.loc[pd.Timestamp(day), 'ivix'])
+
+
+def test_adjusted_contracts_excluded():
+    panel = SyntheticMarket(n_days=20).merged_frame()
+    clean = compute_ivix(panel)
+    # 加入一个除息调整合约 (名称带 A、行权价不在网格上)，价格异常也不影响结果
+    extra = panel.iloc[[0]].assign(ts_code='99999999.SH', name=panel['name'].iloc[0] + 'A', exercise_price=5.512,
+                                   close=9.9)
+    noisy = compute_ivix(pd.concat([panel, extra], ignore_index=True))
+    assert np.allclose(noisy['ivix'], clean['ivix'])
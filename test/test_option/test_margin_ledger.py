@@ -0,0 +1,58 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+from scripts.option.utils.ledger import MarginLedger
+from scripts.option.utils.margin import short_option_margin
+
+
+def test_sse_margin_formula():
+    # 认购虚值 0.5: 0.1 + max(0.12*5 - 0.5, 0.07*5) = 0.45
+    # 认沽实值: min(0.6 + max(0.12*5 - 0, 0.07*5.5), 5.5) = 1.2
+    margin = short_option_margin([0.1, 0.6], 5.0, [5.5, 5.5], [True, False])
+    assert np.allclose(margin, [4500.0, 12000.0])
+
+
+def test_ledger_mark_and_close():
+    ledger = MarginLedger(100000)
+    ledger.open_short('A', qty=2, price=0.1, strike=5.5, is_call=True, margin_per_contract=4500)
+    assert ledger.cash == 102000
+    ledger.mark('2024-01-02', [0.2], 5.0)
+    day = ledger.history().iloc[-1]
+    assert day['nav'] == 102000 - 0.2 * 2 * 10000
+    assert day['margin'] == 2 * 10000 * (0.2 + max(0.12 * 5 - 0.5, 0.07 * 5))
+    ledger.close_short('A', 0.05)
+    ledger.mark('2024-01-03', [], 5.0)
+    assert ledger.history()['nav'].iloc[-1] == 102000 - 1000
+    assert ledger.margin_used == 0
+
+
+def test_monthly_atm_call_results():
+    market = SyntheticMarket(n_days=120)
+    strategy = MonthlyATMCallStrategy(market.etf_frame(), market.merged_frame(), contracts=5)
+    strategy.run_backtest()
+    results = strategy.get_results()
+
+    assert len(results['nav']) == 120
+    assert results['metrics']['peak_margin'] > 0
+    # 没有持仓的日子净值等于现金
+    flat = results['nav']['liability'] == 0
+    assert np.allclose(results['nav'].loc[flat, 'nav'], results['nav'].loc[flat, 'cash'])
+
+
+def test_market_data_keeps_exchange_pre_close():
+    import pandas as pd
+    from scripts.option.utils.market_data import MarketData
+
+    etf = pd.DataFrame({'trade_date': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04']),
+                        'close': [5.0, 4.8, 4.9], 'pre_close': [np.nan, 4.7, np.nan]})
+    options = pd.DataFrame(columns=['trade_date', 'ts_code', 'expire_date', 'call_put'])
+    # 除息日 (01-03) 的前收盘价 4.7 保留，缺失的用前一日收盘价补齐
+    assert list(MarketData(etf, options).etf['pre_close']) == [5.0, 4.7, 4.8]
+    assert list(MarketData(etf.drop(columns='pre_close'), options).etf['pre_close']) == [5.0, 5.0, 4.8]
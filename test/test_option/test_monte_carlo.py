@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from scripts.option.pricing_models.black_scholes import bs_price, implied_vol
+from scripts.option.simulation.monte_carlo import MonteCarloEngine
+from scripts.option.utils.metrics import max_drawdown
+
+
+def test_put_call_parity_and_implied_vol_roundtrip():
+    spot, strike, tau, rate = 5.5, np.array([5.0, 5.5, 6.0]), 0.1, 0.02
+    call = bs_price(spot, strike, tau, 0.25, rate, True)
+    put = bs_price(spot, strike, tau, 0.25, rate, False)
+    assert np.allclose(call - put, spot - strike * np.exp(-rate * tau))
+    assert np.allclose(implied_vol(call, spot, strike, tau, rate, True), 0.25, atol=1e-6)
+
+
+def test_max_drawdown_batched():
+    nav = np.array([[1.0, 1.2, 0.9, 1.3], [1.0, 1.0, 1.0, 1.0]])
+    assert np.allclose(max_drawdown(nav), [0.25, 0.0])
+
+
+def test_engine_is_reproducible_with_chunking():
+    kwargs = dict(model='gbm', n_paths=300, n_days=126, seed=7)
+    small_chunks = MonteCarloEngine(memory_budget_mb=1, **kwargs)
+    assert small_chunks.chunk_size < 300
+    a = small_chunks.run_monthly_atm_call(strike_offsets=(0, 2))
+    b = MonteCarloEngine(memory_budget_mb=1, **kwargs).run_monthly_atm_call(strike_offsets=(0, 2))
+    assert a['pnl'].shape == (2, 300)
+    assert np.array_equal(a['pnl'], b['pnl'])
+    assert a['n_trades_per_path'] == 6
+
+
+def test_zero_vol_short_call_earns_time_value():
+    # 无波动时标的按无风险利率漂移，卖出认购的盈亏只来自时间价值衰减，应为非负
+    engine = MonteCarloEngine(model='gbm', n_paths=4, n_days=63, sigma=1e-6, mu=0.0, rate=0.0)
+    result = engine.run_monthly_atm_call()
+    assert np.all(result['pnl'] >= -1e-6)
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from data.dataHelper.instrumentation import PerfRecorder
+from scripts.option.multi_runner import MultiStrategyRunner
+from scripts.option.strategies.LongETF_ShortCall_Contrast import LongETFShortCallContrastStrategy
+from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+from scripts.option.utils.market_data import MarketData
+
+
+def test_single_pass_matches_separate_runs():
+    synthetic = SyntheticMarket(n_days=120)
+    etf, options = synthetic.etf_frame(), synthetic.merged_frame()
+
+    separate = {}
+    for contracts in (1, 5):
+        strategy = MonthlyATMCallStrategy(etf, options.copy(), contracts=contracts)
+        strategy.run_backtest()
+        separate[contracts] = strategy
+    long_etf = LongETFShortCallContrastStrategy(etf, options)
+    long_etf.run_backtest()
+
+    market = MarketData(etf, options)
+    strategies = {
+        'atm_1': MonthlyATMCallStrategy(market=market, contracts=1),
+        'atm_5': MonthlyATMCallStrategy(market=market, contracts=5),
+        'long_etf': LongETFShortCallContrastStrategy(market=market),
+    }
+    recorder = PerfRecorder()
+    report = MultiStrategyRunner(market, strategies, recorder=recorder).run()
+
+    for name, contracts in (('atm_1', 1), ('atm_5', 5)):
+        pd.testing.assert_frame_equal(strategies[name].ledger.history(), separate[contracts].ledger.history())
+        assert strategies[name].trade_log == separate[contracts].trade_log
+    assert strategies['long_etf'].backtest_results == long_etf.backtest_results
+    # 各策略状态独立
+    assert not np.allclose(strategies['atm_1'].ledger.history()['nav'], strategies['atm_5'].ledger.history()['nav'])
+
+    assert list(report.index) == ['atm_1', 'atm_5', 'long_etf']
+    assert (report['bars'] == len(market.calendar)).all()
+    assert np.isclose(report['share'].sum(), 1.0)
+    assert set(recorder.runs[-1]['strategies']) == set(strategies)
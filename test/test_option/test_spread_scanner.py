@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from scripts.option.pricing_models.spread_scanner import scan_spreads
+
+
+def _chain():
+    rows = [
+        # ts_code, expiry, strike, call_put, close
+        ('C1', '20250326', 3.0, 'C', 0.30),
+        ('C2', '20250326', 3.1, 'C', 0.32),  # 认购高行权价反而更贵: 垂直价差 < 0
+        ('C3', '20250326', 3.2, 'C', 0.25),
+        ('C1F', '20250423', 3.0, 'C', 0.28),  # 远月比近月便宜: 日历价差 < 0
+        ('P1', '20250326', 3.0, 'P', 0.05),
+        ('P2', '20250326', 3.2, 'P', 0.50),  # 认沽价差 0.45 超过行权价差 0.2
+    ]
+    frame = pd.DataFrame(rows, columns=['ts_code', 'maturity_date', 'exercise_price', 'call_put', 'close'])
+    frame['trade_date'] = '20250303'
+    frame['vol'] = 100.0
+    etf = pd.DataFrame({'trade_date': ['20250303'], 'close': [3.05]})
+    return frame, etf
+
+
+def test_bounds_and_ranking():
+    options, etf = _chain()
+    every = scan_spreads(options, etf, include_all=True)
+    # 认购 3 档 3 对 + 认沽 1 对 + 同行权价 3.0 认购 1 对日历
+    assert (every['kind'] == 'vertical').sum() == 4 and (every['kind'] == 'calendar').sum() == 1
+
+    found = scan_spreads(options, etf)
+    assert list(found['rank']) == list(range(1, len(found) + 1))
+    assert found['edge'].is_monotonic_decreasing
+    pairs = {(r.kind, r.long_code, r.short_code): r for r in found.itertuples()}
+    assert set(pairs) == {('vertical', 'C1', 'C2'), ('vertical', 'P2', 'P1'), ('calendar', 'C1F', 'C1')}
+    assert np.isclose(pairs[('vertical', 'C1', 'C2')].violation, 0.02)
+    put = pairs[('vertical', 'P2', 'P1')]
+    assert np.isclose(put.violation, 0.45 - put.upper) and put.upper < 0.2
+    assert np.isclose(pairs[('calendar', 'C1F', 'C1')].edge, 0.02 * 10000)
+    assert found.iloc[0]['long_code'] == 'P2'
+
+
+def test_chunking_is_invariant():
+    market = SyntheticMarket(n_days=60)
+    options, etf = market.merged_frame(), market.etf_frame()
+    whole = scan_spreads(options, etf, include_all=True)
+    chunked = scan_spreads(options, etf, include_all=True, max_cells=500)
+    key = ['trade_date', 'kind', 'long_code', 'short_code']
+    pd.testing.assert_frame_equal(whole.sort_values(key, ignore_index=True).drop(columns='rank'),
+                                  chunked.sort_values(key, ignore_index=True).drop(columns='rank'))
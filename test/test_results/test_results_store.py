@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import SyntheticMarket
+from data.results_store import ResultsStore
+from scripts.option.strategies.monthly_atm_call import MonthlyATMCallStrategy
+
+
+def test_record_and_load_strategy_run(tmp_path):
+    market = SyntheticMarket(n_days=60)
+    strategy = MonthlyATMCallStrategy(market.etf_frame(), market.merged_frame(), contracts=2)
+    strategy.run_backtest()
+    res = strategy.get_results()
+
+    store = ResultsStore(str(tmp_path / 'results.db'))
+    run_id = store.record_run('monthly_atm_call', params={'contracts': 2, 'underlying': '510500.SH'},
+                              metrics=res['metrics'], nav=res['nav'], trades=strategy.trade_log)
+
+    loaded = store.load_nav(run_id)
+    assert np.allclose(loaded[run_id].to_numpy(), res['nav']['nav'].to_numpy())
+    assert len(store.load_trades(run_id)) == len(strategy.trade_log)
+    params = store.load_params([run_id])
+    assert params.loc[run_id, 'contracts'] == 2 and params.loc[run_id, 'underlying'] == '510500.SH'
+    assert np.isclose(store.load_metrics().loc[run_id, 'sharpe'], res['metrics']['sharpe'])
+
+
+def test_sweep_leaderboard_and_filters():
+    store = ResultsStore('sqlite:///:memory:', batch_size=100)
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2024-01-01', periods=20)
+    results = []
+    for i in range(300):
+        nav = pd.Series(1e6 * np.cumprod(1 + rng.normal(0, 0.01, len(dates))), index=dates)
+        results.append({'strategy': 'monthly_atm_call', 'sweep': 'a' if i % 2 else 'b',
+                        'params': {'offset': i % 5, 'contracts': i % 3 + 1},
+                        'metrics': {'sharpe': float(rng.normal()), 'max_drawdown': float(rng.random())},
+                        'nav': nav})
+    run_ids = store.record_runs(results)
+    assert run_ids == list(range(1, 301))
+
+    top = store.leaderboard('sharpe', n=10, sweep='a')
+    expected = sorted((r['metrics']['sharpe'] for r in results if r['sweep'] == 'a'), reverse=True)[:10]
+    assert np.allclose(top['sharpe'].to_numpy(), expected)
+    assert {'offset', 'contracts', 'max_drawdown'} <= set(top.columns)
+
+    filtered = store.leaderboard('max_drawdown', n=5, ascending=True, offset=(1, 2), contracts=3)
+    assert set(filtered['offset']) <= {1, 2} and set(filtered['contracts']) == {3}
+    assert list(store.find_runs(offset=4, contracts=1)) == [i + 1 for i in range(300) if i % 5 == 4 and i % 3 == 0]
+
+    dates_out, matrix = store.load_nav(run_ids[:3], as_array=True)
+    assert matrix.shape == (20, 3) and np.allclose(matrix[:, 0], results[0]['nav'].to_numpy())
+
+
+def test_reads_do_not_wait_for_writer_lock(tmp_path):
+    import sqlite3
+    import time
+
+    path = str(tmp_path / 'results.db')
+    store = ResultsStore(path)
+    run_id = store.record_run('monthly_atm_call', params={'contracts': 1}, metrics={'sharpe': 1.2},
+                              nav=pd.Series([1.0, 1.1], index=pd.bdate_range('2024-01-01', periods=2)))
+
+    # 另一个连接 (如另一个扫描进程) 持有写锁
+    writer = sqlite3.connect(path, isolation_level=None, timeout=0)
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        start = time.perf_counter()
+        board = store.leaderboard('sharpe')
+        assert list(board.index) == [run_id]
+        assert list(store.find_runs(contracts=1)) == [run_id]
+        assert store.load_nav([run_id]).shape == (2, 1)
+        assert time.perf_counter() - start < 1.0
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+
+    # 写入路径仍取得写锁
+    store.record_run('monthly_atm_call', params={'contracts': 2}, metrics={'sharpe': 0.5})
+    assert len(store.find_runs()) == 2
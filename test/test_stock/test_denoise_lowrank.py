@@ -0,0 +1,77 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+grand_parent_dir = os.path.dirname(os.path.dirname(current_dir))
+sys.path.append(grand_parent_dir)
+from benchmarks.synthetic import make_fund_nav_panel
+from scripts.stock.gold_collection import NCO_weights, denoised_corr
+
+
+@pytest.mark.parametrize('n_funds,method', [(40, 'lanczos'), (300, 'randomized')])
+def test_lowrank_matches_dense(n_funds, method):
+    # 300 只 × 200 日为 T < N 的秩亏情形
+    panel = make_fund_nav_panel(n_funds=n_funds, n_days=200)
+    start, end = panel.index[0], panel.index[-1]
+    corr, cov, _ = denoised_corr.cal_corr_lowrank(panel, start, end, k=10, method=method)
+    n_facts = corr.factor.shape[1]
+    assert n_facts == 3  # 合成面板由 3 个公共因子驱动
+
+    returns = panel.pct_change().fillna(0) - 0.02 / 252
+    dense_cov = np.asarray(returns.cov() * 252)
+    e_val, e_vec = denoised_corr.getPCA(denoised_corr.cov2corr(dense_cov.copy()))
+    dense = denoised_corr.denoisedCorr(e_val, e_vec, n_facts)
+    assert np.allclose(corr.to_dense(), dense, atol=1e-6)
+    assert np.allclose(cov.to_dense(), denoised_corr.corr2cov(dense, np.sqrt(np.diag(dense_cov))), atol=1e-6)
+
+    b = np.random.default_rng(0).normal(size=(n_funds, 2))
+    assert np.allclose(cov.to_dense() @ cov.solve(b), b)
+    assert np.allclose(cov.matvec(b), cov.to_dense() @ b)
+    rows, cols = [3, 1, 7], [1, 5]
+    assert np.allclose(cov.block(rows, cols), cov.to_dense()[np.ix_(rows, cols)])
+
+
+def test_nco_weights_lowrank():
+    panel = make_fund_nav_panel(n_funds=60, n_days=300)
+    corr, cov, annual_rtn = denoised_corr.cal_corr_lowrank(panel, panel.index[0], panel.index[-1], k=10)
+    w_nco, w_intra, w_inter = NCO_weights.nco_weights_lowrank(cov, corr_lr=corr, maxNumClusters=4, n_init=1)
+    assert np.isclose(w_nco['NCO'].sum(), 1.0)
+    assert list(w_nco.index) == sorted(panel.columns)
+    assert np.isclose(w_inter.sum(), 1.0) and (w_inter >= -1e-8).all()
+    assert np.allclose(w_intra.sum(), 1.0) and (w_intra.to_numpy() >= -1e-8).all()
+
+    # slsqp_max=0: 所有簇走解析解，簇内权重为子块上 Σ^{-1}1 截去空头后归一化
+    clstrs = {j: np.flatnonzero(w_intra[col].to_numpy() != 0) for j, col in enumerate(w_intra.columns)}
+    _, w_intra, _ = NCO_weights.nco_weights_lowrank(cov, clstrs=clstrs, slsqp_max=0)
+    for j, members in clstrs.items():
+        expected = np.clip(np.linalg.solve(cov.block(members), np.ones(members.size)), 0, None)
+        assert np.allclose(w_intra.iloc[members, j].to_numpy(), expected / expected.sum())
+
+    # 预期收益全为负时 Σ^{-1}μ 截断后为 0，退回最小方差解，不出现除零
+    _, w_intra, _ = NCO_weights.nco_weights_lowrank(cov, annual_rtns=-np.abs(annual_rtn), clstrs=clstrs,
+                                                    slsqp_max=0)
+    assert np.isfinite(w_intra.to_numpy()).all() and np.allclose(w_intra.sum(), 1.0)
+    assert (w_intra.to_numpy() >= 0).all()
+
+
+def test_nco_weights_lowrank_matches_dense():
+    import pandas as pd
+    panel = make_fund_nav_panel(n_funds=24, n_days=300)
+    corr, cov, annual_rtn = denoised_corr.cal_corr_lowrank(panel, panel.index[0], panel.index[-1], k=10)
+    cov_df = pd.DataFrame(cov.to_dense(), index=cov.index, columns=cov.index)
+    corr_df = pd.DataFrame(np.clip(corr.to_dense(), -1, 1), index=cov.index, columns=cov.index)
+    dense_nco, dense_intra, dense_inter = NCO_weights.nco_weights(cov_df, corr_df, annual_rtn)
+
+    # 用稠密路径的聚类，比较簇内 (SLSQP 最大夏普、下限 0.05) 与簇间权重
+    clstrs = {j: np.flatnonzero(dense_intra[col].to_numpy() != 0) for j, col in enumerate(dense_intra.columns)}
+    assert max(m.size for m in clstrs.values()) <= 20
+    w_nco, w_intra, w_inter = NCO_weights.nco_weights_lowrank(cov, annual_rtns=annual_rtn, corr_lr=corr,
+                                                              clstrs=clstrs)
+    assert (w_intra.to_numpy()[w_intra.to_numpy() != 0] >= 0.05 - 1e-8).all()
+    assert np.allclose(w_intra.to_numpy(), dense_intra.to_numpy(), atol=1e-4)
+    assert np.allclose(w_inter.to_numpy(), dense_inter.to_numpy(), atol=1e-4)
+    assert list(w_nco.index) == list(dense_nco.index)
+    assert np.allclose(w_nco['NCO'].to_numpy(), dense_nco['NCO'].to_numpy(), atol=1e-4)